@@ -276,6 +276,14 @@ function(impactx_set_binary_name)
             set_property(TARGET ${tgt} APPEND_STRING PROPERTY OUTPUT_NAME ".SP")
         endif()
 
+        if(NOT ImpactX_PARTICLES_PRECISION STREQUAL ImpactX_PRECISION)
+            if(ImpactX_PARTICLES_PRECISION STREQUAL "DOUBLE")
+                set_property(TARGET ${tgt} APPEND_STRING PROPERTY OUTPUT_NAME ".PDP")
+            else()
+                set_property(TARGET ${tgt} APPEND_STRING PROPERTY OUTPUT_NAME ".PSP")
+            endif()
+        endif()
+
         #if(ImpactX_ASCENT)
         #    set_property(TARGET ${tgt} APPEND_STRING PROPERTY OUTPUT_NAME ".ASCENT")
         #endif()
@@ -408,6 +416,7 @@ function(impactx_print_summary)
         message("    MPI (thread multiple): ${ImpactX_MPI_THREAD_MULTIPLE}")
     endif()
     message("    PRECISION: ${ImpactX_PRECISION}")
+    message("    PARTICLES PRECISION: ${ImpactX_PARTICLES_PRECISION}")
     message("    PYTHON: ${ImpactX_PYTHON}")
     message("    OPENPMD: ${ImpactX_OPENPMD}")
     #message("    SENSEI: ${ImpactX_SENSEI}")
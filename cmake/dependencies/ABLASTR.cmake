@@ -67,6 +67,7 @@ macro(find_ablastr)
         set(WarpX_FFT ${ImpactX_FFT} CACHE BOOL "" FORCE)
         set(WarpX_OPENPMD ${ImpactX_OPENPMD} CACHE INTERNAL "" FORCE)
         set(WarpX_PRECISION ${ImpactX_PRECISION} CACHE INTERNAL "" FORCE)
+        set(WarpX_PARTICLE_PRECISION ${ImpactX_PARTICLES_PRECISION} CACHE INTERNAL "" FORCE)
         set(WarpX_MPI ${ImpactX_MPI} CACHE INTERNAL "" FORCE)
         set(WarpX_MPI_THREAD_MULTIPLE ${ImpactX_MPI_THREAD_MULTIPLE} CACHE INTERNAL "" FORCE)
         set(WarpX_IPO ${ImpactX_IPO} CACHE INTERNAL "" FORCE)
@@ -142,7 +143,7 @@ macro(find_ablastr)
         message(FATAL_ERROR "Not yet supported!")
         # TODO: MPI & FFT control
         set(COMPONENT_DIM 3D)
-        set(COMPONENT_PRECISION ${ImpactX_PRECISION} P${ImpactX_PRECISION})
+        set(COMPONENT_PRECISION ${ImpactX_PRECISION} P${ImpactX_PARTICLES_PRECISION})
 
         find_package(ABLASTR 24.08 CONFIG REQUIRED COMPONENTS ${COMPONENT_DIM})
         message(STATUS "ABLASTR: Found version '${ABLASTR_VERSION}'")
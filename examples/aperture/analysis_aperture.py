@@ -7,6 +7,7 @@
 
 import numpy as np
 import openpmd_api as io
+import pandas as pd
 from scipy.stats import moment
 
 
@@ -40,7 +41,14 @@ initial = series.iterations[1].particles["beam"].to_df()
 final = series.iterations[last_step].particles["beam"].to_df()
 
 series_lost = io.Series("diags/openPMD/particles_lost.h5", io.Access.read_only)
-particles_lost = series_lost.iterations[0].particles["beam"].to_df()
+# lost particles are written in chunks, e.g., one per period
+particles_lost = pd.concat(
+    [
+        series_lost.iterations[i].particles["beam"].to_df()
+        for i in series_lost.iterations
+    ],
+    ignore_index=True,
+)
 
 # compare number of particles
 num_particles = 10000
@@ -84,7 +84,7 @@ class CMakeBuild(build_ext):
             "-DImpactX_FFT:BOOL=" + ImpactX_FFT,
             "-DImpactX_MPI:BOOL=" + ImpactX_MPI,
             "-DImpactX_PRECISION=" + ImpactX_PRECISION,
-            #'-DImpactX_PARTICLES_PRECISION=' + ImpactX_PARTICLES_PRECISION,
+            "-DImpactX_PARTICLES_PRECISION=" + ImpactX_PARTICLES_PRECISION,
             "-DImpactX_PYTHON:BOOL=ON",
             ## dependency control (developers & package managers)
             #'-DImpactX_pyamrex_internal=' + ImpactX_pyamrex_internal,
@@ -165,6 +165,9 @@ ImpactX_COMPUTE = os.environ.get("IMPACTX_COMPUTE", "OMP")
 ImpactX_FFT = os.environ.get("IMPACTX_FFT", "OFF")
 ImpactX_MPI = os.environ.get("IMPACTX_MPI", "OFF")
 ImpactX_PRECISION = os.environ.get("IMPACTX_PRECISION", "DOUBLE")
+ImpactX_PARTICLES_PRECISION = os.environ.get(
+    "IMPACTX_PARTICLES_PRECISION", ImpactX_PRECISION
+)
 #   already prepared as a list 1;2;3
 ImpactX_SPACEDIM = os.environ.get("IMPACTX_SPACEDIM", "3")
 BUILD_SHARED_LIBS = os.environ.get("IMPACTX_BUILD_SHARED_LIBS", "OFF")
@@ -8,26 +8,47 @@
  * License: BSD-3-Clause-LBNL
  */
 #include "ImpactX.H"
+#include "initialization/Algorithms.H"
 #include "initialization/InitAmrCore.H"
+#include "initialization/LoadBalance.H"
 #include "particles/CollectLost.H"
 #include "particles/ImpactXParticleContainer.H"
+#include "particles/LinearMap.H"
 #include "particles/Push.H"
+#include "particles/PushSegment.H"
+#include "particles/ReferenceParticleCache.H"
+#include "particles/diagnostics/BeamHalo.H"
 #include "particles/diagnostics/DiagnosticOutput.H"
+#include "particles/diagnostics/LostParticles.H"
+#include "particles/spacecharge/FieldReuse.H"
 #include "particles/spacecharge/ForceFromSelfFields.H"
 #include "particles/spacecharge/GatherAndPush.H"
+#include "particles/spacecharge/GaussianPush.H"
+#include "particles/spacecharge/IGFSolver.H"
 #include "particles/spacecharge/PoissonSolve.H"
+#include "particles/spacecharge/TransverseSelfFields.H"
 #include "particles/transformation/CoordinateTransformation.H"
 
+#include <ablastr/warn_manager/WarnManager.H>
+
 #include <AMReX.H>
 #include <AMReX_AmrParGDB.H>
 #include <AMReX_BLProfiler.H>
 #include <AMReX_ParallelDescriptor.H>
 #include <AMReX_ParmParse.H>
+#include <AMReX_ParticleUtil.H>
 #include <AMReX_Print.H>
 #include <AMReX_Utility.H>
 
+#include <algorithm>
+#include <cmath>
 #include <iostream>
+#include <limits>
 #include <memory>
+#include <stdexcept>
+#include <string>
+#include <type_traits>
+#include <vector>
 
 
 namespace impactx {
@@ -48,6 +69,10 @@ namespace impactx {
         if (m_grids_initialized)
         {
             m_lattice.clear();
+            RefPartCache::clear();
+            spacecharge::clear_igf_cache();
+            diagnostics::finalize_diagnostics();
+            diagnostics::clear_halo_options();
 
             // this one last
             amr_data.reset();
@@ -87,6 +112,9 @@ namespace impactx {
         // init blocks / grids & MultiFabs
         amr_data->InitFromScratch(0.0);
 
+        // split new particles over tiles, for OpenMP threads
+        amr_data->m_particle_container->SetTiling();
+
         // alloc particle containers
         //   the lost particles have an extra runtime attribute: s when it was lost
         if (!amr_data->m_particles_lost->HasRealComp("s_lost"))
@@ -128,6 +156,17 @@ namespace impactx {
 
         validate();
 
+        // track the beam particles (default) or the beam envelope
+        std::string track = "particles";
+        amrex::ParmParse("algo").queryAdd("track", track);
+        if (track == "envelope") {
+            track_envelope();
+            return;
+        }
+        if (track != "particles") {
+            throw std::runtime_error("algo.track must be either 'particles' or 'envelope', but is '" + track + "'.");
+        }
+
         // verbosity
         amrex::ParmParse pp_impactx("impactx");
         int verbose = 1;
@@ -137,6 +176,10 @@ namespace impactx {
         //   before we start the evolve loop, we are in "step 0" (initial state)
         int global_step = 0;
 
+        // report which elements pushed the particles in SIMD batches
+        elements::SIMDReport::clear();
+        elements::SIMDReport::enabled = verbose > 0;
+
         // check typos in inputs after step 1
         bool early_params_checked = false;
 
@@ -166,22 +209,218 @@ namespace impactx {
         }
 
         amrex::ParmParse pp_algo("algo");
-        bool space_charge = false;
-        pp_algo.query("space_charge", space_charge);
+        SpaceChargeAlgo const space_charge_algo = initialization::get_space_charge_algo();
+        bool const space_charge = space_charge_algo != SpaceChargeAlgo::False;
         if (verbose > 0) {
-            amrex::Print() << " Space Charge effects: " << space_charge << "\n";
+            amrex::Print() << " Space Charge effects: " << initialization::to_string(space_charge_algo) << "\n";
+        }
+
+        // slice-step diagnostics
+        bool slice_step_diagnostics = false;
+        pp_diag.queryAdd("slice_step_diagnostics", slice_step_diagnostics);
+
+        // fuse consecutive linear elements into a single transfer map
+        bool fuse_linear_maps = false;
+        pp_algo.queryAdd("fuse_linear_maps", fuse_linear_maps);
+        // fuse the particle pushes of consecutive elements into a single pass
+        bool fuse_segments = false;
+        pp_algo.queryAdd("fuse_segments", fuse_segments);
+        if ((fuse_linear_maps || fuse_segments) && (space_charge || (diag_enable && slice_step_diagnostics))) {
+            ablastr::warn_manager::WMRecordWarning(
+                "ImpactX::evolve",
+                "algo.fuse_linear_maps and algo.fuse_segments are ignored in simulations "
+                "with space charge or with diag.slice_step_diagnostics enabled.",
+                ablastr::warn_manager::WarnPriority::low
+            );
+            fuse_linear_maps = false;
+            fuse_segments = false;
         }
 
         // periods through the lattice
         int periods = 1;
         amrex::ParmParse("lattice").queryAdd("periods", periods);
 
+        // one-turn map for repeated periods through a linear lattice
+        bool one_turn_map = false;
+        pp_algo.queryAdd("one_turn_map", one_turn_map);
+        if (one_turn_map) {
+            bool const linear_lattice = std::all_of(m_lattice.begin(), m_lattice.end(),
+                [](KnownElements const & element_variant) {
+                    return std::visit([](auto const & element) {
+                        return elements::is_linear_transport_v<decltype(element)>;
+                    }, element_variant);
+                });
+
+            if (space_charge || (diag_enable && slice_step_diagnostics)) {
+                ablastr::warn_manager::WMRecordWarning(
+                    "ImpactX::evolve",
+                    "algo.one_turn_map is ignored in simulations "
+                    "with space charge or with diag.slice_step_diagnostics enabled.",
+                    ablastr::warn_manager::WarnPriority::low
+                );
+                one_turn_map = false;
+            } else if (!linear_lattice) {
+                ablastr::warn_manager::WMRecordWarning(
+                    "ImpactX::evolve",
+                    "algo.one_turn_map: the lattice contains elements that are not linear. "
+                    "Only consecutive linear elements are fused into maps instead "
+                    "(algo.fuse_linear_maps).",
+                    ablastr::warn_manager::WarnPriority::low
+                );
+                one_turn_map = false;
+                fuse_linear_maps = true;
+            } else {
+                // the one-turn map is built in the first period from the fused linear maps
+                fuse_linear_maps = true;
+            }
+        }
+
+        // reuse the reference particle push through elements with applied fields
+        bool refpart_cache = true;
+        pp_algo.queryAdd("refpart_cache", refpart_cache);
+        RefPartCache::enabled = refpart_cache;
+
+        // defer the removal of lost particles from the beam
+        int lost_compaction_interval = 10;
+        pp_algo.queryAdd("lost_compaction_interval", lost_compaction_interval);
+        amrex::Real lost_compaction_fraction = 0.05;
+        pp_algo.queryAdd("lost_compaction_fraction", lost_compaction_fraction);
+        AMREX_ALWAYS_ASSERT_WITH_MESSAGE(lost_compaction_interval >= 1,
+            "algo.lost_compaction_interval must be at least 1.");
+
+        if (verbose > 0) {
+            amrex::Print() << " Fuse linear maps: " << fuse_linear_maps << "\n";
+            amrex::Print() << " Fuse segments: " << fuse_segments << "\n";
+            amrex::Print() << " One-turn map: " << one_turn_map << "\n";
+            amrex::Print() << " Reference particle cache: " << refpart_cache << "\n";
+            amrex::Print() << " Lost particle compaction: every " << lost_compaction_interval
+                           << " lossy slices or " << lost_compaction_fraction
+                           << " of the local particles\n";
+        }
+
+        // reuse the space charge field over several slices
+        spacecharge::FieldReuse space_charge_reuse;
+        m_space_charge_solves = 0;
+        m_space_charge_reuses = 0;
+        m_mesh_resizes = 0;
+        m_load_balance_remaps = 0;
+        m_one_turn_map = LinearMap::identity();
+
+        // particles need to be redistributed if some left the box they are stored
+        // in, on any level, or, with mesh refinement, may belong to another level
+        auto const needs_redistribute = [this] () {
+            auto const & pc = *amr_data->m_particle_container;
+            int const finest_level = amr_data->finestLevel();
+            return finest_level > 0 || amrex::numParticlesOutOfRange(pc, 0, finest_level, 0) > 0;
+        };
+
+        // distribute the boxes over the MPI ranks by the number of beam particles
+        initialization::LoadBalance load_balance;
+
+        // write lost particles to disk during the simulation
+        amrex::ParticleReal period_length = 0.0;
+        for (auto & element_variant : m_lattice) {
+            std::visit([&period_length](auto && element) { period_length += element.ds(); }, element_variant);
+        }
+        RefPart const & ref_start = amr_data->m_particle_container->GetRefParticle();
+        diagnostics::LostParticles lost_output(ref_start.charge, ref_start.s, period_length);
+
+        // lost particles on this MPI rank that are still in the beam particle container
+        long num_lost_pending = 0;
+        // slices of elements that can lose particles since the last removal of lost particles
+        int lossy_slices_pending = 0;
+        auto remove_lost_particles = [&num_lost_pending, &lossy_slices_pending, this]() {
+            if (num_lost_pending > 0) {
+                collect_lost_particles(*amr_data->m_particle_container);
+            }
+            num_lost_pending = 0;
+            lossy_slices_pending = 0;
+        };
+        // copy the particles lost in the last push through lossy_slices slices of
+        // elements that can lose particles, and remove them from the beam in batches
+        auto collect_lost_in_batches = [&num_lost_pending, &lossy_slices_pending, &remove_lost_particles, &lost_output,
+                                        lost_compaction_interval, lost_compaction_fraction, diag_enable, this](int lossy_slices) {
+            num_lost_pending = collect_lost_particles(*amr_data->m_particle_container, false);
+            lossy_slices_pending += lossy_slices;
+
+            auto const num_local = static_cast<amrex::Real>(
+                amr_data->m_particle_container->TotalNumberOfParticles(false, true));
+            if (lossy_slices_pending >= lost_compaction_interval ||
+                static_cast<amrex::Real>(num_lost_pending) > lost_compaction_fraction * num_local) {
+                remove_lost_particles();
+            }
+            if (diag_enable) {
+                lost_output.check_size(*amr_data->m_particles_lost);
+            }
+        };
+
+        // fused transfer map of the linear elements that were not yet applied to the beam
+        LinearMap fused_map = LinearMap::identity();
+        bool fused_map_pending = false;
+        // lattice segment of element slices that were not yet applied to the beam
+        std::vector<SegmentStep> segment;
+        // slices of elements that can lose particles in this segment
+        int segment_lossy_slices = 0;
+        auto apply_pending_pushes = [&fused_map, &fused_map_pending, &segment, &segment_lossy_slices,
+                                     &collect_lost_in_batches, this]() {
+            ImpactXParticleContainer & pc = *amr_data->m_particle_container;
+            if (fused_map_pending && segment.empty()) {
+                push_linear_map(pc, fused_map);
+            } else {
+                if (fused_map_pending) {
+                    segment.push_back({fused_map, pc.GetRefParticle()});
+                }
+                push_segment(pc, segment);
+            }
+
+            // particles lost in the segment are collected once, at its end
+            if (segment_lossy_slices > 0) {
+                collect_lost_in_batches(segment_lossy_slices);
+            }
+
+            fused_map = LinearMap::identity();
+            fused_map_pending = false;
+            segment.clear();
+            segment_lossy_slices = 0;
+        };
+
+        // the one-turn map of a linear lattice and the reference energy at the start of the first period
+        LinearMap one_turn = LinearMap::identity();
+        amrex::Real const pt_start = amr_data->m_particle_container->GetRefParticle().pt;
+
         for (int cycle=0; cycle < periods; ++cycle) {
+            // with a one-turn map, the beam particles are pushed only once at the end:
+            // only the reference particle is pushed in all periods after the first
+            if (one_turn_map && cycle > 0) {
+                BL_PROFILE("ImpactX::evolve::one_turn_map::RefPart");
+                for (auto & element_variant : m_lattice) {
+                    amr_data->m_particle_container->SetRefParticleEdge();
+                    std::visit([&global_step, this](auto & element) {
+                        if constexpr (elements::is_linear_transport_v<decltype(element)>) {
+                            RefPart & ref_part = amr_data->m_particle_container->GetRefParticle();
+                            for (int slice_step = 0; slice_step < element.nslice(); ++slice_step) {
+                                global_step++;
+                                element(ref_part);
+                            }
+                        }
+                    }, element_variant);
+                }
+                continue;
+            }
+
             // loop over all beamline elements
             for (auto &element_variant: m_lattice) {
                 // update element edge of the reference particle
                 amr_data->m_particle_container->SetRefParticleEdge();
 
+                // linear elements are accumulated into the fused transfer map
+                bool const fuse_element = fuse_linear_maps && std::visit([](auto const & element) {
+                    return elements::is_linear_transport_v<decltype(element)>;
+                }, element_variant);
+                // other elements are collected into a lattice segment
+                bool const segment_element = !fuse_element && fuse_segments &&
+                                             is_segment_fusable(element_variant);
+
                 // number of slices used for the application of space charge
                 int nslice = 1;
                 amrex::ParticleReal slice_ds; // in meters
@@ -200,6 +439,9 @@ namespace impactx {
                     }
 
                     // Space-charge calculation: turn off if there is only 1 particle
+                    if (space_charge) {
+                        remove_lost_particles();
+                    }
                     if (space_charge &&
                         amr_data->m_particle_container->TotalNumberOfParticles(true, false)) {
 
@@ -211,34 +453,92 @@ namespace impactx {
                         // Note: The following operation assume that
                         // the particles are in x, y, z coordinates.
 
-                        // Resize the mesh, based on `m_particle_container` extent
-                        ResizeMesh();
-
-                        // Redistribute particles in the new mesh in x, y, z
-                        amr_data->m_particle_container->Redistribute();
-
-                        // charge deposition
-                        amr_data->m_particle_container->DepositCharge(amr_data->m_rho, amr_data->refRatio());
-
-                        // poisson solve in x,y,z
-                        spacecharge::PoissonSolve(*amr_data->m_particle_container, amr_data->m_rho, amr_data->m_phi, amr_data->refRatio());
-
-                        // calculate force in x,y,z
-                        spacecharge::ForceFromSelfFields(amr_data->m_space_charge_field,
-                                                         amr_data->m_phi,
-                                                         amr_data->Geom());
+                        if (!initialization::needs_mesh(space_charge_algo)) {
+                            // grid-free: push with the analytic field of a Gaussian beam with
+                            // the same moments, then transform from x,y,z to x',y',t in the same pass
+                            bool const to_fixed_s = true;
+                            spacecharge::GaussianPush(*amr_data->m_particle_container,
+                                                      space_charge_algo,
+                                                      slice_ds,
+                                                      to_fixed_s);
+                        } else if (space_charge_reuse.can_reuse(*amr_data->m_particle_container, amr_data->Geom(0))) {
+                            // Redistribute particles in the mesh of the last solve in x, y, z,
+                            // if some left the box or level they are stored in
+                            if (needs_redistribute()) {
+                                amr_data->m_particle_container->Redistribute();
+                            }
+
+                            // reuse the force of the last solve
+                            space_charge_reuse.rescale(amr_data->m_space_charge_field);
+                            m_space_charge_reuses++;
+                        } else {
+                            // Resize the mesh, based on `m_particle_container` extent
+                            bool const mesh_resized = ResizeMesh();
+                            if (mesh_resized) { m_mesh_resizes++; }
+
+                            // Redistribute particles in the new mesh in x, y, z,
+                            // unless the mesh was kept and all particles are still in their box and level
+                            if (mesh_resized || needs_redistribute()) {
+                                amr_data->m_particle_container->Redistribute();
+                            }
+
+                            // Distribute the boxes anew over the MPI ranks, if this balances the particles better;
+                            // lost particles are stored in the boxes of the beam particles, so they are written
+                            // first, or, without diagnostics, the boxes are kept while lost particles are stored
+                            if (load_balance.due() &&
+                                (diag_enable || amr_data->m_particles_lost->TotalNumberOfParticles(false, false) == 0)) {
+                                bool remapped = false;
+                                for (int lev = 0; lev <= amr_data->finestLevel(); ++lev) {
+                                    auto const dm = load_balance.balanced_distribution(*amr_data, lev);
+                                    if (!dm.has_value()) { continue; }
+
+                                    if (diag_enable && !remapped) { lost_output.flush(*amr_data->m_particles_lost); }
+
+                                    amr_data->RemapLevel(lev, *dm);
+                                    remapped = true;
+                                    m_load_balance_remaps++;
+                                }
+
+                                // move the particles to the new owners of their boxes
+                                if (remapped) {
+                                    amr_data->m_particle_container->Redistribute();
+                                }
+                            }
+
+                            // charge deposition
+                            amr_data->m_particle_container->DepositCharge(amr_data->m_rho, amr_data->refRatio());
+
+                            if (space_charge_algo == SpaceChargeAlgo::True_2p5D) {
+                                // 2D transverse field, scaled by the line density in z
+                                spacecharge::TransverseSelfFields(amr_data->m_space_charge_field,
+                                                                  amr_data->m_rho,
+                                                                  amr_data->Geom());
+                            } else {
+                                // poisson solve in x,y,z
+                                spacecharge::PoissonSolve(*amr_data->m_particle_container, amr_data->m_rho, amr_data->m_phi,
+                                                          amr_data->m_phi_geom, amr_data->refRatio());
+
+                                // calculate force in x,y,z
+                                spacecharge::ForceFromSelfFields(amr_data->m_space_charge_field,
+                                                                 amr_data->m_phi,
+                                                                 amr_data->Geom());
+                            }
+                            space_charge_reuse.solved();
+                            m_space_charge_solves++;
+                        }
 
                         // gather and space-charge push in x,y,z , assuming the space-charge
-                        // field is the same before/after transformation
+                        // field is the same before/after transformation,
+                        // then transform from x,y,z to x',y',t in the same pass
                         // TODO: This is currently using linear order.
-                        spacecharge::GatherAndPush(*amr_data->m_particle_container,
-                                                   amr_data->m_space_charge_field,
-                                                   amr_data->Geom(),
-                                                   slice_ds);
-
-                        // transform from x,y,z to x',y',t
-                        transformation::CoordinateTransformation(*amr_data->m_particle_container,
-                                                                 CoordSystem::s);
+                        if (initialization::needs_mesh(space_charge_algo)) {
+                            bool const to_fixed_s = true;
+                            spacecharge::GatherAndPush(*amr_data->m_particle_container,
+                                                       amr_data->m_space_charge_field,
+                                                       amr_data->Geom(),
+                                                       slice_ds,
+                                                       to_fixed_s);
+                        }
                     }
 
                     // for later: original Impact implementation as an option
@@ -251,11 +551,71 @@ namespace impactx {
                     // in original Impact, we gather and space-charge push in x',y',t ,
                     // assuming that the distribution did not change
 
-                    // push all particles with external maps
-                    Push(*amr_data->m_particle_container, element_variant, global_step);
-
-                    // move "lost" particles to another particle container
-                    collect_lost_particles(*amr_data->m_particle_container);
+                    if (fuse_element) {
+                        // push the reference particle and accumulate the transfer map of this slice
+                        std::visit([&fused_map, this](auto & element) {
+                            using T_Element = std::decay_t<decltype(element)>;
+                            if constexpr (elements::is_linear_transport_v<T_Element>) {
+                                RefPart & ref_part = amr_data->m_particle_container->GetRefParticle();
+                                element(ref_part);
+                                fused_map = fused_map.then(linear_map(element, ref_part));
+                            }
+                        }, element_variant);
+                        fused_map_pending = true;
+                    } else if (segment_element) {
+                        RefPart & ref_part = amr_data->m_particle_container->GetRefParticle();
+
+                        // the linear elements before this element come first in the segment
+                        if (fused_map_pending) {
+                            segment.push_back({fused_map, ref_part});
+                            fused_map = LinearMap::identity();
+                            fused_map_pending = false;
+                        }
+
+                        // push the reference particle and record this slice,
+                        // with the constants of the element for this slice
+                        std::visit([&ref_part](auto & element) {
+                            if constexpr (is_segment_fusable_v<decltype(element)>) {
+                                element(ref_part);
+                                elements::compute_constants(element, ref_part);
+                            }
+                        }, element_variant);
+                        segment.push_back({element_variant, ref_part});
+                        if (std::visit([](auto const & element) {
+                                return elements::can_lose_particles_v<decltype(element)>;
+                            }, element_variant)) {
+                            segment_lossy_slices++;
+                        }
+                    } else {
+                        // apply the fused elements before this element first
+                        apply_pending_pushes();
+
+                        // elements that are not beam optics, e.g., beam monitors and
+                        // programmable elements, see all particles of the beam
+                        bool const beam_optic = std::visit([](auto const & element) {
+                            using T_Element = std::decay_t<decltype(element)>;
+                            return std::is_base_of_v<elements::BeamOptic<T_Element>, T_Element>;
+                        }, element_variant);
+                        bool const lossy = std::visit([](auto const & element) {
+                            return elements::can_lose_particles_v<decltype(element)>;
+                        }, element_variant);
+                        if (!beam_optic) {
+                            remove_lost_particles();
+                        }
+
+                        // push all particles with external maps
+                        Push(*amr_data->m_particle_container, element_variant, global_step);
+
+                        // move "lost" particles to another particle container
+                        if (!beam_optic) {
+                            collect_lost_particles(*amr_data->m_particle_container);
+                        }
+                        if (lossy) {
+                            collect_lost_in_batches(1);
+                        } else if (diag_enable && !beam_optic) {
+                            lost_output.check_size(*amr_data->m_particles_lost);
+                        }
+                    }
 
                     // just prints an empty newline at the end of the slice_step
                     if (verbose > 0) {
@@ -263,10 +623,9 @@ namespace impactx {
                     }
 
                     // slice-step diagnostics
-                    bool slice_step_diagnostics = false;
-                    pp_diag.queryAdd("slice_step_diagnostics", slice_step_diagnostics);
-
                     if (diag_enable && slice_step_diagnostics) {
+                        remove_lost_particles();
+
                         // print slice step reference particle to file
                         diagnostics::DiagnosticOutput(*amr_data->m_particle_container,
                                                       diagnostics::OutputType::PrintRefParticle,
@@ -289,8 +648,47 @@ namespace impactx {
                 } // end in-element space-charge slice-step loop
 
             } // end beamline element loop
+
+            // keep the map of the first period as the one-turn map
+            if (one_turn_map) {
+                amrex::Real const pt_end = amr_data->m_particle_container->GetRefParticle().pt;
+                bool const periodic = std::abs(pt_end - pt_start) <=
+                    10 * std::numeric_limits<amrex::Real>::epsilon() * std::abs(pt_start);
+                if (periodic) {
+                    one_turn = fused_map;
+                    m_one_turn_map = one_turn;
+                    fused_map = LinearMap::identity();
+                    fused_map_pending = false;
+                    continue;
+                }
+
+                ablastr::warn_manager::WMRecordWarning(
+                    "ImpactX::evolve",
+                    "algo.one_turn_map: the reference energy changes over one period "
+                    "of the lattice, so the maps differ from period to period. "
+                    "The linear maps are rebuilt in every period instead.",
+                    ablastr::warn_manager::WarnPriority::medium
+                );
+                one_turn_map = false;
+            }
+
+            // apply the fused elements of this period
+            apply_pending_pushes();
+
+            // write the particles lost in this period
+            if (diag_enable) {
+                lost_output.end_of_period(*amr_data->m_particles_lost, cycle + 1);
+            }
         } // end periods though the lattice loop
 
+        // apply the one-turn map for all periods in a single pass
+        if (one_turn_map) {
+            push_linear_map(*amr_data->m_particle_container, one_turn.pow(periods));
+        }
+
+        // remove the remaining lost particles from the beam
+        remove_lost_particles();
+
         if (diag_enable)
         {
             // print final reference particle to file
@@ -305,16 +703,15 @@ namespace impactx {
                                           "diags/reduced_beam_characteristics_final",
                                           global_step);
 
-            // output particles lost in apertures
-            if (amr_data->m_particles_lost->TotalNumberOfParticles() > 0)
-            {
-                std::string openpmd_backend = "default";
-                pp_diag.queryAdd("backend", openpmd_backend);
+            // output the remaining particles lost in apertures
+            lost_output.finalize(*amr_data->m_particles_lost);
 
-                diagnostics::BeamMonitor output_lost("particles_lost", openpmd_backend, "g");
-                output_lost(*amr_data->m_particles_lost, 0);
-                output_lost.finalize();
-            }
+            // write the buffered rows of the reduced diagnostics
+            diagnostics::flush_diagnostics();
+        }
+
+        if (verbose > 0) {
+            elements::SIMDReport::print();
         }
 
         // loop over all beamline elements & finalize them
@@ -0,0 +1,271 @@
+/* Copyright 2022-2023 The Regents of the University of California, through Lawrence
+ *           Berkeley National Laboratory (subject to receipt of any required
+ *           approvals from the U.S. Dept. of Energy). All rights reserved.
+ *
+ * This file is part of ImpactX.
+ *
+ * Authors: Axel Huebl, Chad Mitchell
+ * License: BSD-3-Clause-LBNL
+ */
+#include "Envelope.H"
+
+#include "particles/diagnostics/EmittanceInvariants.H"
+
+#include <ablastr/constant.H>
+
+#include <AMReX_BLProfiler.H>           // for TinyProfiler
+#include <AMReX_GpuQualifiers.H>        // for AMREX_GPU_DEVICE
+#include <AMReX_ParallelDescriptor.H>   // for ParallelDescriptor
+#include <AMReX_ParticleReduce.H>       // for ParticleReduce
+#include <AMReX_Reduce.H>               // for ReduceOps
+#include <AMReX_TypeList.H>             // for TypeMultiplier
+
+#include <cmath>
+#include <limits>
+#include <vector>
+
+
+namespace impactx::envelope
+{
+    void
+    Envelope::push (LinearMap const & map)
+    {
+        using namespace amrex::literals; // for _rt and _prt
+
+        // centroid: R mean + c
+        LinearMap::Vector6 mean_out;
+        for (int i = 1; i <= 6; ++i) {
+            amrex::Real sum = map.c(i);
+            for (int k = 1; k <= 6; ++k) {
+                sum += map.R(i, k) * mean(k);
+            }
+            mean_out(i) = sum;
+        }
+        mean = mean_out;
+
+        // covariance matrix: R cov R^T
+        LinearMap::Matrix6x6 tmp;
+        for (int i = 1; i <= 6; ++i) {
+            for (int j = 1; j <= 6; ++j) {
+                amrex::Real sum = 0.0_rt;
+                for (int k = 1; k <= 6; ++k) {
+                    sum += map.R(i, k) * cov(k, j);
+                }
+                tmp(i, j) = sum;
+            }
+        }
+        for (int i = 1; i <= 6; ++i) {
+            for (int j = 1; j <= 6; ++j) {
+                amrex::Real sum = 0.0_rt;
+                for (int k = 1; k <= 6; ++k) {
+                    sum += tmp(i, k) * map.R(j, k);
+                }
+                cov(i, j) = sum;
+            }
+        }
+    }
+
+    Envelope
+    envelope_from_particles (ImpactXParticleContainer const & pc)
+    {
+        BL_PROFILE("impactx::envelope::envelope_from_particles");
+
+        using PType = typename ImpactXParticleContainer::SuperParticleType;
+
+        /* The variables below need to be static to work around an MSVC bug
+         * https://stackoverflow.com/questions/55136414/constexpr-variable-captured-inside-lambda-loses-its-constexpr-ness
+         */
+        // weight and weighted sums of x, px, y, py, t, pt
+        static constexpr std::size_t num_red_ops_1 = 7;
+        amrex::TypeMultiplier<amrex::ReduceOps, amrex::ReduceOpSum[num_red_ops_1]> reduce_ops_1;
+        using ReducedDataT1 = amrex::TypeMultiplier<amrex::ReduceData, amrex::Real[num_red_ops_1]>;
+
+        auto r1 = amrex::ParticleReduce<ReducedDataT1>(
+            pc,
+            [=] AMREX_GPU_DEVICE(const PType& p) noexcept -> ReducedDataT1::Type
+            {
+                const amrex::Real p_w = p.rdata(RealSoA::w);
+                return {p_w,
+                        p.rdata(RealSoA::x) * p_w, p.rdata(RealSoA::px) * p_w,
+                        p.rdata(RealSoA::y) * p_w, p.rdata(RealSoA::py) * p_w,
+                        p.rdata(RealSoA::t) * p_w, p.rdata(RealSoA::pt) * p_w};
+            },
+            reduce_ops_1
+        );
+
+        std::vector<amrex::Real> values_1st(num_red_ops_1);
+        amrex::constexpr_for<0, num_red_ops_1> ([&](auto i) {
+            values_1st[i] = amrex::get<i>(r1);
+        });
+        amrex::ParallelAllReduce::Sum(
+            values_1st.data(),
+            values_1st.size(),
+            amrex::ParallelDescriptor::Communicator()
+        );
+
+        amrex::Real const w_sum = values_1st.at(0);
+
+        Envelope env;
+        for (int i = 1; i <= 6; ++i) {
+            env.mean(i) = values_1st.at(i) / w_sum;
+        }
+        env.charge = pc.GetRefParticle().charge * w_sum;
+
+        // upper triangle of the covariance matrix
+        static constexpr std::size_t num_red_ops_2 = 21;
+        amrex::TypeMultiplier<amrex::ReduceOps, amrex::ReduceOpSum[num_red_ops_2]> reduce_ops_2;
+        using ReducedDataT2 = amrex::TypeMultiplier<amrex::ReduceData, amrex::Real[num_red_ops_2]>;
+
+        LinearMap::Vector6 const mean = env.mean;
+        auto r2 = amrex::ParticleReduce<ReducedDataT2>(
+            pc,
+            [=] AMREX_GPU_DEVICE(const PType& p) noexcept -> ReducedDataT2::Type
+            {
+                const amrex::Real p_w = p.rdata(RealSoA::w);
+                const amrex::Real dx  = p.rdata(RealSoA::x)  - mean(1);
+                const amrex::Real dpx = p.rdata(RealSoA::px) - mean(2);
+                const amrex::Real dy  = p.rdata(RealSoA::y)  - mean(3);
+                const amrex::Real dpy = p.rdata(RealSoA::py) - mean(4);
+                const amrex::Real dt  = p.rdata(RealSoA::t)  - mean(5);
+                const amrex::Real dpt = p.rdata(RealSoA::pt) - mean(6);
+
+                return {dx*dx*p_w, dx*dpx*p_w, dx*dy*p_w, dx*dpy*p_w, dx*dt*p_w, dx*dpt*p_w,
+                        dpx*dpx*p_w, dpx*dy*p_w, dpx*dpy*p_w, dpx*dt*p_w, dpx*dpt*p_w,
+                        dy*dy*p_w, dy*dpy*p_w, dy*dt*p_w, dy*dpt*p_w,
+                        dpy*dpy*p_w, dpy*dt*p_w, dpy*dpt*p_w,
+                        dt*dt*p_w, dt*dpt*p_w,
+                        dpt*dpt*p_w};
+            },
+            reduce_ops_2
+        );
+
+        std::vector<amrex::Real> values_2nd(num_red_ops_2);
+        amrex::constexpr_for<0, num_red_ops_2> ([&](auto i) {
+            values_2nd[i] = amrex::get<i>(r2);
+        });
+        amrex::ParallelAllReduce::Sum(
+            values_2nd.data(),
+            values_2nd.size(),
+            amrex::ParallelDescriptor::Communicator()
+        );
+
+        int idx = 0;
+        for (int i = 1; i <= 6; ++i) {
+            for (int j = i; j <= 6; ++j) {
+                env.cov(i, j) = values_2nd.at(idx++) / w_sum;
+                env.cov(j, i) = env.cov(i, j);
+            }
+        }
+
+        return env;
+    }
+
+    LinearMap
+    space_charge_kv (
+        Envelope const & env,
+        RefPart const & refpart,
+        amrex::Real current,
+        amrex::Real ds
+    )
+    {
+        using namespace amrex::literals; // for _rt and _prt
+        using ablastr::constant::math::pi;
+        using ablastr::constant::SI::c;
+        using ablastr::constant::SI::ep0;
+
+        LinearMap kick = LinearMap::identity();
+        if (current == 0.0_rt) { return kick; }
+
+        // generalized perveance of the beam
+        amrex::Real const betgam = refpart.beta_gamma();
+        amrex::Real const I_A = 4.0_rt * pi * ep0 * refpart.mass * std::pow(c, 3) / refpart.charge;
+        amrex::Real const K = std::abs(current / I_A) * 2.0_rt / std::pow(betgam, 3);
+
+        // transverse second moments
+        amrex::Real const sxx = env.cov(1, 1);
+        amrex::Real const sxy = env.cov(1, 3);
+        amrex::Real const syy = env.cov(3, 3);
+
+        // The uniform ellipse with covariance S kicks by (K ds / 2) (sqrt(S) tr(sqrt(S)))^-1,
+        // which is (K ds / 2) (adj(S) + sqrt(det S)) / D in closed form.
+        amrex::Real const sqrt_det = std::sqrt(sxx * syy - sxy * sxy);
+        amrex::Real const D = (sqrt_det + sxx) * (sqrt_det + syy) - sxy * sxy;
+        amrex::Real const coeff = 0.5_rt * K * ds / D;
+
+        kick.R(2, 1) = coeff * (sqrt_det + syy);
+        kick.R(2, 3) = -coeff * sxy;
+        kick.R(4, 1) = -coeff * sxy;
+        kick.R(4, 3) = coeff * (sqrt_det + sxx);
+
+        return kick;
+    }
+
+    std::unordered_map<std::string, amrex::Real>
+    reduced_beam_characteristics (Envelope const & env)
+    {
+        amrex::Real const nan = std::numeric_limits<amrex::Real>::quiet_NaN();
+
+        // mean square and correlation values
+        amrex::Real const x_ms  = env.cov(1, 1);
+        amrex::Real const px_ms = env.cov(2, 2);
+        amrex::Real const y_ms  = env.cov(3, 3);
+        amrex::Real const py_ms = env.cov(4, 4);
+        amrex::Real const t_ms  = env.cov(5, 5);
+        amrex::Real const pt_ms = env.cov(6, 6);
+        amrex::Real const xpx = env.cov(1, 2);
+        amrex::Real const ypy = env.cov(3, 4);
+        amrex::Real const tpt = env.cov(5, 6);
+        // RMS emittances
+        amrex::Real const emittance_x = std::sqrt(x_ms*px_ms-xpx*xpx);
+        amrex::Real const emittance_y = std::sqrt(y_ms*py_ms-ypy*ypy);
+        amrex::Real const emittance_t = std::sqrt(t_ms*pt_ms-tpt*tpt);
+
+        std::unordered_map<std::string, amrex::Real> data;
+        data["x_mean"] = env.mean(1);
+        data["x_min"] = nan;
+        data["x_max"] = nan;
+        data["y_mean"] = env.mean(3);
+        data["y_min"] = nan;
+        data["y_max"] = nan;
+        data["t_mean"] = env.mean(5);
+        data["t_min"] = nan;
+        data["t_max"] = nan;
+        data["sig_x"] = std::sqrt(x_ms);
+        data["sig_y"] = std::sqrt(y_ms);
+        data["sig_t"] = std::sqrt(t_ms);
+        data["px_mean"] = env.mean(2);
+        data["px_min"] = nan;
+        data["px_max"] = nan;
+        data["py_mean"] = env.mean(4);
+        data["py_min"] = nan;
+        data["py_max"] = nan;
+        data["pt_mean"] = env.mean(6);
+        data["pt_min"] = nan;
+        data["pt_max"] = nan;
+        data["sig_px"] = std::sqrt(px_ms);
+        data["sig_py"] = std::sqrt(py_ms);
+        data["sig_pt"] = std::sqrt(pt_ms);
+        data["emittance_x"] = emittance_x;
+        data["emittance_y"] = emittance_y;
+        data["emittance_t"] = emittance_t;
+        data["alpha_x"] = - xpx / emittance_x;
+        data["alpha_y"] = - ypy / emittance_y;
+        data["alpha_t"] = - tpt / emittance_t;
+        data["beta_x"] = x_ms / emittance_x;
+        data["beta_y"] = y_ms / emittance_y;
+        data["beta_t"] = t_ms / emittance_t;
+        data["charge_C"] = env.charge;
+
+        // eigen-emittances and 4D/6D emittances of the coupled beam
+        diagnostics::EigenEmittances const eigen =
+            diagnostics::eigen_emittances(env.cov, {emittance_x, emittance_y, emittance_t});
+        data["emittance_1"] = eigen.emittance_1;
+        data["emittance_2"] = eigen.emittance_2;
+        data["emittance_3"] = eigen.emittance_3;
+        data["emittance_4d"] = eigen.emittance_4d;
+        data["emittance_6d"] = eigen.emittance_6d;
+
+        return data;
+    }
+
+} // namespace impactx::envelope
@@ -0,0 +1,187 @@
+/* Copyright 2022-2023 The Regents of the University of California, through Lawrence
+ *           Berkeley National Laboratory (subject to receipt of any required
+ *           approvals from the U.S. Dept. of Energy). All rights reserved.
+ *
+ * This file is part of ImpactX.
+ *
+ * Authors: Axel Huebl, Chad Mitchell
+ * License: BSD-3-Clause-LBNL
+ */
+#include "ImpactX.H"
+#include "Envelope.H"
+#include "initialization/Algorithms.H"
+#include "particles/ImpactXParticleContainer.H"
+#include "particles/LinearMap.H"
+#include "particles/diagnostics/DiagnosticOutput.H"
+
+#include <ablastr/warn_manager/WarnManager.H>
+
+#include <AMReX_BLProfiler.H>
+#include <AMReX_ParmParse.H>
+#include <AMReX_Print.H>
+
+#include <stdexcept>
+#include <string>
+#include <type_traits>
+
+
+namespace impactx
+{
+    void ImpactX::track_envelope ()
+    {
+        BL_PROFILE("ImpactX::track_envelope");
+
+        // verbosity
+        amrex::ParmParse pp_impactx("impactx");
+        int verbose = 1;
+        pp_impactx.queryAdd("verbose", verbose);
+
+        // a global step for diagnostics including space charge slice steps in elements
+        int global_step = 0;
+
+        // check typos in inputs after step 1
+        bool early_params_checked = false;
+
+        amrex::ParmParse pp_diag("diag");
+        bool diag_enable = true;
+        pp_diag.queryAdd("enable", diag_enable);
+        bool slice_step_diagnostics = false;
+        pp_diag.queryAdd("slice_step_diagnostics", slice_step_diagnostics);
+
+        // linear space charge of a KV beam with a given current
+        SpaceChargeAlgo const space_charge_algo = initialization::get_space_charge_algo();
+        bool const space_charge = space_charge_algo != SpaceChargeAlgo::False;
+        amrex::Real current = 0.0;
+        if (space_charge) {
+            amrex::ParmParse pp_beam("beam");
+            AMREX_ALWAYS_ASSERT_WITH_MESSAGE(pp_beam.query("current", current),
+                "algo.track = envelope: beam.current must be set for space charge.");
+        }
+
+        // periods through the lattice
+        int periods = 1;
+        amrex::ParmParse("lattice").queryAdd("periods", periods);
+
+        if (verbose > 0) {
+            amrex::Print() << " Envelope tracking\n";
+            amrex::Print() << " Diagnostics: " << diag_enable << "\n";
+            amrex::Print() << " Space Charge effects: " << initialization::to_string(space_charge_algo) << "\n";
+        }
+
+        ImpactXParticleContainer & pc = *amr_data->m_particle_container;
+
+        // the initial envelope is computed from the beam particles
+        envelope::Envelope env = envelope::envelope_from_particles(pc);
+        // total transfer map, to transport the beam particles once at the end
+        LinearMap total_map = LinearMap::identity();
+
+        if (diag_enable)
+        {
+            // print initial reference particle and reduced beam characteristics to file
+            diagnostics::DiagnosticOutput(pc.GetRefParticle(), {},
+                                          diagnostics::OutputType::PrintRefParticle,
+                                          "diags/ref_particle",
+                                          global_step);
+            diagnostics::DiagnosticOutput(pc.GetRefParticle(),
+                                          envelope::reduced_beam_characteristics(env),
+                                          diagnostics::OutputType::PrintReducedBeamCharacteristics,
+                                          "diags/reduced_beam_characteristics");
+        }
+
+        bool monitor_warned = false;
+        for (int cycle=0; cycle < periods; ++cycle) {
+            // loop over all beamline elements
+            for (auto & element_variant : m_lattice) {
+                // update element edge of the reference particle
+                pc.SetRefParticleEdge();
+
+                std::visit([&](auto & element) {
+                    using T_Element = std::decay_t<decltype(element)>;
+                    if constexpr (elements::is_linear_transport_v<T_Element>) {
+                        int const nslice = element.nslice();
+                        amrex::Real const slice_ds = element.ds() / nslice;
+
+                        for (int slice_step = 0; slice_step < nslice; ++slice_step) {
+                            global_step++;
+                            RefPart & ref_part = pc.GetRefParticle();
+
+                            // space charge kick at the entry of the slice
+                            if (space_charge && slice_ds > 0.0) {
+                                LinearMap const kick = envelope::space_charge_kv(env, ref_part, current, slice_ds);
+                                env.push(kick);
+                                total_map = total_map.then(kick);
+                            }
+
+                            // push the reference particle, then the envelope
+                            element(ref_part);
+                            LinearMap const map = linear_map(element, ref_part);
+                            env.push(map);
+                            total_map = total_map.then(map);
+
+                            // slice-step diagnostics
+                            if (diag_enable && slice_step_diagnostics) {
+                                diagnostics::DiagnosticOutput(ref_part, {},
+                                                              diagnostics::OutputType::PrintRefParticle,
+                                                              "diags/ref_particle",
+                                                              global_step,
+                                                              true);
+                                diagnostics::DiagnosticOutput(ref_part,
+                                                              envelope::reduced_beam_characteristics(env),
+                                                              diagnostics::OutputType::PrintReducedBeamCharacteristics,
+                                                              "diags/reduced_beam_characteristics",
+                                                              global_step,
+                                                              true);
+                            }
+                        }
+                    } else if constexpr (std::is_same_v<T_Element, diagnostics::BeamMonitor>) {
+                        // beam monitors write particle data, which are not tracked here
+                        if (!monitor_warned) {
+                            ablastr::warn_manager::WMRecordWarning(
+                                "ImpactX::track_envelope",
+                                "algo.track = envelope: beam monitors are skipped, "
+                                "since the beam particles are only pushed at the end.",
+                                ablastr::warn_manager::WarnPriority::low
+                            );
+                            monitor_warned = true;
+                        }
+                    } else {
+                        throw std::runtime_error(
+                            std::string("algo.track = envelope: the element ") + T_Element::name +
+                            " has no linear transfer map and cannot be used in envelope tracking.");
+                    }
+                }, element_variant);
+
+                // inputs: unused parameters (e.g. typos) check after the first element
+                if (!early_params_checked) { early_params_checked = early_param_check(); }
+            } // end beamline element loop
+        } // end periods though the lattice loop
+
+        // transport the beam particles with the same maps
+        push_linear_map(pc, total_map);
+
+        if (diag_enable)
+        {
+            // print final reference particle and reduced beam characteristics to file
+            diagnostics::DiagnosticOutput(pc.GetRefParticle(), {},
+                                          diagnostics::OutputType::PrintRefParticle,
+                                          "diags/ref_particle_final",
+                                          global_step);
+            diagnostics::DiagnosticOutput(pc.GetRefParticle(),
+                                          envelope::reduced_beam_characteristics(env),
+                                          diagnostics::OutputType::PrintReducedBeamCharacteristics,
+                                          "diags/reduced_beam_characteristics_final",
+                                          global_step);
+
+            // write the buffered rows of the reduced diagnostics
+            diagnostics::flush_diagnostics();
+        }
+
+        // loop over all beamline elements & finalize them
+        for (auto & element_variant : m_lattice)
+        {
+            std::visit([](auto&& element){
+                element.finalize();
+            }, element_variant);
+        }
+    }
+} // namespace impactx
@@ -0,0 +1,79 @@
+/* Copyright 2022-2023 The Regents of the University of California, through Lawrence
+ *           Berkeley National Laboratory (subject to receipt of any required
+ *           approvals from the U.S. Dept. of Energy). All rights reserved.
+ *
+ * This file is part of ImpactX.
+ *
+ * Authors: Axel Huebl, Chad Mitchell
+ * License: BSD-3-Clause-LBNL
+ */
+#include "Algorithms.H"
+
+#include <AMReX_ParmParse.H>
+
+#include <algorithm>
+#include <cctype>
+#include <stdexcept>
+#include <string>
+
+
+namespace impactx::initialization
+{
+    SpaceChargeAlgo
+    parse_space_charge_algo (std::string const & value)
+    {
+        std::string lower = value;
+        std::transform(lower.begin(), lower.end(), lower.begin(),
+                       [](unsigned char c) { return std::tolower(c); });
+
+        if (lower == "false" || lower == "0" || lower == "off") {
+            return SpaceChargeAlgo::False;
+        }
+        if (lower == "true" || lower == "1" || lower == "3d") {
+            return SpaceChargeAlgo::True_3D;
+        }
+        if (lower == "2.5d") {
+            return SpaceChargeAlgo::True_2p5D;
+        }
+        if (lower == "gauss3d") {
+            return SpaceChargeAlgo::Gauss_3D;
+        }
+        if (lower == "gauss2.5d") {
+            return SpaceChargeAlgo::Gauss_2p5D;
+        }
+        throw std::runtime_error("algo.space_charge must be false, true, 3D, 2.5D, Gauss3D or Gauss2.5D but is: " + value);
+    }
+
+    SpaceChargeAlgo
+    get_space_charge_algo ()
+    {
+        amrex::ParmParse pp_algo("algo");
+        std::string space_charge = "false";
+        pp_algo.queryAdd("space_charge", space_charge);
+
+        return parse_space_charge_algo(space_charge);
+    }
+
+    std::string
+    to_string (SpaceChargeAlgo algo)
+    {
+        switch (algo) {
+            case SpaceChargeAlgo::True_3D:
+                return "3D";
+            case SpaceChargeAlgo::True_2p5D:
+                return "2.5D";
+            case SpaceChargeAlgo::Gauss_3D:
+                return "Gauss3D";
+            case SpaceChargeAlgo::Gauss_2p5D:
+                return "Gauss2.5D";
+            default:
+                return "false";
+        }
+    }
+
+    bool
+    needs_mesh (SpaceChargeAlgo algo)
+    {
+        return algo == SpaceChargeAlgo::True_3D || algo == SpaceChargeAlgo::True_2p5D;
+    }
+} // namespace impactx::initialization
@@ -12,6 +12,9 @@
 #include "initialization/InitMeshRefinement.H"
 
 #include <AMReX.H>
+#include <AMReX_BLProfiler.H>
+
+#include <utility>
 
 
 namespace impactx::initialization
@@ -196,6 +199,31 @@ namespace impactx::initialization
     {
         m_rho.erase(lev);
         m_phi.erase(lev);
+        if (lev == 0) { m_phi_geom.reset(); }
         m_space_charge_field.erase(lev);
     }
+
+    void
+    AmrCoreData::RemapLevel (int lev, amrex::DistributionMapping const & dm)
+    {
+        BL_PROFILE("AmrCoreData::RemapLevel");
+
+        // keep the potential and the space charge field, which can be reused in the next solve
+        amrex::MultiFab const old_phi = std::move(m_phi.at(lev));
+        auto const old_space_charge_field = std::move(m_space_charge_field.at(lev));
+        std::optional<amrex::Geometry> const phi_geom = m_phi_geom;
+
+        ClearLevel(lev);
+        SetDistributionMap(lev, dm);
+        MakeNewLevelFromScratch(lev, 0.0, boxArray(lev), dm);
+        m_phi_geom = phi_geom;
+
+        auto const copy = [](amrex::MultiFab & dst, amrex::MultiFab const & src) {
+            dst.ParallelCopy(src, 0, 0, src.nComp(), src.nGrowVect(), dst.nGrowVect());
+        };
+        copy(m_phi.at(lev), old_phi);
+        for (auto & [comp, field] : m_space_charge_field.at(lev)) {
+            copy(field, old_space_charge_field.at(comp));
+        }
+    }
 } // namespace impactx::initialization
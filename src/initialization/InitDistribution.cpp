@@ -10,6 +10,7 @@
 #include "initialization/InitDistribution.H"
 
 #include "ImpactX.H"
+#include "initialization/Algorithms.H"
 #include "particles/ImpactXParticleContainer.H"
 #include "particles/distribution/All.H"
 
@@ -36,7 +37,7 @@ namespace impactx
     ImpactX::add_particles (
         amrex::ParticleReal bunch_charge,
         distribution::KnownDistributions distr,
-        int npart
+        amrex::Long npart
     )
     {
         BL_PROFILE("ImpactX::add_particles");
@@ -68,9 +69,9 @@ namespace impactx
         // redistribute particles so that they reside on the correct MPI rank.
         int const myproc = amrex::ParallelDescriptor::MyProc();
         int const nprocs = amrex::ParallelDescriptor::NProcs();
-        int const navg = npart / nprocs;
-        int const nleft = npart - navg * nprocs;
-        int npart_this_proc = (myproc < nleft) ? navg+1 : navg;
+        amrex::Long const navg = npart / nprocs;
+        amrex::Long const nleft = npart - navg * nprocs;
+        amrex::Long const npart_this_proc = (myproc < nleft) ? navg+1 : navg;
         auto const rel_part_this_proc =
             amrex::ParticleReal(npart_this_proc) / amrex::ParticleReal(npart);
 
@@ -109,13 +110,11 @@ namespace impactx
                                                       ref.qm_qeeV(),
                                             bunch_charge * rel_part_this_proc);
 
-        bool space_charge = false;
-        amrex::ParmParse pp_algo("algo");
-        pp_algo.queryAdd("space_charge", space_charge);
+        bool const space_charge_mesh = initialization::needs_mesh(initialization::get_space_charge_algo());
 
-        // For pure tracking simulations, we keep the particles split equally
-        // on all MPI ranks, and ignore spatial "RealBox" extents of grids.
-        if (space_charge) {
+        // For pure tracking simulations and grid-free space charge, we keep the
+        // particles split equally on all MPI ranks, and ignore spatial "RealBox" extents of grids.
+        if (space_charge_mesh) {
             // Resize the mesh to fit the spatial extent of the beam and then
             // redistribute particles, so they reside on the MPI rank that is
             // responsible for the respective spatial particle position.
@@ -251,7 +250,7 @@ namespace impactx
         amr_data->m_particle_container->GetRefParticle()
                 .set_charge_qe(qe).set_mass_MeV(massE).set_kin_energy_MeV(kin_energy);
 
-        int npart = 1;  // Number of simulation particles
+        amrex::Long npart = 1;  // Number of simulation particles
         pp_dist.get("npart", npart);
 
         std::string unit_type;  // System of units
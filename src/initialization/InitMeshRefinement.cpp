@@ -8,6 +8,7 @@
  * License: BSD-3-Clause-LBNL
  */
 #include "ImpactX.H"
+#include "initialization/Algorithms.H"
 #include "initialization/InitAmrCore.H"
 #include "particles/ImpactXParticleContainer.H"
 #include "particles/distribution/Waterbag.H"
@@ -77,23 +78,18 @@ namespace detail
     }
 }
 
-    void ImpactX::ResizeMesh ()
+    bool ImpactX::ResizeMesh ()
     {
         BL_PROFILE("ImpactX::ResizeMesh");
 
-        {
-            amrex::ParmParse pp_algo("algo");
-            bool space_charge = false;
-            pp_algo.query("space_charge", space_charge);
-            if (!space_charge)
-                ablastr::warn_manager::WMRecordWarning(
-                    "ImpactX::ResizeMesh",
-                    "This is a simulation without space charge. "
-                    "ResizeMesh (and pc.Redistribute) should only be called "
-                    "in space charge simulations.",
-                    ablastr::warn_manager::WarnPriority::high
-                );
-        }
+        if (!initialization::needs_mesh(initialization::get_space_charge_algo()))
+            ablastr::warn_manager::WMRecordWarning(
+                "ImpactX::ResizeMesh",
+                "This is a simulation without space charge on the mesh. "
+                "ResizeMesh (and pc.Redistribute) should only be called "
+                "in space charge simulations with algo.space_charge = 3D or 2.5D.",
+                ablastr::warn_manager::WarnPriority::high
+            );
 
         // Extract the min and max of the particle positions
         auto const [x_min, y_min, z_min, x_max, y_max, z_max] = amr_data->m_particle_container->MinAndMaxPositions();
@@ -121,6 +117,30 @@ namespace detail
             amrex::RealVect const beam_padding = beam_width * (frac - 1.0) / 2.0;
             //                           added to the beam extent --^         ^-- box half above/below the beam
 
+            // hysteresis: keep the current mesh while the beam stays well inside
+            // and still fills enough of it
+            bool resize_hysteresis = false;
+            amrex::Real resize_margin = 0.5;
+            amrex::Real resize_fill_fraction = 0.8;
+            pp_geometry.queryAdd("resize_hysteresis", resize_hysteresis);
+            pp_geometry.queryAdd("resize_margin", resize_margin);
+            pp_geometry.queryAdd("resize_fill_fraction", resize_fill_fraction);
+            if (resize_hysteresis)
+            {
+                amrex::RealBox const & domain = amr_data->Geom(0).ProbDomain();
+                bool keep = true;
+                for (int d = 0; d < AMREX_SPACEDIM; ++d)
+                {
+                    amrex::Real const domain_width = domain.hi(d) - domain.lo(d);
+                    amrex::Real const margin = resize_margin * beam_padding[d];
+                    bool const inside = beam_min[d] >= domain.lo(d) + margin &&
+                                        beam_max[d] <= domain.hi(d) - margin;
+                    bool const filled = beam_width[d] * frac >= resize_fill_fraction * domain_width;
+                    keep = keep && inside && filled;
+                }
+                if (keep) { return false; }
+            }
+
             // In AMReX, all levels have the same problem domain, that of the
             // coarsest level, even if only partly covered.
             for (int lev = 0; lev <= amr_data->finestLevel(); ++lev)
@@ -142,6 +162,15 @@ namespace detail
 
             if (amr_data->maxLevel() > 1)
                 amrex::Abort("Did not implement ResizeMesh for static domains and >1 MR levels.");
+
+            // the static domain is only changed by the user
+            amrex::RealBox const & domain = amr_data->Geom(0).ProbDomain();
+            bool unchanged = true;
+            for (int d = 0; d < AMREX_SPACEDIM; ++d)
+            {
+                unchanged = unchanged && rb[0].lo(d) == domain.lo(d) && rb[0].hi(d) == domain.hi(d);
+            }
+            if (unchanged) { return false; }
         }
 
         // updating geometry.prob_lo/hi for consistency
@@ -161,5 +190,7 @@ namespace detail
 
             amr_data->m_particle_container->SetParticleGeometry(lev, g);
         }
+
+        return true;
     }
 } // namespace impactx
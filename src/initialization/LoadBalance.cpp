@@ -0,0 +1,90 @@
+/* Copyright 2022-2023 The Regents of the University of California, through Lawrence
+ *           Berkeley National Laboratory (subject to receipt of any required
+ *           approvals from the U.S. Dept. of Energy). All rights reserved.
+ *
+ * This file is part of ImpactX.
+ *
+ * Authors: Axel Huebl, Chad Mitchell
+ * License: BSD-3-Clause-LBNL
+ */
+#include "LoadBalance.H"
+
+#include <AMReX_BLProfiler.H>
+#include <AMReX_INT.H>
+#include <AMReX_ParallelDescriptor.H>
+#include <AMReX_ParmParse.H>
+
+#include <algorithm>
+#include <numeric>
+#include <stdexcept>
+
+
+namespace impactx::initialization
+{
+    LoadBalance::LoadBalance ()
+    {
+        amrex::ParmParse pp_algo("algo");
+        pp_algo.queryAdd("load_balance_interval", m_interval);
+        pp_algo.queryAdd("load_balance_threshold", m_threshold);
+        pp_algo.queryAdd("load_balance_strategy", m_strategy);
+        AMREX_ALWAYS_ASSERT_WITH_MESSAGE(m_interval >= 0,
+            "algo.load_balance_interval must not be negative.");
+        AMREX_ALWAYS_ASSERT_WITH_MESSAGE(m_threshold >= 1.0,
+            "algo.load_balance_threshold must be at least 1.");
+        if (m_strategy != "knapsack" && m_strategy != "sfc") {
+            throw std::runtime_error("algo.load_balance_strategy must be either 'knapsack' or 'sfc', but is '" + m_strategy + "'.");
+        }
+    }
+
+    bool
+    LoadBalance::due ()
+    {
+        if (m_interval <= 0) { return false; }
+
+        m_num_steps++;
+        return m_num_steps % m_interval == 0;
+    }
+
+    std::optional<amrex::DistributionMapping>
+    LoadBalance::balanced_distribution (AmrCoreData const & amr_data, int lev) const
+    {
+        BL_PROFILE("impactx::initialization::LoadBalance::balanced_distribution");
+
+        // the cost of a box is its number of beam particles, on all MPI ranks;
+        // one more per box keeps empty boxes distributed
+        bool const only_valid = true;
+        bool const only_local = false;
+        amrex::Vector<amrex::Long> const num_particles =
+            amr_data.m_particle_container->NumberOfParticlesInGrid(lev, only_valid, only_local);
+        amrex::Vector<amrex::Real> costs(num_particles.size());
+        std::transform(num_particles.begin(), num_particles.end(), costs.begin(),
+                       [](amrex::Long np) { return amrex::Real(np) + 1.0; });
+
+        amrex::Real const current_efficiency = efficiency(costs, amr_data.DistributionMap(lev));
+
+        amrex::Real new_efficiency = 0.0;
+        amrex::DistributionMapping dm = m_strategy == "sfc"
+            ? amrex::DistributionMapping::makeSFC(costs, amr_data.boxArray(lev), new_efficiency)
+            : amrex::DistributionMapping::makeKnapSack(costs, new_efficiency);
+
+        if (new_efficiency <= m_threshold * current_efficiency) { return std::nullopt; }
+
+        return dm;
+    }
+
+    amrex::Real
+    LoadBalance::efficiency (amrex::Vector<amrex::Real> const & costs,
+                             amrex::DistributionMapping const & dm)
+    {
+        int const nprocs = amrex::ParallelDescriptor::NProcs();
+        amrex::Vector<amrex::Real> rank_costs(nprocs, 0.0);
+        for (int i = 0; i < static_cast<int>(costs.size()); ++i) {
+            rank_costs[dm[i]] += costs[i];
+        }
+
+        amrex::Real const max_cost = *std::max_element(rank_costs.begin(), rank_costs.end());
+        amrex::Real const avg_cost = std::accumulate(rank_costs.begin(), rank_costs.end(), amrex::Real(0.0)) / nprocs;
+        return max_cost > 0.0 ? avg_cost / max_cost : 1.0;
+    }
+
+} // namespace impactx::initialization
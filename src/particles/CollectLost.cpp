@@ -15,6 +15,9 @@
 #include <AMReX_Particle.H>
 #include <AMReX_ParticleTransformation.H>
 #include <AMReX_RandomEngine.H>
+#include <AMReX_Reduce.H>
+
+#include <cstdint>
 
 
 namespace impactx
@@ -50,10 +53,11 @@ namespace impactx
         }
     };
 
-    void collect_lost_particles (ImpactXParticleContainer& source)
+    long collect_lost_particles (ImpactXParticleContainer& source, bool remove)
     {
         BL_PROFILE("impactX::collect_lost_particles");
 
+        using namespace amrex::literals; // for _rt and _prt
         using SrcData = ImpactXParticleContainer::ParticleTileType::ConstParticleTileDataType;
 
         ImpactXParticleContainer& dest = *source.GetLostParticleContainer();
@@ -67,6 +71,9 @@ namespace impactx
         dest.reserveData();
         dest.resizeData();
 
+        // lost particles that are not yet removed from the source
+        long num_lost_pending = 0;
+
         // copy all particles marked with a negative ID from source to destination
         int const nLevel = source.finestLevel();
         for (int lev = 0; lev <= nLevel; ++lev) {
@@ -83,54 +90,77 @@ namespace impactx
                 auto const np = ptile_source.numParticles();
                 if (np == 0) continue;  // no particles in source tile
 
-                // we will copy particles that were marked as lost, with a negative id
+                // we will copy particles that were marked as lost, with a negative id,
+                // unless they were already copied before, indicated by a zero weight
                 auto const predicate = [] AMREX_GPU_HOST_DEVICE (const SrcData& src, int ip)
                 /* NVCC 11.3.109 chokes in C++17 on this: noexcept */
                 {
-                    return !amrex::ConstParticleIDWrapper{src.m_idcpu[ip]}.is_valid();
+                    return !amrex::ConstParticleIDWrapper{src.m_idcpu[ip]}.is_valid() &&
+                           src.m_rdata[RealSoA::w][ip] != 0.0_prt;
                 };
 
-                auto& ptile_dest = dest.DefineAndReturnParticleTile(
-                        lev, pti.index(), pti.LocalTileIndex());
-
-                // count how many particles we will copy
-                amrex::ReduceOps<amrex::ReduceOpSum> reduce_op;
-                amrex::ReduceData<int> reduce_data(reduce_op);
+                // count how many particles are lost and how many we will copy
+                amrex::ReduceOps<amrex::ReduceOpSum, amrex::ReduceOpSum> reduce_op;
+                amrex::ReduceData<int, int> reduce_data(reduce_op);
                 {
                     auto const src_data = ptile_source.getConstParticleTileData();
 
                     reduce_op.eval(np, reduce_data, [=] AMREX_GPU_HOST_DEVICE (int ip)
+                        -> amrex::GpuTuple<int, int>
                     {
-                        return predicate(src_data, ip);
+                        int const lost = !amrex::ConstParticleIDWrapper{src_data.m_idcpu[ip]}.is_valid();
+                        return {lost, predicate(src_data, ip)};
                     });
                 }
-                int const np_to_move = amrex::get<0>(reduce_data.value());
-                if (np_to_move == 0) continue;  // no particles to move from source tile
-
-                // allocate memory in destination
-                int const dst_index = ptile_dest.numParticles();
-                ptile_dest.resize(dst_index + np_to_move);
-
-                // copy particles
-                //   skipped in loop below: integer compile-time or runtime attributes
-                AMREX_ALWAYS_ASSERT(SrcData::NAI == 0);
-                AMREX_ALWAYS_ASSERT(ptile_source.NumRuntimeIntComps() == 0);
-
-                //   first runtime attribute in destination is s position where particle got lost
-                AMREX_ALWAYS_ASSERT(dest.NumRuntimeRealComps() > 0);
-
-                amrex::filterAndTransformParticles(
-                    ptile_dest,
-                    ptile_source,
-                    predicate,
-                    CopyAndMarkNegative{s_runtime_index, s_lost},
-                    0,
-                    dst_index
-                );
-
-                // remove particles with negative ids in source
-                amrex::removeInvalidParticles(ptile_source);
+                auto const counts = reduce_data.value();
+                int const np_lost = amrex::get<0>(counts);
+                int const np_to_move = amrex::get<1>(counts);
+                if (np_lost == 0) continue;  // no lost particles in source tile
+
+                if (np_to_move > 0) {
+                    auto& ptile_dest = dest.DefineAndReturnParticleTile(
+                            lev, pti.index(), pti.LocalTileIndex());
+
+                    // allocate memory in destination
+                    int const dst_index = ptile_dest.numParticles();
+                    ptile_dest.resize(dst_index + np_to_move);
+
+                    // copy particles
+                    //   skipped in loop below: integer compile-time or runtime attributes
+                    AMREX_ALWAYS_ASSERT(SrcData::NAI == 0);
+                    AMREX_ALWAYS_ASSERT(ptile_source.NumRuntimeIntComps() == 0);
+
+                    //   first runtime attribute in destination is s position where particle got lost
+                    AMREX_ALWAYS_ASSERT(dest.NumRuntimeRealComps() > 0);
+
+                    amrex::filterAndTransformParticles(
+                        ptile_dest,
+                        ptile_source,
+                        predicate,
+                        CopyAndMarkNegative{s_runtime_index, s_lost},
+                        0,
+                        dst_index
+                    );
+                }
+
+                if (remove) {
+                    // remove particles with negative ids in source
+                    amrex::removeInvalidParticles(ptile_source);
+                } else {
+                    // mask lost particles in source until they are removed
+                    uint64_t const * const AMREX_RESTRICT part_idcpu = ptile_source.GetStructOfArrays().GetIdCPUData().dataPtr();
+                    amrex::ParticleReal * const AMREX_RESTRICT part_w = ptile_source.GetStructOfArrays().GetRealData(RealSoA::w).dataPtr();
+                    amrex::ParallelFor(np, [=] AMREX_GPU_DEVICE (long ip)
+                    {
+                        if (!amrex::ConstParticleIDWrapper{part_idcpu[ip]}.is_valid()) {
+                            part_w[ip] = 0.0_prt;
+                        }
+                    });
+                    num_lost_pending += np_lost;
+                }
             } // particle tile loop
         } // lev
+
+        return num_lost_pending;
     }
 } // namespace impactx
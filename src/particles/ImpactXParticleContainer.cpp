@@ -17,6 +17,8 @@
 #include <AMReX.H>
 #include <AMReX_AmrCore.H>
 #include <AMReX_AmrParGDB.H>
+#include <AMReX_MFIter.H>
+#include <AMReX_OpenMP.H>
 #include <AMReX_ParallelDescriptor.H>
 #include <AMReX_ParmParse.H>
 #include <AMReX_Particle.H>
@@ -24,6 +26,8 @@
 #include <algorithm>
 #include <iterator>
 #include <stdexcept>
+#include <utility>
+#include <vector>
 
 
 namespace
@@ -159,6 +163,53 @@ namespace impactx
         SetParticleShape(v);
     }
 
+    void
+    ImpactXParticleContainer::SetTiling ()
+    {
+        amrex::ParmParse pp_impactx("impactx");
+#ifdef AMREX_USE_GPU
+        int tiles_per_rank = 1;
+#else
+        int tiles_per_rank = amrex::OpenMP::get_max_threads();
+#endif
+        pp_impactx.queryAdd("tiles_per_rank", tiles_per_rank);
+        AMREX_ALWAYS_ASSERT_WITH_MESSAGE(tiles_per_rank >= 1,
+            "impactx.tiles_per_rank must be at least 1.");
+        m_tiles_per_rank = tiles_per_rank;
+
+        if (tiles_per_rank == 1) { return; }
+
+        // the fewest boxes on an MPI rank that has boxes
+        int const lid = 0;
+        amrex::BoxArray const & ba = ParticleBoxArray(lid);
+        std::vector<int> const & pmap = ParticleDistributionMap(lid).ProcessorMap();
+        std::vector<int> num_boxes(amrex::ParallelDescriptor::NProcs(), 0);
+        for (int const proc : pmap) {
+            num_boxes.at(proc)++;
+        }
+        int min_boxes = static_cast<int>(pmap.size());
+        for (int const n : num_boxes) {
+            if (n > 0) { min_boxes = std::min(min_boxes, n); }
+        }
+        int const tiles_per_box = (tiles_per_rank + min_boxes - 1) / min_boxes;
+
+        // split the smallest box into tiles_per_box tiles, first along z, then y and x
+        amrex::IntVect tile = ba[0].length();
+        for (int i = 1; i < static_cast<int>(ba.size()); ++i) {
+            tile.min(ba[i].length());
+        }
+        int remaining = tiles_per_box;
+        for (int d = AMREX_SPACEDIM - 1; d >= 0 && remaining > 1; --d) {
+            int const n = std::min(remaining, tile[d]);
+            tile[d] = (tile[d] + n - 1) / n;
+            remaining = (remaining + n - 1) / n;
+        }
+
+        // the tiling is shared by all ImpactX particle containers
+        do_tiling = true;
+        tile_size = tile;
+    }
+
     void
     ImpactXParticleContainer::AddNParticles (
         amrex::Gpu::DeviceVector<amrex::ParticleReal> const & x,
@@ -180,27 +231,22 @@ namespace impactx
         AMREX_ALWAYS_ASSERT(x.size() == pt.size());
 
         // number of particles to add
-        int const np = x.size();
-
-        // we add particles to lev 0, tile 0 of the first box assigned to this proc
-        int lid = 0, gid = 0, tid = 0;
-        {
-            const auto& pmap = ParticleDistributionMap(lid).ProcessorMap();
-            auto it = std::find(pmap.begin(), pmap.end(), amrex::ParallelDescriptor::MyProc());
-            if (it == std::end(pmap)) {
-                amrex::Abort("Attempting to add particles to box that does not exist.");
-            } else {
-                gid = *it;
-            }
+        amrex::Long const np = x.size();
+
+        // we add particles to lev 0, split evenly over the first tiles of the boxes assigned to this proc
+        int const lid = 0;
+        std::vector<std::pair<int, int>> tiles;  // grid and tile index
+        for (amrex::MFIter mfi = MakeMFIter(lid); mfi.isValid(); ++mfi) {
+            if (static_cast<int>(tiles.size()) == m_tiles_per_rank) { break; }
+            tiles.emplace_back(mfi.index(), mfi.LocalTileIndex());
         }
-        auto& particle_tile = DefineAndReturnParticleTile(lid, gid, tid);
-
-        auto old_np = particle_tile.numParticles();
-        auto new_np = old_np + np;
-        particle_tile.resize(new_np);
+        if (tiles.empty()) {
+            amrex::Abort("Attempting to add particles to box that does not exist.");
+        }
+        auto const num_tiles = static_cast<amrex::Long>(tiles.size());
 
         // Update NextID to include particles created in this function
-        int pid;
+        amrex::Long pid;
 #ifdef AMREX_USE_OMP
 #pragma omp critical (add_beam_nextid)
 #endif
@@ -209,23 +255,11 @@ namespace impactx
             ParticleType::NextID(pid+np);
         }
         AMREX_ALWAYS_ASSERT_WITH_MESSAGE(
-        static_cast<amrex::Long>(pid) + static_cast<amrex::Long>(np) < amrex::LongParticleIds::LastParticleID,
+        pid + np < amrex::LongParticleIds::LastParticleID,
             "ERROR: overflow on particle id numbers");
 
         const int cpuid = amrex::ParallelDescriptor::MyProc();
 
-        auto & soa = particle_tile.GetStructOfArrays().GetRealData();
-        amrex::ParticleReal * const AMREX_RESTRICT x_arr = soa[RealSoA::x].dataPtr();
-        amrex::ParticleReal * const AMREX_RESTRICT y_arr = soa[RealSoA::y].dataPtr();
-        amrex::ParticleReal * const AMREX_RESTRICT t_arr = soa[RealSoA::t].dataPtr();
-        amrex::ParticleReal * const AMREX_RESTRICT px_arr = soa[RealSoA::px].dataPtr();
-        amrex::ParticleReal * const AMREX_RESTRICT py_arr = soa[RealSoA::py].dataPtr();
-        amrex::ParticleReal * const AMREX_RESTRICT pt_arr = soa[RealSoA::pt].dataPtr();
-        amrex::ParticleReal * const AMREX_RESTRICT qm_arr = soa[RealSoA::qm].dataPtr();
-        amrex::ParticleReal * const AMREX_RESTRICT w_arr  = soa[RealSoA::w ].dataPtr();
-
-        uint64_t * const AMREX_RESTRICT idcpu_arr = particle_tile.GetStructOfArrays().GetIdCPUData().dataPtr();
-
         amrex::ParticleReal const * const AMREX_RESTRICT x_ptr = x.data();
         amrex::ParticleReal const * const AMREX_RESTRICT y_ptr = y.data();
         amrex::ParticleReal const * const AMREX_RESTRICT t_ptr = t.data();
@@ -233,21 +267,49 @@ namespace impactx
         amrex::ParticleReal const * const AMREX_RESTRICT py_ptr = py.data();
         amrex::ParticleReal const * const AMREX_RESTRICT pt_ptr = pt.data();
 
-        amrex::ParallelFor(np,
-        [=] AMREX_GPU_DEVICE (int i) noexcept
-        {
-            idcpu_arr[old_np+i] = amrex::SetParticleIDandCPU(pid + i, cpuid);
-
-            x_arr[old_np+i] = x_ptr[i];
-            y_arr[old_np+i] = y_ptr[i];
-            t_arr[old_np+i] = t_ptr[i];
-
-            px_arr[old_np+i] = px_ptr[i];
-            py_arr[old_np+i] = py_ptr[i];
-            pt_arr[old_np+i] = pt_ptr[i];
-            qm_arr[old_np+i] = qm;
-            w_arr[old_np+i]  = bchchg/ablastr::constant::SI::q_e/np;
-        });
+        for (amrex::Long k = 0; k < num_tiles; ++k) {
+            // the k-th chunk of the new particles
+            amrex::Long const begin = np * k / num_tiles;
+            amrex::Long const end = np * (k + 1) / num_tiles;
+            if (begin == end) { continue; }
+
+            auto& particle_tile = DefineAndReturnParticleTile(lid, tiles[k].first, tiles[k].second);
+
+            amrex::Long const old_np = particle_tile.numParticles();
+            amrex::Long const new_np = old_np + (end - begin);
+            particle_tile.resize(new_np);
+
+            auto & soa = particle_tile.GetStructOfArrays().GetRealData();
+            amrex::ParticleReal * const AMREX_RESTRICT x_arr = soa[RealSoA::x].dataPtr();
+            amrex::ParticleReal * const AMREX_RESTRICT y_arr = soa[RealSoA::y].dataPtr();
+            amrex::ParticleReal * const AMREX_RESTRICT t_arr = soa[RealSoA::t].dataPtr();
+            amrex::ParticleReal * const AMREX_RESTRICT px_arr = soa[RealSoA::px].dataPtr();
+            amrex::ParticleReal * const AMREX_RESTRICT py_arr = soa[RealSoA::py].dataPtr();
+            amrex::ParticleReal * const AMREX_RESTRICT pt_arr = soa[RealSoA::pt].dataPtr();
+            amrex::ParticleReal * const AMREX_RESTRICT qm_arr = soa[RealSoA::qm].dataPtr();
+            amrex::ParticleReal * const AMREX_RESTRICT w_arr  = soa[RealSoA::w ].dataPtr();
+
+            uint64_t * const AMREX_RESTRICT idcpu_arr = particle_tile.GetStructOfArrays().GetIdCPUData().dataPtr();
+
+            amrex::ParallelFor(end - begin,
+            [=] AMREX_GPU_DEVICE (amrex::Long i) noexcept
+            {
+                amrex::Long const src = begin + i;
+                amrex::Long const dst = old_np + i;
+
+                idcpu_arr[dst] = amrex::SetParticleIDandCPU(pid + src, cpuid);
+
+                x_arr[dst] = x_ptr[src];
+                y_arr[dst] = y_ptr[src];
+                t_arr[dst] = t_ptr[src];
+
+                px_arr[dst] = px_ptr[src];
+                py_arr[dst] = py_ptr[src];
+                pt_arr[dst] = pt_ptr[src];
+                qm_arr[dst] = qm;
+                w_arr[dst]  = bchchg/ablastr::constant::SI::q_e/np;
+            });
+        }
 
         // safety first: in case passed attribute arrays were temporary, we
         // want to make sure the ParallelFor has ended here
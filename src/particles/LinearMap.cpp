@@ -0,0 +1,56 @@
+/* Copyright 2022-2023 The Regents of the University of California, through Lawrence
+ *           Berkeley National Laboratory (subject to receipt of any required
+ *           approvals from the U.S. Dept. of Energy). All rights reserved.
+ *
+ * This file is part of ImpactX.
+ *
+ * Authors: Axel Huebl, Chad Mitchell
+ * License: BSD-3-Clause-LBNL
+ */
+#include "LinearMap.H"
+
+#include <AMReX_BLProfiler.H>
+#include <AMReX_Extension.H>  // for AMREX_RESTRICT
+#include <AMReX_GpuLaunch.H>
+
+
+namespace impactx
+{
+    void push_linear_map (
+        ImpactXParticleContainer & pc,
+        LinearMap const & map
+    )
+    {
+        BL_PROFILE("impactx::Push::LinearMap");
+
+        // loop over refinement levels
+        int const nLevel = pc.finestLevel();
+        for (int lev = 0; lev <= nLevel; ++lev)
+        {
+            // loop over all particle boxes
+            using ParIt = ImpactXParticleContainer::iterator;
+#ifdef AMREX_USE_OMP
+#pragma omp parallel if (amrex::Gpu::notInLaunchRegion())
+#endif
+            for (ParIt pti(pc, lev); pti.isValid(); ++pti) {
+                int const np = pti.numParticles();
+
+                // preparing access to particle data: SoA of Reals
+                auto & soa_real = pti.GetStructOfArrays().GetRealData();
+                amrex::ParticleReal * const AMREX_RESTRICT part_x = soa_real[RealSoA::x].dataPtr();
+                amrex::ParticleReal * const AMREX_RESTRICT part_y = soa_real[RealSoA::y].dataPtr();
+                amrex::ParticleReal * const AMREX_RESTRICT part_t = soa_real[RealSoA::t].dataPtr();
+                amrex::ParticleReal * const AMREX_RESTRICT part_px = soa_real[RealSoA::px].dataPtr();
+                amrex::ParticleReal * const AMREX_RESTRICT part_py = soa_real[RealSoA::py].dataPtr();
+                amrex::ParticleReal * const AMREX_RESTRICT part_pt = soa_real[RealSoA::pt].dataPtr();
+
+                // loop over beam particles in the box
+                amrex::ParallelFor(np, [=] AMREX_GPU_DEVICE (long i)
+                {
+                    map(part_x[i], part_y[i], part_t[i], part_px[i], part_py[i], part_pt[i]);
+                });
+            } // end loop over all particle boxes
+        } // end mesh-refinement level loop
+    }
+
+} // namespace impactx
@@ -0,0 +1,132 @@
+/* Copyright 2022-2023 The Regents of the University of California, through Lawrence
+ *           Berkeley National Laboratory (subject to receipt of any required
+ *           approvals from the U.S. Dept. of Energy). All rights reserved.
+ *
+ * This file is part of ImpactX.
+ *
+ * Authors: Axel Huebl, Chad Mitchell
+ * License: BSD-3-Clause-LBNL
+ */
+#include "PushSegment.H"
+
+#include <AMReX_BLProfiler.H>
+#include <AMReX_Extension.H>  // for AMREX_RESTRICT
+#include <AMReX_GpuLaunch.H>
+#include <AMReX_Particle.H>
+
+#include <algorithm>
+#include <cstdint>
+
+
+namespace impactx
+{
+    bool
+    is_segment_fusable (KnownElements const & element_variant)
+    {
+        return std::visit([](auto const & element) {
+            return is_segment_fusable_v<decltype(element)>;
+        }, element_variant);
+    }
+
+    void push_segment (
+        ImpactXParticleContainer & pc,
+        std::vector<SegmentStep> const & segment
+    )
+    {
+        BL_PROFILE("impactx::Push::Segment");
+
+        if (segment.empty()) { return; }
+
+        for (auto const & step : segment) {
+            if (std::holds_alternative<LinearMap>(step.push)) {
+                elements::SIMDReport::record("LinearMap", true, pc);
+            } else {
+                std::visit([&pc](auto const & element) {
+                    elements::SIMDReport::record<decltype(element)>(pc);
+                }, std::get<KnownElements>(step.push));
+            }
+        }
+
+        // loop over refinement levels
+        int const nLevel = pc.finestLevel();
+        for (int lev = 0; lev <= nLevel; ++lev)
+        {
+            // loop over all particle boxes
+            using ParIt = ImpactXParticleContainer::iterator;
+#ifdef AMREX_USE_OMP
+#pragma omp parallel if (amrex::Gpu::notInLaunchRegion())
+#endif
+            for (ParIt pti(pc, lev); pti.isValid(); ++pti) {
+                long const np = pti.numParticles();
+
+                // preparing access to particle data: SoA of Reals
+                auto & soa_real = pti.GetStructOfArrays().GetRealData();
+                amrex::ParticleReal * const AMREX_RESTRICT part_x = soa_real[RealSoA::x].dataPtr();
+                amrex::ParticleReal * const AMREX_RESTRICT part_y = soa_real[RealSoA::y].dataPtr();
+                amrex::ParticleReal * const AMREX_RESTRICT part_t = soa_real[RealSoA::t].dataPtr();
+                amrex::ParticleReal * const AMREX_RESTRICT part_px = soa_real[RealSoA::px].dataPtr();
+                amrex::ParticleReal * const AMREX_RESTRICT part_py = soa_real[RealSoA::py].dataPtr();
+                amrex::ParticleReal * const AMREX_RESTRICT part_pt = soa_real[RealSoA::pt].dataPtr();
+
+                uint64_t * const AMREX_RESTRICT part_idcpu = pti.GetStructOfArrays().GetIdCPUData().dataPtr();
+
+#ifdef AMREX_USE_GPU
+                // apply the steps one after another, each in its own kernel
+                for (auto const & step : segment) {
+                    if (auto const * map = std::get_if<LinearMap>(&step.push)) {
+                        LinearMap const m = *map;
+                        amrex::ParallelFor(np, [=] AMREX_GPU_DEVICE (long i)
+                        {
+                            m(part_x[i], part_y[i], part_t[i], part_px[i], part_py[i], part_pt[i]);
+                        });
+                    } else {
+                        RefPart ref_part = step.ref_part;
+                        std::visit([&pti, &ref_part](auto const & element) {
+                            using T_Element = std::decay_t<decltype(element)>;
+                            if constexpr (is_segment_fusable_v<T_Element>) {
+                                elements::detail::push_all_particles<T_Element>(pti, ref_part, element);
+                            }
+                        }, std::get<KnownElements>(step.push));
+                    }
+                }
+#else
+                // number of particles that are pushed through the whole segment at once:
+                // the six phase space arrays and the ids of a chunk fit into the L1/L2 cache
+                constexpr long chunk_size = 512;
+
+                for (long begin = 0; begin < np; begin += chunk_size) {
+                    long const end = std::min(np, begin + chunk_size);
+
+                    for (auto const & step : segment) {
+                        if (auto const * map = std::get_if<LinearMap>(&step.push)) {
+                            LinearMap const & m = *map;
+                            AMREX_PRAGMA_SIMD
+                            for (long i = begin; i < end; ++i) {
+                                m(part_x[i], part_y[i], part_t[i], part_px[i], part_py[i], part_pt[i]);
+                            }
+                        } else {
+                            RefPart const & ref_part = step.ref_part;
+                            std::visit([=, &ref_part](auto const & element) {
+                                using T_Element = std::decay_t<decltype(element)>;
+                                if constexpr (is_segment_fusable_v<T_Element> && elements::is_vectorized_v<T_Element>) {
+                                    elements::detail::push_batched(element, begin, end,
+                                                                   part_x, part_y, part_t, part_px, part_py, part_pt,
+                                                                   part_idcpu, ref_part);
+                                } else if constexpr (is_segment_fusable_v<T_Element>) {
+                                    for (long i = begin; i < end; ++i) {
+                                        if (!amrex::ConstParticleIDWrapper{part_idcpu[i]}.is_valid()) { continue; }
+                                        element(part_x[i], part_y[i], part_t[i],
+                                                part_px[i], part_py[i], part_pt[i],
+                                                part_idcpu[i], ref_part);
+                                    }
+                                }
+                            }, std::get<KnownElements>(step.push));
+                        }
+                    }
+                }
+#endif
+            } // end loop over all particle boxes
+        } // end mesh-refinement level loop
+    }
+
+} // namespace impactx
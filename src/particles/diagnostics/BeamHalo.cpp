@@ -0,0 +1,240 @@
+/* Copyright 2022-2023 The Regents of the University of California, through Lawrence
+ *           Berkeley National Laboratory (subject to receipt of any required
+ *           approvals from the U.S. Dept. of Energy). All rights reserved.
+ *
+ * This file is part of ImpactX.
+ *
+ * Authors: Chad Mitchell, Axel Huebl
+ * License: BSD-3-Clause-LBNL
+ */
+#include "BeamHalo.H"
+
+#include <AMReX_BLProfiler.H>           // for TinyProfiler
+#include <AMReX_GpuAtomic.H>            // for HostDevice::Atomic
+#include <AMReX_GpuContainers.H>        // for Gpu::DeviceVector
+#include <AMReX_GpuQualifiers.H>        // for AMREX_GPU_DEVICE
+#include <AMReX_ParallelDescriptor.H>   // for ParallelDescriptor
+#include <AMReX_ParallelReduce.H>       // for ParallelAllReduce
+#include <AMReX_ParmParse.H>            // for ParmParse
+#include <AMReX_ParticleReduce.H>       // for ParticleReduce
+#include <AMReX_REAL.H>                 // for Real
+#include <AMReX_Reduce.H>               // for ReduceOps
+#include <AMReX_TypeList.H>             // for TypeMultiplier
+
+#include <array>
+#include <cmath>
+#include <optional>
+#include <vector>
+
+
+namespace impactx::diagnostics
+{
+namespace
+{
+    //! lower edge of the histograms of the normalized action
+    constexpr amrex::Real action_min = 1.0e-4;
+    //! upper edge of the histograms of the normalized action
+    constexpr amrex::Real action_max = 1.0e4;
+
+    //! diag.halo and diag.halo_bins, read on first use
+    struct HaloOptions
+    {
+        bool enabled = false;  ///< compute the halo diagnostics
+        int nbins = 1000;  ///< number of bins of the histograms
+    };
+    std::optional<HaloOptions> halo_options;
+
+    /** The options of the halo diagnostics, read from the inputs once
+     *
+     * @return the options
+     */
+    HaloOptions const &
+    get_halo_options ()
+    {
+        if (!halo_options.has_value()) {
+            HaloOptions options;
+            amrex::ParmParse pp_diag("diag");
+            pp_diag.queryAdd("halo", options.enabled);
+            pp_diag.queryAdd("halo_bins", options.nbins);
+            AMREX_ALWAYS_ASSERT_WITH_MESSAGE(options.nbins >= 1,
+                "diag.halo_bins must be at least 1.");
+            halo_options = options;
+        }
+        return *halo_options;
+    }
+
+    /** Normalized action that contains a fraction of the beam
+     *
+     * The action is interpolated logarithmically within the bin.  Actions
+     * below or above the range of the histogram are clamped to its edges.
+     *
+     * @param hist the histogram of the action, with logarithmic bins
+     * @param nbins the number of bins of the histogram
+     * @param fraction the fraction of the total weight in the histogram
+     */
+    amrex::Real
+    percentile (amrex::Real const * hist, int nbins, amrex::Real fraction)
+    {
+        using namespace amrex::literals; // for _rt and _prt
+
+        amrex::Real total = 0.0_rt;
+        for (int b = 0; b < nbins; ++b) { total += hist[b]; }
+        if (total <= 0.0_rt) { return 0.0_rt; }
+
+        amrex::Real const log_min = std::log(action_min);
+        amrex::Real const dlog = (std::log(action_max) - log_min) / nbins;
+
+        amrex::Real const target = fraction * total;
+        amrex::Real cumulative = 0.0_rt;
+        for (int b = 0; b < nbins; ++b) {
+            if (hist[b] > 0.0_rt && cumulative + hist[b] >= target) {
+                amrex::Real const f = (target - cumulative) / hist[b];
+                return std::exp(log_min + (b + f) * dlog);
+            }
+            cumulative += hist[b];
+        }
+        return action_max;
+    }
+} // namespace
+
+    std::unordered_map<std::string, amrex::Real>
+    beam_halo (
+        ImpactXParticleContainer const & pc,
+        std::unordered_map<std::string, amrex::Real> const & rbc
+    )
+    {
+        BL_PROFILE("impactx::diagnostics::beam_halo");
+
+        using namespace amrex::literals; // for _rt and _prt
+
+        int const nbins = get_halo_options().nbins;
+
+        // means and rms ellipses of the planes x, y, t
+        std::array<std::string, 3> const planes = {"x", "y", "t"};
+        amrex::GpuArray<amrex::Real, 3> q_mean, p_mean, s_qq, s_qp, s_pp, inv_eps2;
+        for (int d = 0; d < 3; ++d) {
+            std::string const & q = planes[d];
+            amrex::Real const emittance = rbc.at("emittance_" + q);
+            q_mean[d] = rbc.at(q + "_mean");
+            p_mean[d] = rbc.at("p" + q + "_mean");
+            s_qq[d] = std::pow(rbc.at("sig_" + q), 2);
+            s_pp[d] = std::pow(rbc.at("sig_p" + q), 2);
+            s_qp[d] = -rbc.at("alpha_" + q) * emittance;
+            inv_eps2[d] = 1.0_rt / (emittance * emittance);
+        }
+
+        // histograms of the normalized action of the planes, one after the other
+        amrex::Gpu::DeviceVector<amrex::Real> hist(3 * nbins, 0.0_rt);
+        amrex::Real * const AMREX_RESTRICT hist_ptr = hist.dataPtr();
+        amrex::Real const a_min = action_min;
+        amrex::Real const a_max = action_max;
+        amrex::Real const log_min = std::log(action_min);
+        amrex::Real const inv_dlog = nbins / (std::log(action_max) - log_min);
+
+        using PType = typename ImpactXParticleContainer::SuperParticleType;
+
+        /* The variables below need to be static to work around an MSVC bug
+         * https://stackoverflow.com/questions/55136414/constexpr-variable-captured-inside-lambda-loses-its-constexpr-ness
+         */
+        // sums of q^4, p^4, q^2 p^2, q p^3, q^3 p for the planes x, y, t
+        static constexpr std::size_t num_red_ops = 15;
+        amrex::TypeMultiplier<amrex::ReduceOps, amrex::ReduceOpSum[num_red_ops]> reduce_ops;
+        using ReducedDataT = amrex::TypeMultiplier<amrex::ReduceData, amrex::Real[num_red_ops]>;
+
+        // one pass: the 4th order moments are reduced and the actions are
+        // binned with atomic additions
+        auto r = amrex::ParticleReduce<ReducedDataT>(
+            pc,
+            [=] AMREX_GPU_DEVICE(const PType& p) noexcept -> ReducedDataT::Type
+            {
+                // lost particles that are not yet removed from the beam do not contribute
+                const bool valid = p.id().is_valid();
+                const amrex::Real p_w = valid ? amrex::Real(p.rdata(RealSoA::w)) : 0.0_rt;
+                const amrex::Real q[3] = {p.rdata(RealSoA::x), p.rdata(RealSoA::y), p.rdata(RealSoA::t)};
+                const amrex::Real m[3] = {p.rdata(RealSoA::px), p.rdata(RealSoA::py), p.rdata(RealSoA::pt)};
+
+                amrex::Real dq[3], dp[3];
+                for (int d = 0; d < 3; ++d) {
+                    dq[d] = valid ? q[d] - q_mean[d] : 0.0_rt;
+                    dp[d] = valid ? m[d] - p_mean[d] : 0.0_rt;
+
+                    // gamma q^2 + 2 alpha q p + beta p^2, in units of the rms emittance
+                    amrex::Real const action =
+                        (s_pp[d] * dq[d] * dq[d] - 2.0_rt * s_qp[d] * dq[d] * dp[d] + s_qq[d] * dp[d] * dp[d]) * inv_eps2[d];
+                    int bin = 0;
+                    if (action >= a_max) {
+                        bin = nbins - 1;
+                    } else if (action > a_min) {
+                        bin = amrex::min(static_cast<int>(std::floor((std::log(action) - log_min) * inv_dlog)), nbins - 1);
+                    }
+                    // tiles are reduced concurrently, also by OpenMP threads on the host
+                    amrex::HostDevice::Atomic::Add(&hist_ptr[d * nbins + bin], p_w);
+                }
+
+                return {dq[0] * dq[0] * dq[0] * dq[0] * p_w, dp[0] * dp[0] * dp[0] * dp[0] * p_w,
+                        dq[0] * dq[0] * dp[0] * dp[0] * p_w, dq[0] * dp[0] * dp[0] * dp[0] * p_w,
+                        dq[0] * dq[0] * dq[0] * dp[0] * p_w,
+                        dq[1] * dq[1] * dq[1] * dq[1] * p_w, dp[1] * dp[1] * dp[1] * dp[1] * p_w,
+                        dq[1] * dq[1] * dp[1] * dp[1] * p_w, dq[1] * dp[1] * dp[1] * dp[1] * p_w,
+                        dq[1] * dq[1] * dq[1] * dp[1] * p_w,
+                        dq[2] * dq[2] * dq[2] * dq[2] * p_w, dp[2] * dp[2] * dp[2] * dp[2] * p_w,
+                        dq[2] * dq[2] * dp[2] * dp[2] * p_w, dq[2] * dp[2] * dp[2] * dp[2] * p_w,
+                        dq[2] * dq[2] * dq[2] * dp[2] * p_w};
+            },
+            reduce_ops
+        );
+
+        // sum the moments and histograms of all MPI ranks in a single allreduce
+        std::vector<amrex::Real> values(num_red_ops + 3 * nbins);
+        amrex::constexpr_for<0, num_red_ops> ([&](auto i) {
+            values[i] = amrex::get<i>(r);
+        });
+        amrex::Gpu::copy(amrex::Gpu::deviceToHost, hist.begin(), hist.end(), values.begin() + num_red_ops);
+        amrex::ParallelAllReduce::Sum(
+            values.data(),
+            static_cast<int>(values.size()),
+            amrex::ParallelDescriptor::Communicator()
+        );
+
+        // the total weight is the sum of any histogram
+        amrex::Real w_sum = 0.0_rt;
+        for (int b = 0; b < nbins; ++b) { w_sum += values[num_red_ops + b]; }
+
+        std::unordered_map<std::string, amrex::Real> data;
+        for (int d = 0; d < 3; ++d) {
+            std::string const & q = planes[d];
+            amrex::Real const emittance = rbc.at("emittance_" + q);
+
+            // emittances of the ellipses that contain a fraction of the beam
+            amrex::Real const * const h = values.data() + num_red_ops + d * nbins;
+            data["emittance_" + q + "_90"] = percentile(h, nbins, 0.9_rt) * emittance;
+            data["emittance_" + q + "_99"] = percentile(h, nbins, 0.99_rt) * emittance;
+            data["emittance_" + q + "_999"] = percentile(h, nbins, 0.999_rt) * emittance;
+
+            // halo parameter of Allen and Wangler
+            amrex::Real const q4 = values[5 * d + 0] / w_sum;
+            amrex::Real const p4 = values[5 * d + 1] / w_sum;
+            amrex::Real const q2p2 = values[5 * d + 2] / w_sum;
+            amrex::Real const qp3 = values[5 * d + 3] / w_sum;
+            amrex::Real const q3p = values[5 * d + 4] / w_sum;
+            amrex::Real const I2 = emittance * emittance;
+            amrex::Real const I4 = q4 * p4 + 3.0_rt * q2p2 * q2p2 - 4.0_rt * qp3 * q3p;
+            data["halo_" + q] = std::sqrt(3.0_rt * I4) / (2.0_rt * I2) - 2.0_rt;
+        }
+
+        return data;
+    }
+
+    bool
+    halo_enabled ()
+    {
+        return get_halo_options().enabled;
+    }
+
+    void
+    clear_halo_options ()
+    {
+        halo_options.reset();
+    }
+
+} // namespace impactx::diagnostics
@@ -13,17 +13,181 @@
 
 #include <AMReX_BLProfiler.H> // for BL_PROFILE
 #include <AMReX_Extension.H>  // for AMREX_RESTRICT
+#include <AMReX_ParallelContext.H>  // for MyProcAll
 #include <AMReX_ParmParse.H>  // for ParmParse
 #include <AMReX_REAL.H>       // for ParticleReal
 #include <AMReX_Print.H>      // for PrintToFile
 #include <AMReX_ParticleTile.H>     // for constructor of SoAParticle
 
+#include <fstream>
+#include <ios>
 #include <limits>
+#include <map>
+#include <sstream>
+#include <stdexcept>
+#include <string>
+#include <unordered_map>
 #include <utility>
+#include <vector>
 
 
 namespace impactx::diagnostics
 {
+namespace
+{
+    /** A table of reduced diagnostics that is written to file in blocks of rows
+     *
+     * Each MPI rank writes its own copy of the file, with the rank as suffix.
+     * The file stays open until finalize_diagnostics() is called.  Rows are
+     * buffered in memory and written every diag.flush_rows rows and in
+     * flush_diagnostics().
+     *
+     * With diag.format = text, the rows are written as space-separated text,
+     * with a header line of column names.  With diag.format = binary, the
+     * file (suffix .bin) starts with the line "impactx-table 1 <number of
+     * columns>", followed by a line of column names, and then contains the
+     * rows as native double values.
+     */
+    class Table
+    {
+    public:
+        /** All tables, by file name without rank suffix */
+        static inline std::map<std::string, Table> tables = {};
+
+        /** The table of a file, opened on first use
+         *
+         * @param file_name the file name, without rank suffix
+         */
+        static Table &
+        get (std::string const & file_name)
+        {
+            auto it = tables.find(file_name);
+            if (it == tables.end()) {
+                it = tables.emplace(file_name, Table(file_name)).first;
+            }
+            return it->second;
+        }
+
+        /** Start the table anew with a header of column names
+         *
+         * In text format, the header is appended to the file. In binary
+         * format, the file is overwritten.
+         *
+         * @param columns the names of the columns
+         */
+        void
+        header (std::vector<std::string> const & columns)
+        {
+            std::string line;
+            for (std::size_t i = 0; i < columns.size(); ++i) {
+                line.append(columns[i]).append(i + 1 < columns.size() ? " " : "\n");
+            }
+
+            if (m_binary) {
+                m_binary_buffer.clear();
+                m_num_rows = 0;
+                m_ofs.close();
+                m_ofs.open(m_file_name, std::ios_base::binary | std::ios_base::trunc);
+                m_ofs << "impactx-table 1 " << columns.size() << "\n" << line;
+                m_ofs.flush();
+            } else {
+                m_buffer.append(line);
+            }
+        }
+
+        /** Add a row of values
+         *
+         * @param step the global step, in the first column
+         * @param values the values of the other columns
+         */
+        void
+        row (int step, std::vector<amrex::Real> const & values)
+        {
+            if (m_binary) {
+                m_binary_buffer.push_back(static_cast<double>(step));
+                for (amrex::Real const v : values) {
+                    m_binary_buffer.push_back(static_cast<double>(v));
+                }
+            } else {
+                std::ostringstream ss;
+                ss.precision(std::numeric_limits<amrex::ParticleReal>::max_digits10);
+                ss << step;
+                for (amrex::Real const v : values) {
+                    ss << " " << v;
+                }
+                ss << "\n";
+                m_buffer.append(ss.str());
+            }
+
+            m_num_rows++;
+            if (m_num_rows >= m_flush_rows) { flush(); }
+        }
+
+        /** Write the buffered rows to the file */
+        void
+        flush ()
+        {
+            if (m_binary) {
+                m_ofs.write(reinterpret_cast<char const *>(m_binary_buffer.data()),
+                            static_cast<std::streamsize>(m_binary_buffer.size() * sizeof(double)));
+                m_binary_buffer.clear();
+            } else {
+                m_ofs << m_buffer;
+                m_buffer.clear();
+            }
+            m_ofs.flush();
+            m_num_rows = 0;
+        }
+
+        Table (Table &&) = default;
+        Table & operator= (Table &&) = default;
+        Table (Table const &) = delete;
+        Table & operator= (Table const &) = delete;
+
+        ~Table ()
+        {
+            if (m_ofs.is_open()) { flush(); }
+        }
+
+    private:
+        /** Open the file of a table
+         *
+         * @param file_name the file name, without rank suffix
+         */
+        explicit Table (std::string const & file_name)
+        {
+            amrex::ParmParse pp_diag("diag");
+            std::string format = "text";
+            pp_diag.queryAdd("format", format);
+            if (format != "text" && format != "binary") {
+                throw std::runtime_error("diag.format must be either 'text' or 'binary', but is '" + format + "'.");
+            }
+            m_binary = format == "binary";
+            pp_diag.queryAdd("flush_rows", m_flush_rows);
+
+            m_file_name = file_name + "." + std::to_string(amrex::ParallelContext::MyProcAll());
+            if (m_binary) {
+                m_file_name.append(".bin");
+                m_ofs.open(m_file_name, std::ios_base::binary | std::ios_base::app);
+            } else {
+                m_ofs.open(m_file_name, std::ios_base::app);
+            }
+            if (!m_ofs.is_open()) {
+                throw std::runtime_error("Could not open diagnostics file " + m_file_name);
+            }
+        }
+
+        bool m_binary = false;  ///< binary (true) or text (false) format
+        int m_flush_rows = 1000;  ///< write the buffered rows after this many rows
+        std::string m_file_name;  ///< file name with rank suffix
+        std::ofstream m_ofs;  ///< the open file
+
+        int m_num_rows = 0;  ///< number of buffered rows
+        std::string m_buffer;  ///< buffered text
+        std::vector<double> m_binary_buffer;  ///< buffered rows in binary format
+    };
+} // namespace
+
     void DiagnosticOutput (ImpactXParticleContainer const & pc,
                            OutputType const otype,
                            std::string file_name,
@@ -34,76 +198,20 @@ namespace impactx::diagnostics
 
         using namespace amrex::literals; // for _rt and _prt
 
-        // keep file open as we add more and more lines
-        amrex::AllPrintToFile file_handler(std::move(file_name));
-        file_handler.SetPrecision(std::numeric_limits<amrex::ParticleReal>::max_digits10);
-
-        // write file header per MPI RANK
-        if (!append) {
-            if (otype == OutputType::PrintRefParticle) {
-                file_handler << "step s beta gamma beta_gamma x y z t px py pz pt\n";
-            } else if (otype == OutputType::PrintReducedBeamCharacteristics) {
-                file_handler << "step" << " " << "s" << " "
-                             << "x_mean" << " " << "x_min" << " " << "x_max" << " "
-                             << "y_mean" << " " << "y_min" << " " << "y_max" << " "
-                             << "t_mean" << " " << "t_min" << " " << "t_max" << " "
-                             << "sig_x" << " " << "sig_y" << " " << "sig_t" << " "
-                             << "px_mean" << " " << "px_min" << " " << "px_max" << " "
-                             << "py_mean" << " " << "py_min" << " " << "py_max" << " "
-                             << "pt_mean" << " " << "pt_min" << " " << "pt_max" << " "
-                             << "sig_px" << " " << "sig_py" << " " << "sig_pt" << " "
-                             << "emittance_x" << " " << "emittance_y" << " " << "emittance_t" << " "
-                             << "alpha_x" << " " << "alpha_y" << " " << "alpha_t" << " "
-                             << "beta_x" << " " << "beta_y" << " " << "beta_t" << " "
-                             << "charge_C" << " "
-                             << "\n";
-            }
-        }
-
         if (otype == OutputType::PrintRefParticle) {
-            // preparing to access reference particle data: RefPart
-            RefPart const ref_part = pc.GetRefParticle();
-
-            amrex::ParticleReal const s = ref_part.s;
-            amrex::ParticleReal const beta = ref_part.beta();
-            amrex::ParticleReal const gamma = ref_part.gamma();
-            amrex::ParticleReal const beta_gamma = ref_part.beta_gamma();
-            amrex::ParticleReal const x = ref_part.x;
-            amrex::ParticleReal const y = ref_part.y;
-            amrex::ParticleReal const z = ref_part.z;
-            amrex::ParticleReal const t = ref_part.t;
-            amrex::ParticleReal const px = ref_part.px;
-            amrex::ParticleReal const py = ref_part.py;
-            amrex::ParticleReal const pz = ref_part.pz;
-            amrex::ParticleReal const pt = ref_part.pt;
-
-            // write particle data to file
-            file_handler
-                    << step << " " << s << " "
-                    << beta << " " << gamma << " " << beta_gamma << " "
-                    << x << " " << y << " " << z << " " << t << " "
-                    << px << " " << py << " " << pz << " " << pt << "\n";
-        } // if( otype == OutputType::PrintRefParticle)
-        else if (otype == OutputType::PrintReducedBeamCharacteristics) {
-            std::unordered_map<std::string, amrex::ParticleReal> const rbc =
+            DiagnosticOutput(pc.GetRefParticle(), {}, otype, std::move(file_name), step, append);
+            return;
+        }
+        if (otype == OutputType::PrintReducedBeamCharacteristics) {
+            std::unordered_map<std::string, amrex::Real> const rbc =
                 diagnostics::reduced_beam_characteristics(pc);
+            DiagnosticOutput(pc.GetRefParticle(), rbc, otype, std::move(file_name), step, append);
+            return;
+        }
 
-            amrex::ParticleReal const s = pc.GetRefParticle().s;
-
-            file_handler << step << " " << s << " "
-                         << rbc.at("x_mean") << " " << rbc.at("x_min") << " " << rbc.at("x_max") << " "
-                         << rbc.at("y_mean") << " " << rbc.at("y_min") << " " << rbc.at("y_max") << " "
-                         << rbc.at("t_mean") << " " << rbc.at("t_min") << " " << rbc.at("t_max") << " "
-                         << rbc.at("sig_x") << " " << rbc.at("sig_y") << " " << rbc.at("sig_t") << " "
-                         << rbc.at("px_mean") << " " << rbc.at("px_min") << " " << rbc.at("px_max") << " "
-                         << rbc.at("py_mean") << " " << rbc.at("py_min") << " " << rbc.at("py_max") << " "
-                         << rbc.at("pt_mean") << " " << rbc.at("pt_min") << " " << rbc.at("pt_max") << " "
-                         << rbc.at("sig_px") << " " << rbc.at("sig_py") << " " << rbc.at("sig_pt") << " "
-                         << rbc.at("emittance_x") << " " << rbc.at("emittance_y") << " " << rbc.at("emittance_t") << " "
-                         << rbc.at("alpha_x") << " " << rbc.at("alpha_y") << " " << rbc.at("alpha_t") << " "
-                         << rbc.at("beta_x") << " " << rbc.at("beta_y") << " " << rbc.at("beta_t") << " "
-                         << rbc.at("charge_C") << "\n";
-        } // if( otype == OutputType::PrintReducedBeamCharacteristics)
+        // keep file open as we add more and more lines
+        amrex::AllPrintToFile file_handler(std::move(file_name));
+        file_handler.SetPrecision(std::numeric_limits<amrex::ParticleReal>::max_digits10);
 
         // TODO: add as an option to the monitor element
         if (otype == OutputType::PrintNonlinearLensInvariants) {
@@ -173,4 +281,85 @@ namespace impactx::diagnostics
         }
     }
 
+    void DiagnosticOutput (RefPart const & ref_part,
+                           std::unordered_map<std::string, amrex::Real> const & rbc,
+                           OutputType const otype,
+                           std::string file_name,
+                           int step,
+                           bool append)
+    {
+        BL_PROFILE("impactx::diagnostics::DiagnosticOutput");
+
+        using namespace amrex::literals; // for _rt and _prt
+
+        std::vector<std::string> columns;
+        std::vector<amrex::Real> values;
+
+        if (otype == OutputType::PrintRefParticle) {
+            columns = {"step", "s", "beta", "gamma", "beta_gamma", "x", "y", "z", "t", "px", "py", "pz", "pt"};
+
+            values = {ref_part.s,
+                      ref_part.beta(), ref_part.gamma(), ref_part.beta_gamma(),
+                      ref_part.x, ref_part.y, ref_part.z, ref_part.t,
+                      ref_part.px, ref_part.py, ref_part.pz, ref_part.pt};
+        } // if( otype == OutputType::PrintRefParticle)
+        else if (otype == OutputType::PrintReducedBeamCharacteristics) {
+            columns = {"step", "s",
+                       "x_mean", "x_min", "x_max",
+                       "y_mean", "y_min", "y_max",
+                       "t_mean", "t_min", "t_max",
+                       "sig_x", "sig_y", "sig_t",
+                       "px_mean", "px_min", "px_max",
+                       "py_mean", "py_min", "py_max",
+                       "pt_mean", "pt_min", "pt_max",
+                       "sig_px", "sig_py", "sig_pt",
+                       "emittance_x", "emittance_y", "emittance_t",
+                       "alpha_x", "alpha_y", "alpha_t",
+                       "beta_x", "beta_y", "beta_t",
+                       "charge_C",
+                       "emittance_1", "emittance_2", "emittance_3",
+                       "emittance_4d", "emittance_6d"};
+
+            // optional: percentile emittances and halo parameters
+            if (rbc.count("halo_x") > 0) {
+                for (std::string const q : {"x", "y", "t"}) {
+                    columns.push_back("emittance_" + q + "_90");
+                    columns.push_back("emittance_" + q + "_99");
+                    columns.push_back("emittance_" + q + "_999");
+                    columns.push_back("halo_" + q);
+                }
+            }
+
+            values.push_back(ref_part.s);
+            for (auto it = columns.begin() + 2; it != columns.end(); ++it) {
+                values.push_back(rbc.at(*it));
+            }
+        } // if( otype == OutputType::PrintReducedBeamCharacteristics)
+        else {
+            return;
+        }
+
+        Table & table = Table::get(file_name);
+
+        // write file header per MPI RANK
+        if (!append) {
+            table.header(columns);
+        }
+
+        table.row(step, values);
+    }
+
+    void flush_diagnostics ()
+    {
+        for (auto & [file_name, table] : Table::tables) {
+            table.flush();
+        }
+    }
+
+    void finalize_diagnostics ()
+    {
+        flush_diagnostics();
+        Table::tables.clear();
+    }
+
 } // namespace impactx::diagnostics
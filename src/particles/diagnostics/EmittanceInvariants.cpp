@@ -0,0 +1,167 @@
+/* Copyright 2022-2023 The Regents of the University of California, through Lawrence
+ *           Berkeley National Laboratory (subject to receipt of any required
+ *           approvals from the U.S. Dept. of Energy). All rights reserved.
+ *
+ * This file is part of ImpactX.
+ *
+ * Authors: Chad Mitchell, Axel Huebl
+ * License: BSD-3-Clause-LBNL
+ */
+#include "EmittanceInvariants.H"
+
+#include <ablastr/constant.H>
+
+#include <algorithm>
+#include <array>
+#include <cmath>
+#include <limits>
+#include <utility>
+
+
+namespace impactx::diagnostics
+{
+namespace
+{
+    /** Determinant of the leading n x n block of a covariance matrix
+     *
+     * This uses Gaussian elimination with partial pivoting.
+     *
+     * @param cov the covariance matrix
+     * @param n the size of the block
+     */
+    amrex::Real
+    determinant (LinearMap::Matrix6x6 const & cov, int n)
+    {
+        using namespace amrex::literals; // for _rt and _prt
+
+        std::array<std::array<amrex::Real, 6>, 6> a{};
+        for (int i = 0; i < n; ++i) {
+            for (int j = 0; j < n; ++j) {
+                a[i][j] = cov(i + 1, j + 1);
+            }
+        }
+
+        amrex::Real det = 1.0_rt;
+        for (int k = 0; k < n; ++k) {
+            int pivot = k;
+            for (int i = k + 1; i < n; ++i) {
+                if (std::abs(a[i][k]) > std::abs(a[pivot][k])) { pivot = i; }
+            }
+            if (a[pivot][k] == 0.0_rt) { return 0.0_rt; }
+            if (pivot != k) {
+                std::swap(a[pivot], a[k]);
+                det = -det;
+            }
+            det *= a[k][k];
+            for (int i = k + 1; i < n; ++i) {
+                amrex::Real const f = a[i][k] / a[k][k];
+                for (int j = k + 1; j < n; ++j) {
+                    a[i][j] -= f * a[k][j];
+                }
+            }
+        }
+        return det;
+    }
+
+    /** The three real roots of a cubic polynomial
+     *
+     * The roots of x^3 - e1 x^2 + e2 x - e3, with the trigonometric method.
+     * All roots must be real, as for the squares of the eigen-emittances.
+     *
+     * @param e1 sum of the roots
+     * @param e2 sum of the products of two roots
+     * @param e3 product of the roots
+     */
+    std::array<amrex::Real, 3>
+    cubic_roots (amrex::Real e1, amrex::Real e2, amrex::Real e3)
+    {
+        using namespace amrex::literals; // for _rt and _prt
+        using ablastr::constant::math::pi;
+
+        // depressed cubic s^3 + p s + q with x = s + e1 / 3
+        amrex::Real const shift = e1 / 3.0_rt;
+        amrex::Real const p = e2 - e1 * e1 / 3.0_rt;
+        amrex::Real const q = -2.0_rt * e1 * e1 * e1 / 27.0_rt + e1 * e2 / 3.0_rt - e3;
+
+        // triple root
+        if (p >= 0.0_rt) { return {shift, shift, shift}; }
+
+        amrex::Real const r = 2.0_rt * std::sqrt(-p / 3.0_rt);
+        amrex::Real const arg = std::clamp(3.0_rt * q / (p * r), -1.0_rt, 1.0_rt);
+        amrex::Real const phi = std::acos(arg) / 3.0_rt;
+
+        return {shift + r * std::cos(phi),
+                shift + r * std::cos(phi - 2.0_rt * pi / 3.0_rt),
+                shift + r * std::cos(phi - 4.0_rt * pi / 3.0_rt)};
+    }
+} // namespace
+
+    EigenEmittances
+    eigen_emittances (
+        LinearMap::Matrix6x6 const & cov,
+        std::array<amrex::Real, 3> const & projected
+    )
+    {
+        using namespace amrex::literals; // for _rt and _prt
+
+        // M = J Sigma, with the symplectic form J of the planes (x, px), (y, py), (t, pt)
+        std::array<std::array<amrex::Real, 6>, 6> m{};
+        for (int i = 0; i < 6; i += 2) {
+            for (int j = 0; j < 6; ++j) {
+                m[i][j] = cov(i + 2, j + 1);
+                m[i + 1][j] = -cov(i + 1, j + 1);
+            }
+        }
+
+        // M^2
+        std::array<std::array<amrex::Real, 6>, 6> m2{};
+        for (int i = 0; i < 6; ++i) {
+            for (int j = 0; j < 6; ++j) {
+                for (int k = 0; k < 6; ++k) {
+                    m2[i][j] += m[i][k] * m[k][j];
+                }
+            }
+        }
+
+        // invariants tr(M^2) = -2 sum_k emittance_k^2 and tr(M^4) = 2 sum_k emittance_k^4
+        amrex::Real tr_m2 = 0.0_rt;
+        amrex::Real tr_m4 = 0.0_rt;
+        for (int i = 0; i < 6; ++i) {
+            tr_m2 += m2[i][i];
+            for (int j = 0; j < 6; ++j) {
+                tr_m4 += m2[i][j] * m2[j][i];
+            }
+        }
+        amrex::Real const det_6d = determinant(cov, 6);
+        amrex::Real const det_4d = determinant(cov, 4);
+
+        // the squares of the eigen-emittances are the roots of a cubic
+        amrex::Real const e1 = -tr_m2 / 2.0_rt;
+        amrex::Real const e2 = (e1 * e1 - tr_m4 / 2.0_rt) / 2.0_rt;
+        amrex::Real const e3 = det_6d;
+        std::array<amrex::Real, 3> eps = cubic_roots(e1, e2, e3);
+        for (amrex::Real & e : eps) {
+            e = std::sqrt(std::max(e, 0.0_rt));
+        }
+
+        // order as the closest projected emittances
+        std::array<int, 3> order = {0, 1, 2};
+        std::array<int, 3> best = order;
+        amrex::Real best_distance = std::numeric_limits<amrex::Real>::max();
+        do {
+            amrex::Real distance = 0.0_rt;
+            for (int k = 0; k < 3; ++k) {
+                distance += std::abs(eps[order[k]] - projected[k]);
+            }
+            if (distance < best_distance) {
+                best_distance = distance;
+                best = order;
+            }
+        } while (std::next_permutation(order.begin(), order.end()));
+
+        return {eps[best[0]], eps[best[1]], eps[best[2]],
+                std::sqrt(std::max(det_4d, 0.0_rt)),
+                std::sqrt(std::max(det_6d, 0.0_rt))};
+    }
+
+} // namespace impactx::diagnostics
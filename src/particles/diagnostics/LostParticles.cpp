@@ -0,0 +1,171 @@
+/* Copyright 2022-2023 The Regents of the University of California, through Lawrence
+ *           Berkeley National Laboratory (subject to receipt of any required
+ *           approvals from the U.S. Dept. of Energy). All rights reserved.
+ *
+ * This file is part of ImpactX.
+ *
+ * Authors: Axel Huebl, Chad Mitchell
+ * License: BSD-3-Clause-LBNL
+ */
+#include "LostParticles.H"
+
+#include <AMReX_BLProfiler.H>         // for BL_PROFILE
+#include <AMReX_ParallelDescriptor.H> // for ParallelAllReduce
+#include <AMReX_ParmParse.H>          // for ParmParse
+#include <AMReX_Print.H>              // for PrintToFile
+
+#include <algorithm>
+#include <cmath>
+#include <limits>
+#include <stdexcept>
+#include <string>
+#include <vector>
+
+
+namespace impactx::diagnostics
+{
+    LostParticles::LostParticles (amrex::Real charge, amrex::Real s_start, amrex::Real period_length)
+        : m_charge(charge), m_s_start(s_start), m_period_length(period_length)
+    {
+        amrex::ParmParse pp_diag("diag");
+        pp_diag.queryAdd("backend", m_backend);
+
+        std::string mode = "particles";
+        pp_diag.queryAdd("lost_mode", mode);
+        if (mode != "particles" && mode != "histogram") {
+            throw std::runtime_error("diag.lost_mode must be either 'particles' or 'histogram', but is '" + mode + "'.");
+        }
+        m_histogram = mode == "histogram";
+
+        pp_diag.queryAdd("lost_flush_periods", m_flush_periods);
+        pp_diag.queryAdd("lost_flush_size", m_flush_size);
+        pp_diag.queryAdd("lost_histogram_ds", m_histogram_ds);
+        AMREX_ALWAYS_ASSERT_WITH_MESSAGE(m_flush_periods >= 0,
+            "diag.lost_flush_periods must not be negative.");
+        AMREX_ALWAYS_ASSERT_WITH_MESSAGE(m_histogram_ds > 0.0,
+            "diag.lost_histogram_ds must be positive.");
+
+        if (m_histogram) {
+            // the bins cover one period of the lattice
+            amrex::Real const num_bins = std::max(amrex::Real(1), std::ceil(m_period_length / m_histogram_ds));
+            AMREX_ALWAYS_ASSERT_WITH_MESSAGE(num_bins <= std::numeric_limits<int>::max(),
+                "diag.lost_histogram_ds is too small for the length of the lattice.");
+            m_num.assign(static_cast<std::size_t>(num_bins), 0);
+            m_charge_lost.assign(static_cast<std::size_t>(num_bins), amrex::Real(0));
+        }
+    }
+
+    void
+    LostParticles::check_size (ImpactXParticleContainer & lost)
+    {
+        if (m_flush_size <= 0) { return; }
+
+        if (lost.TotalNumberOfParticles(false, false) > m_flush_size) {
+            flush(lost);
+        }
+    }
+
+    void
+    LostParticles::end_of_period (ImpactXParticleContainer & lost, int period)
+    {
+        if (m_flush_periods <= 0 || period % m_flush_periods != 0) { return; }
+
+        flush(lost);
+    }
+
+    void
+    LostParticles::finalize (ImpactXParticleContainer & lost)
+    {
+        flush(lost);
+
+        if (m_histogram) {
+            write_histogram();
+        }
+
+        if (m_output.has_value()) {
+            m_output->finalize();
+            m_output.reset();
+        }
+    }
+
+    void
+    LostParticles::flush (ImpactXParticleContainer & lost)
+    {
+        BL_PROFILE("impactx::diagnostics::LostParticles::flush");
+
+        if (m_histogram) {
+            // create a host-side particle buffer
+            auto tmp = lost.make_alike<amrex::PinnedArenaAllocator>();
+
+            // copy all particles from device to host
+            bool const local = true;
+            tmp.copyParticles(lost, local);
+
+            int const s_index = lost.GetRealCompIndex("s_lost");
+            long const num_bins = static_cast<long>(m_num.size());
+
+            // loop over refinement levels
+            int const nLevel = tmp.finestLevel();
+            for (int lev = 0; lev <= nLevel; ++lev) {
+                // loop over all particle boxes
+                using MyPinnedParIter = amrex::ParIterSoA<RealSoA::nattribs, IntSoA::nattribs, amrex::PinnedArenaAllocator>;
+                for (MyPinnedParIter pti(tmp, lev); pti.isValid(); ++pti) {
+                    const int np = pti.numParticles();
+
+                    auto const& soa = pti.GetStructOfArrays();
+                    auto const& part_w = soa.GetRealData(RealSoA::w);
+                    auto const& part_s = soa.GetRealData(s_index);
+
+                    for (int i = 0; i < np; ++i) {
+                        // position within the period; losses at the boundary of two
+                        // periods, up to rounding errors of s, count at the end of the earlier one
+                        amrex::Real s_period = part_s[i] - m_s_start;
+                        if (m_period_length > amrex::Real(0)) {
+                            amrex::Real const period = std::max(
+                                amrex::Real(0), std::ceil(s_period / m_period_length - amrex::Real(1.0e-9)) - amrex::Real(1));
+                            s_period -= period * m_period_length;
+                        }
+                        long const bin = std::clamp(static_cast<long>(std::floor(s_period / m_histogram_ds)), 0L, num_bins - 1);
+                        m_num[bin]++;
+                        m_charge_lost[bin] += m_charge * part_w[i];
+                    }
+                } // end loop over all particle boxes
+            } // end mesh-refinement level loop
+        } else {
+            // only write non-empty chunks
+            if (lost.TotalNumberOfParticles(false, false) == 0) { return; }
+
+            if (!m_output.has_value()) {
+                m_output.emplace("particles_lost", m_backend, "g");
+            }
+            (*m_output)(lost, m_num_chunks);
+            m_num_chunks++;
+        }
+
+        // free the lost particles
+        lost.clearParticles();
+    }
+
+    void
+    LostParticles::write_histogram ()
+    {
+        // the bins of all MPI ranks cover the same period of the lattice
+        int const num_bins = static_cast<int>(m_num.size());
+        amrex::ParallelAllReduce::Sum(m_num.data(), num_bins, amrex::ParallelDescriptor::Communicator());
+        amrex::ParallelAllReduce::Sum(m_charge_lost.data(), num_bins, amrex::ParallelDescriptor::Communicator());
+
+        amrex::PrintToFile file_handler("diags/particles_lost_histogram");
+        file_handler.SetPrecision(std::numeric_limits<amrex::Real>::max_digits10);
+        file_handler << "s_min s_max num_particles charge_C\n";
+        for (int bin = 0; bin < num_bins; ++bin) {
+            amrex::Real s_max = (bin + 1) * m_histogram_ds;
+            if (m_period_length > amrex::Real(0)) { s_max = std::min(s_max, m_period_length); }
+            file_handler << bin * m_histogram_ds << " " << s_max << " "
+                         << m_num[bin] << " " << m_charge_lost[bin] << "\n";
+        }
+
+        std::fill(m_num.begin(), m_num.end(), 0);
+        std::fill(m_charge_lost.begin(), m_charge_lost.end(), amrex::Real(0));
+    }
+
+} // namespace impactx::diagnostics
@@ -9,30 +9,190 @@
  */
 
 #include "ReducedBeamCharacteristics.H"
+#include "BeamHalo.H"
+#include "EmittanceInvariants.H"
 
 #include "particles/ImpactXParticleContainer.H"
+#include "particles/LinearMap.H"
 #include "particles/ReferenceParticle.H"
 
 #include <AMReX_BLProfiler.H>           // for TinyProfiler
+#include <AMReX_GpuContainers.H>        // for Gpu::copy
 #include <AMReX_GpuQualifiers.H>        // for AMREX_GPU_DEVICE
-#include <AMReX_REAL.H>                 // for ParticleReal
+#include <AMReX_REAL.H>                 // for Real
 #include <AMReX_Reduce.H>               // for ReduceOps
 #include <AMReX_ParallelDescriptor.H>   // for ParallelDescriptor
 #include <AMReX_ParticleReduce.H>       // for ParticleReduce
 #include <AMReX_TypeList.H>             // for TypeMultiplier
 
+#if defined(AMREX_USE_MPI)
+#   include <mpi.h>
+#endif
+
+#include <algorithm>
+#include <array>
+#include <cmath>
+#include <limits>
+
 
 namespace impactx::diagnostics
 {
-    std::unordered_map<std::string, amrex::ParticleReal>
+namespace
+{
+    /** Moments of the particles of a part of the beam
+     *
+     * The central (co-)moments are stored as weighted sums of the products of
+     * the deviations from the mean, so that the moments of two parts of the
+     * beam can be merged without loss of precision (Chan et al.).
+     * The layout is flat, to merge the moments of all MPI ranks in a
+     * single MPI reduction.
+     */
+    namespace moments
+    {
+        //! number of phase space coordinates: x, y, t, px, py, pt
+        constexpr int ncoords = 6;
+        //! number of independent central (co-)moments: the upper triangle of the covariance matrix
+        constexpr int nmoments = ncoords * (ncoords + 1) / 2;
+        //! pairs of coordinates of the central (co-)moments, row by row
+        constexpr std::array<std::array<int, 2>, nmoments> pairs{{
+            {0, 0}, {0, 1}, {0, 2}, {0, 3}, {0, 4}, {0, 5},
+                    {1, 1}, {1, 2}, {1, 3}, {1, 4}, {1, 5},
+                            {2, 2}, {2, 3}, {2, 4}, {2, 5},
+                                    {3, 3}, {3, 4}, {3, 5},
+                                            {4, 4}, {4, 5},
+                                                    {5, 5}}};
+
+        //! index of the sum of weights
+        constexpr int w = 0;
+        //! index of the first mean
+        constexpr int mean = 1;
+        //! index of the first central (co-)moment
+        constexpr int m2 = mean + ncoords;
+        //! index of the first minimum
+        constexpr int min = m2 + nmoments;
+        //! index of the first maximum
+        constexpr int max = min + ncoords;
+        //! number of values
+        constexpr int size = max + ncoords;
+
+        using State = std::array<amrex::Real, size>;
+
+        /** Merge the moments of part b into part a
+         *
+         * @param[inout] a moments of the first part, merged moments on return
+         * @param[in] b moments of the second part
+         */
+        void
+        merge (amrex::Real * a, amrex::Real const * b)
+        {
+            amrex::Real const w_a = a[w];
+            amrex::Real const w_b = b[w];
+            amrex::Real const w_ab = w_a + w_b;
+
+            if (w_b != 0.0 && w_ab != 0.0) {
+                std::array<amrex::Real, ncoords> delta{};
+                for (int i = 0; i < ncoords; ++i) {
+                    delta[i] = b[mean + i] - a[mean + i];
+                    a[mean + i] += delta[i] * w_b / w_ab;
+                }
+                for (int k = 0; k < nmoments; ++k) {
+                    auto const [i, j] = pairs[k];
+                    a[m2 + k] += b[m2 + k] + delta[i] * delta[j] * w_a * w_b / w_ab;
+                }
+                a[w] = w_ab;
+            }
+            for (int i = 0; i < ncoords; ++i) {
+                a[min + i] = std::min(a[min + i], b[min + i]);
+                a[max + i] = std::max(a[max + i], b[max + i]);
+            }
+        }
+
+#if defined(AMREX_USE_MPI)
+        /** MPI reduction operation that merges the moments of MPI ranks */
+        void
+        mpi_merge (void * in, void * inout, int * len, MPI_Datatype * /* datatype */)
+        {
+            auto const * b = static_cast<amrex::Real const *>(in);
+            auto * a = static_cast<amrex::Real *>(inout);
+            for (int n = 0; n < *len; ++n) {
+                merge(a + n * size, b + n * size);
+            }
+        }
+#endif
+
+        /** Merge the moments of all MPI ranks
+         *
+         * @param[inout] state moments of this MPI rank, moments of the beam on return
+         */
+        void
+        allreduce ([[maybe_unused]] State & state)
+        {
+#if defined(AMREX_USE_MPI)
+            MPI_Datatype state_type;
+            MPI_Type_contiguous(size, amrex::ParallelDescriptor::Mpi_typemap<amrex::Real>::type(), &state_type);
+            MPI_Type_commit(&state_type);
+            MPI_Op merge_op;
+            int const commute = 1;
+            MPI_Op_create(&mpi_merge, commute, &merge_op);
+
+            MPI_Allreduce(MPI_IN_PLACE, state.data(), 1, state_type, merge_op,
+                          amrex::ParallelDescriptor::Communicator());
+
+            MPI_Op_free(&merge_op);
+            MPI_Type_free(&state_type);
+#endif
+        }
+    } // namespace moments
+
+    /** Phase space coordinates of one particle of this MPI rank
+     *
+     * The moments of this MPI rank are summed relative to this particle,
+     * which is close to the mean and thus avoids the cancellation of
+     * naive one-pass sums.
+     *
+     * @param pc the particle container
+     * @return x, y, t, px, py, pt of a particle, zeros if there are none
+     */
+    std::array<amrex::Real, moments::ncoords>
+    pilot_particle (ImpactXParticleContainer const & pc)
+    {
+        std::array<amrex::Real, moments::ncoords> pilot{};
+        for (int lev = 0; lev <= pc.finestLevel(); ++lev) {
+            for (auto const & [index, ptile] : pc.GetParticles(lev)) {
+                if (ptile.numParticles() == 0) { continue; }
+
+                auto const & soa = ptile.GetStructOfArrays();
+                int const comps[moments::ncoords] = {RealSoA::x, RealSoA::y, RealSoA::t,
+                                                     RealSoA::px, RealSoA::py, RealSoA::pt};
+                for (int i = 0; i < moments::ncoords; ++i) {
+                    amrex::ParticleReal value = 0.0;
+                    amrex::ParticleReal const * const ptr = soa.GetRealData(comps[i]).dataPtr();
+                    amrex::Gpu::copy(amrex::Gpu::deviceToHost, ptr, ptr + 1, &value);
+                    pilot[i] = value;
+                }
+                return pilot;
+            }
+        }
+        return pilot;
+    }
+} // namespace
+
+    std::unordered_map<std::string, amrex::Real>
     reduced_beam_characteristics (ImpactXParticleContainer const & pc)
     {
         BL_PROFILE("impactx::diagnostics::reduced_beam_characteristics");
 
+        using namespace amrex::literals; // for _rt and _prt
+
         // preparing to access reference particle data: RefPart
         RefPart const ref_part = pc.GetRefParticle();
         // reference particle charge in C
-        amrex::ParticleReal const q_C = ref_part.charge;
+        amrex::Real const q_C = ref_part.charge;
+
+        // shift of the coordinates for the sums on this MPI rank
+        auto const pilot = pilot_particle(pc);
+        amrex::Real const x0 = pilot[0], y0 = pilot[1], t0 = pilot[2];
+        amrex::Real const px0 = pilot[3], py0 = pilot[4], pt0 = pilot[5];
 
         // preparing access to particle data: SoA
         using PType = typename ImpactXParticleContainer::SuperParticleType;
@@ -40,225 +200,170 @@ namespace impactx::diagnostics
         /* The variables below need to be static to work around an MSVC bug
          * https://stackoverflow.com/questions/55136414/constexpr-variable-captured-inside-lambda-loses-its-constexpr-ness
          */
-        // numbers of same type reduction operations in first concurrent batch
-        static constexpr std::size_t num_red_ops_1_sum = 7;  // summation
-        static constexpr std::size_t num_red_ops_1_min = 6;  // minimum
-        static constexpr std::size_t num_red_ops_1_max = 6;  // maximum
+        // numbers of same type reduction operations in a single pass
+        static constexpr std::size_t num_red_ops_sum = 1 + moments::ncoords + moments::nmoments;  // summation: 28
+        static constexpr std::size_t num_red_ops_min = moments::ncoords;  // minimum
+        static constexpr std::size_t num_red_ops_max = moments::ncoords;  // maximum
 
-        // prepare reduction operations for calculation of mean and min/max values in 6D phase space
+        // prepare reduction operations for the shifted sums and min/max values in 6D phase space
         amrex::TypeMultiplier<amrex::ReduceOps,
-            amrex::ReduceOpSum[num_red_ops_1_sum],  // preparing mean values for w, x, y, t, px, py, pt
-            amrex::ReduceOpMin[num_red_ops_1_min],  // preparing min values for x, y, t, px, py, pt
-            amrex::ReduceOpMax[num_red_ops_1_max]   // preparing max values for x, y, t, px, py, pt
-        > reduce_ops_1;
-        using ReducedDataT1 = amrex::TypeMultiplier<amrex::ReduceData, amrex::ParticleReal[num_red_ops_1_sum + num_red_ops_1_min + num_red_ops_1_max]>;
+            amrex::ReduceOpSum[num_red_ops_sum],  // w, shifted sums of x, y, t, px, py, pt and of their products
+            amrex::ReduceOpMin[num_red_ops_min],  // preparing min values for x, y, t, px, py, pt
+            amrex::ReduceOpMax[num_red_ops_max]   // preparing max values for x, y, t, px, py, pt
+        > reduce_ops;
+        using ReducedDataT = amrex::TypeMultiplier<amrex::ReduceData, amrex::Real[num_red_ops_sum + num_red_ops_min + num_red_ops_max]>;
 
-        auto r1 = amrex::ParticleReduce<ReducedDataT1>(
+        auto r = amrex::ParticleReduce<ReducedDataT>(
             pc,
-            [=] AMREX_GPU_DEVICE(const PType& p) noexcept -> ReducedDataT1::Type
+            [=] AMREX_GPU_DEVICE(const PType& p) noexcept -> ReducedDataT::Type
             {
                 // access particle position data
-                const amrex::ParticleReal p_x = p.rdata(RealSoA::x);
-                const amrex::ParticleReal p_y = p.rdata(RealSoA::y);
-                const amrex::ParticleReal p_t = p.rdata(RealSoA::t);
+                const amrex::Real p_x = p.rdata(RealSoA::x);
+                const amrex::Real p_y = p.rdata(RealSoA::y);
+                const amrex::Real p_t = p.rdata(RealSoA::t);
 
                 // access SoA particle momentum data and weighting
-                const amrex::ParticleReal p_w = p.rdata(RealSoA::w);
-                const amrex::ParticleReal p_px = p.rdata(RealSoA::px);
-                const amrex::ParticleReal p_py = p.rdata(RealSoA::py);
-                const amrex::ParticleReal p_pt = p.rdata(RealSoA::pt);
-
-                // prepare mean position values
-                const amrex::ParticleReal p_x_mean = p_x * p_w;
-                const amrex::ParticleReal p_y_mean = p_y * p_w;
-                const amrex::ParticleReal p_t_mean = p_t * p_w;
-
-                const amrex::ParticleReal p_px_mean = p_px * p_w;
-                const amrex::ParticleReal p_py_mean = p_py * p_w;
-                const amrex::ParticleReal p_pt_mean = p_pt * p_w;
+                const amrex::Real p_px = p.rdata(RealSoA::px);
+                const amrex::Real p_py = p.rdata(RealSoA::py);
+                const amrex::Real p_pt = p.rdata(RealSoA::pt);
+
+                // lost particles that are not yet removed from the beam do not contribute
+                const bool valid = p.id().is_valid();
+                const amrex::Real p_w = valid ? amrex::Real(p.rdata(RealSoA::w)) : 0.0_rt;
+
+                // shifted coordinates
+                const amrex::Real dx = valid ? p_x - x0 : 0.0_rt;
+                const amrex::Real dy = valid ? p_y - y0 : 0.0_rt;
+                const amrex::Real dt = valid ? p_t - t0 : 0.0_rt;
+                const amrex::Real dpx = valid ? p_px - px0 : 0.0_rt;
+                const amrex::Real dpy = valid ? p_py - py0 : 0.0_rt;
+                const amrex::Real dpt = valid ? p_pt - pt0 : 0.0_rt;
+
+                // extent of the beam
+                constexpr amrex::Real lowest = std::numeric_limits<amrex::Real>::lowest();
+                constexpr amrex::Real highest = std::numeric_limits<amrex::Real>::max();
+                const amrex::Real min_x = valid ? p_x : highest, max_x = valid ? p_x : lowest;
+                const amrex::Real min_y = valid ? p_y : highest, max_y = valid ? p_y : lowest;
+                const amrex::Real min_t = valid ? p_t : highest, max_t = valid ? p_t : lowest;
+                const amrex::Real min_px = valid ? p_px : highest, max_px = valid ? p_px : lowest;
+                const amrex::Real min_py = valid ? p_py : highest, max_py = valid ? p_py : lowest;
+                const amrex::Real min_pt = valid ? p_pt : highest, max_pt = valid ? p_pt : lowest;
+
+                const amrex::Real wx = dx * p_w;
+                const amrex::Real wy = dy * p_w;
+                const amrex::Real wt = dt * p_w;
+                const amrex::Real wpx = dpx * p_w;
+                const amrex::Real wpy = dpy * p_w;
+                const amrex::Real wpt = dpt * p_w;
 
                 return {p_w,
-                        p_x_mean, p_y_mean, p_t_mean,
-                        p_px_mean, p_py_mean, p_pt_mean,
-                        p_x, p_y, p_t, p_px, p_py, p_pt,
-                        p_x, p_y, p_t, p_px, p_py, p_pt};
+                        wx, wy, wt, wpx, wpy, wpt,
+                        dx * wx, dx * wy, dx * wt, dx * wpx, dx * wpy, dx * wpt,
+                                 dy * wy, dy * wt, dy * wpx, dy * wpy, dy * wpt,
+                                          dt * wt, dt * wpx, dt * wpy, dt * wpt,
+                                                   dpx * wpx, dpx * wpy, dpx * wpt,
+                                                              dpy * wpy, dpy * wpt,
+                                                                         dpt * wpt,
+                        min_x, min_y, min_t, min_px, min_py, min_pt,
+                        max_x, max_y, max_t, max_px, max_py, max_pt};
             },
-            reduce_ops_1
+            reduce_ops
         );
 
-        std::vector<amrex::ParticleReal> values_per_rank_1st(num_red_ops_1_sum);
-
         /* contains in this order:
-         * w, x_mean, y_mean, t_mean
-         * px_mean, py_mean, pt_mean
+         * w, shifted sums of x, y, t, px, py, pt,
+         * shifted sums of all products of two of x, y, t, px, py, pt, in the order of moments::pairs,
+         * min and max of x, y, t, px, py, pt
          */
-        amrex::constexpr_for<0, num_red_ops_1_sum> ([&](auto i) {
-            values_per_rank_1st[i] = amrex::get<i>(r1);
+        std::array<amrex::Real, num_red_ops_sum + num_red_ops_min + num_red_ops_max> values{};
+        amrex::constexpr_for<0, num_red_ops_sum + num_red_ops_min + num_red_ops_max> ([&](auto i) {
+            values[i] = amrex::get<i>(r);
         });
 
-        // reduced sum over mpi ranks (allreduce)
-        amrex::ParallelAllReduce::Sum(
-            values_per_rank_1st.data(),
-            values_per_rank_1st.size(),
-            amrex::ParallelDescriptor::Communicator()
-        );
-
-        amrex::ParticleReal const w_sum   = values_per_rank_1st.at(0);
-        amrex::ParticleReal const x_mean  = values_per_rank_1st.at(1) /= w_sum;
-        amrex::ParticleReal const y_mean  = values_per_rank_1st.at(2) /= w_sum;
-        amrex::ParticleReal const t_mean  = values_per_rank_1st.at(3) /= w_sum;
-        amrex::ParticleReal const px_mean = values_per_rank_1st.at(4) /= w_sum;
-        amrex::ParticleReal const py_mean = values_per_rank_1st.at(5) /= w_sum;
-        amrex::ParticleReal const pt_mean = values_per_rank_1st.at(6) /= w_sum;
-
-        std::vector<amrex::ParticleReal> values_per_rank_min(num_red_ops_1_min);
-
-        /* contains in this order:
-         * x_min, y_min, t_min
-         * px_min, py_min, pt_min
-         */
-        amrex::constexpr_for<0, num_red_ops_1_min> ([&](auto i) {
-            constexpr std::size_t idx = i + num_red_ops_1_sum;
-            values_per_rank_min[i] = amrex::get<idx>(r1);
-        });
-
-        std::vector<amrex::ParticleReal> values_per_rank_max(num_red_ops_1_max);
-
-        /* contains in this order:
-         * x_max, y_max, t_max
-         * px_max, py_max, pt_max
-         */
-        amrex::constexpr_for<0, num_red_ops_1_max> ([&](auto i) {
-            constexpr std::size_t idx = i + num_red_ops_1_sum + num_red_ops_1_min;
-            values_per_rank_max[i] = amrex::get<idx>(r1);
-        });
-
-        // reduced sum over mpi ranks (allreduce)
-        amrex::ParallelAllReduce::Min(
-                values_per_rank_min.data(),
-                values_per_rank_min.size(),
-                amrex::ParallelDescriptor::Communicator()
-        );
-
-        // reduced sum over mpi ranks (allreduce)
-        amrex::ParallelAllReduce::Max(
-                values_per_rank_max.data(),
-                values_per_rank_max.size(),
-                amrex::ParallelDescriptor::Communicator()
-        );
-
-        /* The variable below needs to be static to work around an MSVC bug
-         * https://stackoverflow.com/questions/55136414/constexpr-variable-captured-inside-lambda-loses-its-constexpr-ness
-         */
-        // number of reduction operations in second concurrent batch
-        static constexpr std::size_t num_red_ops_2 = 10;
-        // prepare reduction operations for calculation of mean square and correlation values
-        amrex::TypeMultiplier<amrex::ReduceOps, amrex::ReduceOpSum[num_red_ops_2]> reduce_ops_2;
-        using ReducedDataT2 = amrex::TypeMultiplier<amrex::ReduceData, amrex::ParticleReal[num_red_ops_2]>;
-
-        auto r2 = amrex::ParticleReduce<ReducedDataT2>(
-                pc,
-                [=] AMREX_GPU_DEVICE(const PType& p) noexcept
-            -> ReducedDataT2::Type
-            {
-                // access SoA particle momentum data and weighting
-                const amrex::ParticleReal p_w = p.rdata(RealSoA::w);
-                const amrex::ParticleReal p_px = p.rdata(RealSoA::px);
-                const amrex::ParticleReal p_py = p.rdata(RealSoA::py);
-                const amrex::ParticleReal p_pt = p.rdata(RealSoA::pt);
-                // access position data
-                const amrex::ParticleReal p_x = p.rdata(RealSoA::x);
-                const amrex::ParticleReal p_y = p.rdata(RealSoA::y);
-                const amrex::ParticleReal p_t = p.rdata(RealSoA::t);
-                // prepare mean square for positions
-                const amrex::ParticleReal p_x_ms = (p_x-x_mean)*(p_x-x_mean)*p_w;
-                const amrex::ParticleReal p_y_ms = (p_y-y_mean)*(p_y-y_mean)*p_w;
-                const amrex::ParticleReal p_t_ms = (p_t-t_mean)*(p_t-t_mean)*p_w;
-                // prepare mean square for momenta
-                const amrex::ParticleReal p_px_ms = (p_px-px_mean)*(p_px-px_mean)*p_w;
-                const amrex::ParticleReal p_py_ms = (p_py-py_mean)*(p_py-py_mean)*p_w;
-                const amrex::ParticleReal p_pt_ms = (p_pt-pt_mean)*(p_pt-pt_mean)*p_w;
-
-                const amrex::ParticleReal p_xpx = (p_x-x_mean)*(p_px-px_mean)*p_w;
-                const amrex::ParticleReal p_ypy = (p_y-y_mean)*(p_py-py_mean)*p_w;
-                const amrex::ParticleReal p_tpt = (p_t-t_mean)*(p_pt-pt_mean)*p_w;
-
-                const amrex::ParticleReal p_charge = q_C*p_w;
-
-                return {p_x_ms, p_y_ms, p_t_ms,
-                        p_px_ms, p_py_ms, p_pt_ms,
-                        p_xpx, p_ypy, p_tpt,
-                        p_charge};
-            },
-                reduce_ops_2
-        );
-
-        std::vector<amrex::ParticleReal> values_per_rank_2nd(num_red_ops_2);
-
-        /* contains in this order:
-         * x_ms, y_ms, t_ms
-         * px_ms, py_ms, pt_ms,
-         * xpx, ypy, tpt,
-         * charge
-         */
-        amrex::constexpr_for<0, num_red_ops_2> ([&](auto i) {
-            values_per_rank_2nd[i] = amrex::get<i>(r2);
-        });
-
-        // reduced sum over mpi ranks (allreduce)
-        amrex::ParallelAllReduce::Sum(
-            values_per_rank_2nd.data(),
-            values_per_rank_2nd.size(),
-            amrex::ParallelDescriptor::Communicator()
-        );
-
+        // central moments of this MPI rank from the shifted sums
+        moments::State state{};
+        amrex::Real const w_rank = values[0];
+        state[moments::w] = w_rank;
+        std::array<amrex::Real, moments::ncoords> mean_shift{};
+        for (int i = 0; i < moments::ncoords; ++i) {
+            mean_shift[i] = w_rank > 0.0 ? values[1 + i] / w_rank : 0.0;
+            state[moments::mean + i] = pilot[i] + mean_shift[i];
+            state[moments::min + i] = values[num_red_ops_sum + i];
+            state[moments::max + i] = values[num_red_ops_sum + num_red_ops_min + i];
+        }
+        for (int k = 0; k < moments::nmoments; ++k) {
+            auto const [i, j] = moments::pairs[k];
+            state[moments::m2 + k] = values[1 + moments::ncoords + k] - w_rank * mean_shift[i] * mean_shift[j];
+        }
+
+        // merge the moments of all MPI ranks in a single allreduce
+        moments::allreduce(state);
+
+        amrex::Real const w_sum = state[moments::w];
+        // mean values
+        amrex::Real const x_mean = state[moments::mean + 0];
+        amrex::Real const y_mean = state[moments::mean + 1];
+        amrex::Real const t_mean = state[moments::mean + 2];
+        amrex::Real const px_mean = state[moments::mean + 3];
+        amrex::Real const py_mean = state[moments::mean + 4];
+        amrex::Real const pt_mean = state[moments::mean + 5];
         // minimum values
-        amrex::ParticleReal const x_min = values_per_rank_min.at(0);
-        amrex::ParticleReal const y_min = values_per_rank_min.at(1);
-        amrex::ParticleReal const t_min = values_per_rank_min.at(2);
-        amrex::ParticleReal const px_min = values_per_rank_min.at(3);
-        amrex::ParticleReal const py_min = values_per_rank_min.at(4);
-        amrex::ParticleReal const pt_min = values_per_rank_min.at(5);
+        amrex::Real const x_min = state[moments::min + 0];
+        amrex::Real const y_min = state[moments::min + 1];
+        amrex::Real const t_min = state[moments::min + 2];
+        amrex::Real const px_min = state[moments::min + 3];
+        amrex::Real const py_min = state[moments::min + 4];
+        amrex::Real const pt_min = state[moments::min + 5];
         // maximum values
-        amrex::ParticleReal const x_max = values_per_rank_max.at(0);
-        amrex::ParticleReal const y_max = values_per_rank_max.at(1);
-        amrex::ParticleReal const t_max = values_per_rank_max.at(2);
-        amrex::ParticleReal const px_max = values_per_rank_max.at(3);
-        amrex::ParticleReal const py_max = values_per_rank_max.at(4);
-        amrex::ParticleReal const pt_max = values_per_rank_max.at(5);
+        amrex::Real const x_max = state[moments::max + 0];
+        amrex::Real const y_max = state[moments::max + 1];
+        amrex::Real const t_max = state[moments::max + 2];
+        amrex::Real const px_max = state[moments::max + 3];
+        amrex::Real const py_max = state[moments::max + 4];
+        amrex::Real const pt_max = state[moments::max + 5];
+        // covariance matrix of the phase space vector (x, px, y, py, t, pt)
+        int const phase_index[moments::ncoords] = {1, 3, 5, 2, 4, 6};
+        LinearMap::Matrix6x6 cov;
+        for (int k = 0; k < moments::nmoments; ++k) {
+            auto const [i, j] = moments::pairs[k];
+            cov(phase_index[i], phase_index[j]) = state[moments::m2 + k] / w_sum;
+            cov(phase_index[j], phase_index[i]) = state[moments::m2 + k] / w_sum;
+        }
         // mean square and correlation values
-        amrex::ParticleReal const x_ms   = values_per_rank_2nd.at(0) /= w_sum;
-        amrex::ParticleReal const y_ms   = values_per_rank_2nd.at(1) /= w_sum;
-        amrex::ParticleReal const t_ms   = values_per_rank_2nd.at(2) /= w_sum;
-        amrex::ParticleReal const px_ms  = values_per_rank_2nd.at(3) /= w_sum;
-        amrex::ParticleReal const py_ms  = values_per_rank_2nd.at(4) /= w_sum;
-        amrex::ParticleReal const pt_ms  = values_per_rank_2nd.at(5) /= w_sum;
-        amrex::ParticleReal const xpx    = values_per_rank_2nd.at(6) /= w_sum;
-        amrex::ParticleReal const ypy    = values_per_rank_2nd.at(7) /= w_sum;
-        amrex::ParticleReal const tpt    = values_per_rank_2nd.at(8) /= w_sum;
-        amrex::ParticleReal const charge = values_per_rank_2nd.at(9);
+        amrex::Real const x_ms   = cov(1, 1);
+        amrex::Real const y_ms   = cov(3, 3);
+        amrex::Real const t_ms   = cov(5, 5);
+        amrex::Real const px_ms  = cov(2, 2);
+        amrex::Real const py_ms  = cov(4, 4);
+        amrex::Real const pt_ms  = cov(6, 6);
+        amrex::Real const xpx    = cov(1, 2);
+        amrex::Real const ypy    = cov(3, 4);
+        amrex::Real const tpt    = cov(5, 6);
+        amrex::Real const charge = q_C * w_sum;
         // standard deviations of positions
-        amrex::ParticleReal const sig_x = std::sqrt(x_ms);
-        amrex::ParticleReal const sig_y = std::sqrt(y_ms);
-        amrex::ParticleReal const sig_t = std::sqrt(t_ms);
+        amrex::Real const sig_x = std::sqrt(x_ms);
+        amrex::Real const sig_y = std::sqrt(y_ms);
+        amrex::Real const sig_t = std::sqrt(t_ms);
         // standard deviations of momenta
-        amrex::ParticleReal const sig_px = std::sqrt(px_ms);
-        amrex::ParticleReal const sig_py = std::sqrt(py_ms);
-        amrex::ParticleReal const sig_pt = std::sqrt(pt_ms);
+        amrex::Real const sig_px = std::sqrt(px_ms);
+        amrex::Real const sig_py = std::sqrt(py_ms);
+        amrex::Real const sig_pt = std::sqrt(pt_ms);
         // RMS emittances
-        amrex::ParticleReal const emittance_x = std::sqrt(x_ms*px_ms-xpx*xpx);
-        amrex::ParticleReal const emittance_y = std::sqrt(y_ms*py_ms-ypy*ypy);
-        amrex::ParticleReal const emittance_t = std::sqrt(t_ms*pt_ms-tpt*tpt);
+        amrex::Real const emittance_x = std::sqrt(x_ms*px_ms-xpx*xpx);
+        amrex::Real const emittance_y = std::sqrt(y_ms*py_ms-ypy*ypy);
+        amrex::Real const emittance_t = std::sqrt(t_ms*pt_ms-tpt*tpt);
         // Courant-Snyder (Twiss) beta-function
-        amrex::ParticleReal const beta_x = x_ms / emittance_x;
-        amrex::ParticleReal const beta_y = y_ms / emittance_y;
-        amrex::ParticleReal const beta_t = t_ms / emittance_t;
+        amrex::Real const beta_x = x_ms / emittance_x;
+        amrex::Real const beta_y = y_ms / emittance_y;
+        amrex::Real const beta_t = t_ms / emittance_t;
         // Courant-Snyder (Twiss) alpha
-        amrex::ParticleReal const alpha_x = - xpx / emittance_x;
-        amrex::ParticleReal const alpha_y = - ypy / emittance_y;
-        amrex::ParticleReal const alpha_t = - tpt / emittance_t;
+        amrex::Real const alpha_x = - xpx / emittance_x;
+        amrex::Real const alpha_y = - ypy / emittance_y;
+        amrex::Real const alpha_t = - tpt / emittance_t;
+        // eigen-emittances and 4D/6D emittances of the coupled beam
+        EigenEmittances const eigen = eigen_emittances(cov, {emittance_x, emittance_y, emittance_t});
 
-        std::unordered_map<std::string, amrex::ParticleReal> data;
+        std::unordered_map<std::string, amrex::Real> data;
         data["x_mean"] = x_mean;
         data["x_min"] = x_min;
         data["x_max"] = x_max;
@@ -293,6 +398,16 @@ namespace impactx::diagnostics
         data["beta_y"] = beta_y;
         data["beta_t"] = beta_t;
         data["charge_C"] = charge;
+        data["emittance_1"] = eigen.emittance_1;
+        data["emittance_2"] = eigen.emittance_2;
+        data["emittance_3"] = eigen.emittance_3;
+        data["emittance_4d"] = eigen.emittance_4d;
+        data["emittance_6d"] = eigen.emittance_6d;
+
+        // optional: percentile emittances and halo parameters
+        if (halo_enabled()) {
+            data.merge(beam_halo(pc, data));
+        }
 
         return data;
     }
@@ -14,7 +14,9 @@
 #include "particles/diagnostics/ReducedBeamCharacteristics.H"
 
 #include <AMReX.H>
+#include <AMReX_Arena.H>
 #include <AMReX_BLProfiler.H>
+#include <AMReX_GpuDevice.H>
 #include <AMReX_REAL.H>
 #include <AMReX_ParmParse.H>
 
@@ -23,6 +25,8 @@
 namespace io = openPMD;
 #endif
 
+#include <cstddef>
+#include <memory>
 #include <string>
 #include <utility>
 #include <vector>
@@ -134,6 +138,34 @@ namespace detail
         const auto [record_name, component_name] = name2openPMD(std::move(comp_name));
         return species[record_name][component_name];
     }
+
+    /** Particle data of a tile in host memory, for openPMD storeChunk
+     *
+     * On CPUs, this is the particle data itself, without a copy.
+     * On GPUs, the data is copied asynchronously to a staging buffer in
+     * pinned host memory, which is freed after it was written by openPMD.
+     * Call amrex::Gpu::streamSynchronize() before the series is flushed.
+     *
+     * @param data the particle data of the tile
+     * @param n the number of values
+     * @param[inout] staged_bytes the size of all staging buffers, in bytes
+     * @return the data in host memory
+     */
+    template<typename T>
+    std::shared_ptr<T>
+    host_chunk (T * data, std::size_t n, [[maybe_unused]] std::size_t & staged_bytes)
+    {
+#ifdef AMREX_USE_GPU
+        std::size_t const nbytes = n * sizeof(T);
+        auto * staging = static_cast<T *>(amrex::The_Pinned_Arena()->alloc(nbytes));
+        amrex::Gpu::dtoh_memcpy_async(staging, data, nbytes);
+        staged_bytes += nbytes;
+        return std::shared_ptr<T>(staging, [](T * p) { amrex::The_Pinned_Arena()->free(p); });
+#else
+        amrex::ignore_unused(n);
+        return std::shared_ptr<T>(data, [](T *) {});
+#endif
+    }
 #endif
 } // namespace detail
 
@@ -182,6 +214,7 @@ namespace detail
         // legacy options from other diagnostics
         amrex::ParmParse pp_diag("diag");
         pp_diag.queryAdd("file_min_digits", m_file_min_digits);
+        pp_diag.queryAdd("monitor_staging_mb", m_staging_mb);
 
         // Ensure m_series is the same for the same names.
         if (m_unique_series.count(m_series_name) == 0u) {
@@ -220,7 +253,7 @@ namespace detail
     }
 
     void BeamMonitor::prepare (
-        PinnedContainer & pc,
+        ImpactXParticleContainer & pc,
         std::vector<std::string> const & real_soa_names,
         std::vector<std::string> const & int_soa_names,
         RefPart const & ref_part,
@@ -332,10 +365,6 @@ namespace detail
         std::vector<std::string> real_soa_names = pc.RealSoA_names();
         std::vector<std::string> int_soa_names = pc.intSoA_names();
 
-        // pinned memory copy
-        PinnedContainer pinned_pc = pc.make_alike<amrex::PinnedArenaAllocator>();
-        pinned_pc.copyParticles(pc, true);  // no filtering
-
         // TODO: filtering
         /*
         using SrcData = WarpXParticleContainer::ParticleTileType::ConstParticleTileDataType;
@@ -349,17 +378,16 @@ namespace detail
         */
 
         // prepare element access & write reference particle
-        this->prepare(pinned_pc, real_soa_names, int_soa_names, ref_part, step);
+        this->prepare(pc, real_soa_names, int_soa_names, ref_part, step);
 
         // loop over refinement levels
-        int const nLevel = pinned_pc.finestLevel();
+        int const nLevel = pc.finestLevel();
         for (int lev = 0; lev <= nLevel; ++lev)
         {
             // loop over all particle boxes
-            //using ParIt = ImpactXParticleContainer::iterator;
-            using ParIt = PinnedContainer::ParIterType;
+            using ParIt = ImpactXParticleContainer::iterator;
             // note: openPMD-api is not thread-safe, so do not run OMP parallel here
-            for (ParIt pti(pinned_pc, lev); pti.isValid(); ++pti) {
+            for (ParIt pti(pc, lev); pti.isValid(); ++pti) {
                 // write beam particles relative to reference particle
                 this->operator()(pti, real_soa_names, int_soa_names, ref_part);
             } // end loop over all particle boxes
@@ -369,8 +397,13 @@ namespace detail
         io::WriteIterations iterations = series.writeIterations();
         io::Iteration iteration = iterations[m_step];
 
-        // close iteration
+#ifdef AMREX_USE_GPU
+        // the staged data must have arrived on the host before it is written
+        amrex::Gpu::streamSynchronize();
+#endif
+        // close iteration: this flushes all particle tiles of the step at once
         iteration.close();
+        m_staged_bytes = 0;
 #else
         amrex::ignore_unused(pc, step);
 #endif // ImpactX_USE_OPENPMD
@@ -378,7 +411,7 @@ namespace detail
 
     void
     BeamMonitor::operator() (
-        PinnedContainer::ParIterType & pti,
+        ImpactXParticleContainer::iterator & pti,
         std::vector<std::string> const & real_soa_names,
         std::vector<std::string> const & int_soa_names,
         RefPart const & ref_part
@@ -402,7 +435,7 @@ namespace detail
 
         // Do not call storeChunk() with zero-sized particle tiles:
         //   https://github.com/openPMD/openPMD-api/issues/1147
-        //if (numParticleOnTile == 0) continue;
+        if (numParticleOnTile == 0) { return; }
 
         auto const scalar = openPMD::RecordComponent::SCALAR;
         auto const getComponentRecord = [&beam](std::string comp_name) {
@@ -410,17 +443,20 @@ namespace detail
         };
 
         // SoA
-        auto const& soa = pti.GetStructOfArrays();
+        auto & soa = pti.GetStructOfArrays();
         //   particle id arrays
         {
-            beam["id"][scalar].storeChunkRaw(soa.GetIdCPUData().data(), {offset}, {numParticleOnTile64});
+            beam["id"][scalar].storeChunk(
+                detail::host_chunk(soa.GetIdCPUData().data(), numParticleOnTile, m_staged_bytes),
+                {offset}, {numParticleOnTile64});
         }
         //   SoA floating point (ParticleReal) properties
         {
             for (auto real_idx=0; real_idx < soa.NumRealComps(); real_idx++) {
                 auto const component_name = real_soa_names.at(real_idx);
-                getComponentRecord(component_name).storeChunkRaw(
-                soa.GetRealData(real_idx).data(), {offset}, {numParticleOnTile64});
+                getComponentRecord(component_name).storeChunk(
+                    detail::host_chunk(soa.GetRealData(real_idx).data(), numParticleOnTile, m_staged_bytes),
+                    {offset}, {numParticleOnTile64});
             }
         }
         //   SoA integer (int) properties (not yet used)
@@ -447,9 +483,15 @@ namespace detail
         // needs to be higher for next pti; must be reset for next step via prepare
         offset += numParticleOnTile64;
 
-        // TODO could be done once after all pti are processed
-        // TODO at that point, we could also close the iteration/step
-        series.flush();
+        // the series is flushed once per step, when the iteration is closed,
+        // or earlier if the staging buffers of a GPU run get too large
+        if (static_cast<amrex::Real>(m_staged_bytes) > m_staging_mb * 1024.0 * 1024.0) {
+#ifdef AMREX_USE_GPU
+            amrex::Gpu::streamSynchronize();
+#endif
+            series.flush();
+            m_staged_bytes = 0;
+        }
 #else
         amrex::ignore_unused(pti, ref_part);
 #endif   // ImpactX_USE_OPENPMD
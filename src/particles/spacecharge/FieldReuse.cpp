@@ -0,0 +1,100 @@
+/* Copyright 2022-2023 The Regents of the University of California, through Lawrence
+ *           Berkeley National Laboratory (subject to receipt of any required
+ *           approvals from the U.S. Dept. of Energy). All rights reserved.
+ *
+ * This file is part of ImpactX.
+ *
+ * Authors: Axel Huebl, Chad Mitchell
+ * License: BSD-3-Clause-LBNL
+ */
+#include "FieldReuse.H"
+
+#include <AMReX_BLProfiler.H>
+#include <AMReX_ParmParse.H>
+
+#include <cmath>
+
+
+namespace impactx::spacecharge
+{
+    FieldReuse::FieldReuse ()
+    {
+        amrex::ParmParse pp_algo("algo");
+        pp_algo.queryAdd("space_charge_reuse_interval", m_interval);
+        pp_algo.queryAdd("space_charge_reuse_tolerance", m_tolerance);
+        pp_algo.queryAdd("space_charge_reuse_rescale", m_rescale);
+        AMREX_ALWAYS_ASSERT_WITH_MESSAGE(m_interval >= 1,
+            "algo.space_charge_reuse_interval must be at least 1.");
+        AMREX_ALWAYS_ASSERT_WITH_MESSAGE(m_tolerance >= 0.0,
+            "algo.space_charge_reuse_tolerance must not be negative.");
+    }
+
+    bool
+    FieldReuse::can_reuse (ImpactXParticleContainer & pc, amrex::Geometry const & geom)
+    {
+        if (m_interval <= 1) { return false; }
+
+        BL_PROFILE("impactx::spacecharge::FieldReuse::can_reuse");
+
+        auto const [x_mean, x_std, y_mean, y_std, z_mean, z_std] = pc.MeanAndStdPositions();
+        m_current = {x_std, y_std, z_std,
+                     pc.GetRefParticle().beta_gamma(),
+                     pc.TotalNumberOfParticles(true, false)};
+
+        if (!m_solved.has_value() || m_num_reused + 1 >= m_interval) { return false; }
+
+        // particles were lost since the last solve
+        if (m_current.num_particles != m_solved->num_particles) { return false; }
+
+        // the beam changed
+        auto const changed = [this](amrex::ParticleReal now, amrex::ParticleReal then) {
+            return std::abs(now - then) > m_tolerance * std::abs(then);
+        };
+        if (changed(m_current.x_std, m_solved->x_std) ||
+            changed(m_current.y_std, m_solved->y_std) ||
+            changed(m_current.z_std, m_solved->z_std) ||
+            changed(m_current.beta_gamma, m_solved->beta_gamma)) {
+            return false;
+        }
+
+        // the beam left the mesh of the last solve, keeping one cell to the boundary
+        auto const [x_min, y_min, z_min, x_max, y_max, z_max] = pc.MinAndMaxPositions();
+        amrex::RealBox const & domain = geom.ProbDomain();
+        auto const dr = geom.CellSizeArray();
+        if (x_min < domain.lo(0) + dr[0] || x_max > domain.hi(0) - dr[0] ||
+            y_min < domain.lo(1) + dr[1] || y_max > domain.hi(1) - dr[1] ||
+            z_min < domain.lo(2) + dr[2] || z_max > domain.hi(2) - dr[2]) {
+            return false;
+        }
+
+        m_num_reused++;
+        return true;
+    }
+
+    void
+    FieldReuse::solved ()
+    {
+        if (m_interval <= 1) { return; }
+
+        m_solved = m_current;
+        m_num_reused = 0;
+        m_scale = 1.0;
+    }
+
+    void
+    FieldReuse::rescale (std::unordered_map<int, std::unordered_map<std::string, amrex::MultiFab> > & space_charge_field)
+    {
+        if (!m_rescale || !m_solved.has_value()) { return; }
+
+        amrex::Real const scale = (m_solved->x_std * m_solved->y_std * m_solved->z_std) /
+                                  (m_current.x_std * m_current.y_std * m_current.z_std);
+
+        for (auto & [lev, field] : space_charge_field) {
+            for (auto & [dir, component] : field) {
+                component.mult(scale / m_scale);
+            }
+        }
+        m_scale = scale;
+    }
+
+} // namespace impactx::spacecharge
@@ -9,12 +9,16 @@
  */
 #include "GatherAndPush.H"
 
+#include "particles/transformation/ToFixedS.H"
+
 #include <ablastr/particles/NodalFieldGather.H>
 
 #include <AMReX_BLProfiler.H>
 #include <AMReX_REAL.H>       // for Real
 #include <AMReX_SPACE.H>      // for AMREX_D_DECL
 
+#include <cmath>
+
 
 namespace impactx::spacecharge
 {
@@ -22,15 +26,24 @@ namespace impactx::spacecharge
         ImpactXParticleContainer & pc,
         std::unordered_map<int, std::unordered_map<std::string, amrex::MultiFab> > const & space_charge_field,
         const amrex::Vector<amrex::Geometry>& geom,
-        amrex::ParticleReal const slice_ds
+        amrex::ParticleReal const slice_ds,
+        bool const to_fixed_s
     )
     {
         BL_PROFILE("impactx::spacecharge::GatherAndPush");
 
         using namespace amrex::literals;
 
+        AMREX_ALWAYS_ASSERT_WITH_MESSAGE(pc.GetCoordSystem() == CoordSystem::t,
+            "GatherAndPush: particles must be in fixed t coordinates!");
+
         amrex::ParticleReal const charge = pc.GetRefParticle().charge;
 
+        // t-to-s map with the design value of pz/mc = beta*gamma
+        amrex::ParticleReal const pd = pc.GetRefParticle().pt;  // Design value of pt/mc2 = -gamma
+        amrex::ParticleReal const pzd = std::sqrt(std::pow(pd, 2) - 1.0_prt);
+        transformation::ToFixedS const to_s(pzd);
+
         // loop over refinement levels
         int const nLevel = pc.finestLevel();
         for (int lev = 0; lev <= nLevel; ++lev)
@@ -99,10 +112,20 @@ namespace impactx::spacecharge
                     pz += field_interp[2] * push_consts;
 
                     // push position is done in the lattice elements
+
+                    // transform from x,y,z to x',y',t
+                    if (to_fixed_s) {
+                        to_s(x, y, z, px, py, pz);
+                    }
                 });
 
 
             } // end loop over all particle boxes
         } // env mesh-refinement level loop
+
+        // update coordinate system meta data
+        if (to_fixed_s) {
+            pc.SetCoordSystem(CoordSystem::s);
+        }
     }
 } // namespace impactx::spacecharge
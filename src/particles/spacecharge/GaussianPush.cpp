@@ -0,0 +1,233 @@
+/* Copyright 2022-2023 The Regents of the University of California, through Lawrence
+ *           Berkeley National Laboratory (subject to receipt of any required
+ *           approvals from the U.S. Dept. of Energy). All rights reserved.
+ *
+ * This file is part of ImpactX.
+ *
+ * Authors: Axel Huebl, Chad Mitchell, Ji Qiang
+ * License: BSD-3-Clause-LBNL
+ */
+#include "GaussianPush.H"
+
+#include "particles/transformation/ToFixedS.H"
+
+#include <ablastr/constant.H>
+
+#include <AMReX_BLProfiler.H>
+#include <AMReX_GpuQualifiers.H>
+#include <AMReX_ParallelDescriptor.H>
+#include <AMReX_ParmParse.H>
+#include <AMReX_ParticleReduce.H>
+#include <AMReX_REAL.H>
+#include <AMReX_Reduce.H>
+#include <AMReX_TypeList.H>
+
+#include <algorithm>
+#include <cmath>
+#include <stdexcept>
+#include <vector>
+
+
+namespace impactx::spacecharge
+{
+    void GaussianPush (
+        ImpactXParticleContainer & pc,
+        SpaceChargeAlgo const algo,
+        amrex::ParticleReal const slice_ds,
+        bool const to_fixed_s
+    )
+    {
+        BL_PROFILE("impactx::spacecharge::GaussianPush");
+
+        using namespace amrex::literals;
+        using ablastr::constant::math::pi;
+        using ablastr::constant::SI::c;
+        using ablastr::constant::SI::ep0;
+
+        AMREX_ALWAYS_ASSERT_WITH_MESSAGE(pc.GetCoordSystem() == CoordSystem::t,
+            "GaussianPush: particles must be in fixed t coordinates!");
+        if (algo != SpaceChargeAlgo::Gauss_3D && algo != SpaceChargeAlgo::Gauss_2p5D) {
+            throw std::runtime_error("GaussianPush: the space charge model is not Gaussian.");
+        }
+        bool const gauss_3d = algo == SpaceChargeAlgo::Gauss_3D;
+
+        int nint = 128;
+        amrex::ParmParse pp_algo("algo");
+        pp_algo.queryAdd("space_charge_gauss_nint", nint);
+        AMREX_ALWAYS_ASSERT_WITH_MESSAGE(nint >= 1,
+            "algo.space_charge_gauss_nint must be at least 1.");
+
+        // total weight, centroid and rms sizes of the beam in one reduction
+        using PType = typename ImpactXParticleContainer::SuperParticleType;
+
+        /* The variables below need to be static to work around an MSVC bug
+         * https://stackoverflow.com/questions/55136414/constexpr-variable-captured-inside-lambda-loses-its-constexpr-ness
+         */
+        static constexpr std::size_t num_red_ops = 7;
+        amrex::TypeMultiplier<amrex::ReduceOps, amrex::ReduceOpSum[num_red_ops]> reduce_ops;
+        using ReducedDataT = amrex::TypeMultiplier<amrex::ReduceData, amrex::ParticleReal[num_red_ops]>;
+
+        auto r = amrex::ParticleReduce<ReducedDataT>(
+            pc,
+            [=] AMREX_GPU_DEVICE(const PType& p) noexcept -> ReducedDataT::Type
+            {
+                amrex::ParticleReal const p_w = p.rdata(RealSoA::w);
+                amrex::ParticleReal const p_x = p.rdata(RealSoA::x);
+                amrex::ParticleReal const p_y = p.rdata(RealSoA::y);
+                amrex::ParticleReal const p_z = p.rdata(RealSoA::z);
+                return {p_w,
+                        p_x * p_w, p_y * p_w, p_z * p_w,
+                        p_x * p_x * p_w, p_y * p_y * p_w, p_z * p_z * p_w};
+            },
+            reduce_ops
+        );
+
+        std::vector<amrex::ParticleReal> values(num_red_ops);
+        amrex::constexpr_for<0, num_red_ops> ([&](auto i) {
+            values[i] = amrex::get<i>(r);
+        });
+        amrex::ParallelAllReduce::Sum(
+            values.data(),
+            values.size(),
+            amrex::ParallelDescriptor::Communicator()
+        );
+
+        amrex::ParticleReal const w_sum = values[0];
+        amrex::ParticleReal const inv_w_sum = w_sum > 0.0_prt ? 1.0_prt / w_sum : 0.0_prt;
+        amrex::ParticleReal const x_mean = values[1] * inv_w_sum;
+        amrex::ParticleReal const y_mean = values[2] * inv_w_sum;
+        amrex::ParticleReal const z_mean = values[3] * inv_w_sum;
+        amrex::ParticleReal const x_ms = std::max(values[4] * inv_w_sum - x_mean * x_mean, 0.0_prt);
+        amrex::ParticleReal const y_ms = std::max(values[5] * inv_w_sum - y_mean * y_mean, 0.0_prt);
+        amrex::ParticleReal const z_ms = std::max(values[6] * inv_w_sum - z_mean * z_mean, 0.0_prt);
+
+        // no field of an empty or flat beam
+        bool const flat = x_ms == 0.0_prt || y_ms == 0.0_prt || z_ms == 0.0_prt;
+
+        // reference quantities
+        RefPart const ref_part = pc.GetRefParticle();
+        amrex::ParticleReal const charge = ref_part.charge;
+        amrex::ParticleReal const mc_SI = ref_part.mass * c;
+        amrex::ParticleReal const pz_ref_SI = ref_part.beta_gamma() * mc_SI;
+        amrex::ParticleReal const gamma = ref_part.gamma();
+        amrex::ParticleReal const inv_gamma2 = 1.0_prt / (gamma * gamma);
+        amrex::ParticleReal const dt = slice_ds / ref_part.beta() / c;
+
+        // group together constants for the momentum push
+        amrex::ParticleReal const push_consts = flat ? 0.0_prt : dt * charge * inv_gamma2 / pz_ref_SI;
+
+        // total charge of the beam in C
+        amrex::ParticleReal const bunch_charge = charge * w_sum;
+
+        // The 3D field is the static field in the beam frame, with z stretched
+        // by gamma, as in the relativistic Poisson solve of PoissonSolve:
+        //   E_i = Q / (4 pi ep0) 2 / sqrt(pi) x_i int_0^inf exp(-sum_j x_j^2 / a_j) / (a_i sqrt(a_x a_y a_z)) dq
+        // The 2D field of the transverse distribution, scaled by the line density lambda(z), is
+        //   E_i = lambda(z) / (2 pi ep0) x_i int_0^inf exp(-x^2 / a_x - y^2 / a_y) / (a_i sqrt(a_x a_y)) dq
+        // with a_j = 2 sigma_j^2 + q. The integrals are computed with the midpoint rule
+        // after the substitution q = 2 s^2 (1 / u^2 - 1), u in (0, 1].
+        //   note: the sizes of a flat beam are set to one, to avoid NaNs in the kernel
+        amrex::ParticleReal const sx2 = flat ? 1.0_prt : x_ms;
+        amrex::ParticleReal const sy2 = flat ? 1.0_prt : y_ms;
+        amrex::ParticleReal const sz2 = flat ? 1.0_prt : (gauss_3d ? z_ms * gamma * gamma : z_ms);
+        amrex::ParticleReal const s2 = gauss_3d ? std::max({sx2, sy2, sz2}) : std::max(sx2, sy2);
+        amrex::ParticleReal const du = 1.0_prt / nint;
+
+        amrex::ParticleReal const coeff_3d = gamma * bunch_charge / (4.0_prt * pi * ep0) * 2.0_prt / std::sqrt(pi) * du;
+        amrex::ParticleReal const coeff_2d = 1.0_prt / (2.0_prt * pi * ep0) * du;
+        amrex::ParticleReal const lambda_0 = bunch_charge / std::sqrt(2.0_prt * pi * sz2);
+
+        // t-to-s map with the design value of pz/mc = beta*gamma
+        amrex::ParticleReal const pd = ref_part.pt;  // Design value of pt/mc2 = -gamma
+        amrex::ParticleReal const pzd = std::sqrt(std::pow(pd, 2) - 1.0_prt);
+        transformation::ToFixedS const to_s(pzd);
+
+        // loop over refinement levels
+        int const nLevel = pc.finestLevel();
+        for (int lev = 0; lev <= nLevel; ++lev)
+        {
+            // loop over all particle boxes
+            using ParIt = ImpactXParticleContainer::iterator;
+#ifdef AMREX_USE_OMP
+#pragma omp parallel if (amrex::Gpu::notInLaunchRegion())
+#endif
+            for (ParIt pti(pc, lev); pti.isValid(); ++pti) {
+                const int np = pti.numParticles();
+
+                // preparing access to particle data: SoA of Reals
+                auto& soa_real = pti.GetStructOfArrays().GetRealData();
+                amrex::ParticleReal* const AMREX_RESTRICT part_x = soa_real[RealSoA::x].dataPtr();
+                amrex::ParticleReal* const AMREX_RESTRICT part_y = soa_real[RealSoA::y].dataPtr();
+                amrex::ParticleReal* const AMREX_RESTRICT part_z = soa_real[RealSoA::z].dataPtr();
+                amrex::ParticleReal* const AMREX_RESTRICT part_px = soa_real[RealSoA::px].dataPtr();
+                amrex::ParticleReal* const AMREX_RESTRICT part_py = soa_real[RealSoA::py].dataPtr();
+                amrex::ParticleReal* const AMREX_RESTRICT part_pz = soa_real[RealSoA::pz].dataPtr();
+
+                // evaluate the field at each particle and push momentum
+                amrex::ParallelFor(np, [=] AMREX_GPU_DEVICE (long i) {
+                    // access SoA Real data
+                    amrex::ParticleReal & AMREX_RESTRICT x = part_x[i];
+                    amrex::ParticleReal & AMREX_RESTRICT y = part_y[i];
+                    amrex::ParticleReal & AMREX_RESTRICT z = part_z[i];
+                    amrex::ParticleReal & AMREX_RESTRICT px = part_px[i];
+                    amrex::ParticleReal & AMREX_RESTRICT py = part_py[i];
+                    amrex::ParticleReal & AMREX_RESTRICT pz = part_pz[i];
+
+                    amrex::ParticleReal const dx = x - x_mean;
+                    amrex::ParticleReal const dy = y - y_mean;
+                    amrex::ParticleReal const dz = gauss_3d ? gamma * (z - z_mean) : 0.0_prt;
+
+                    amrex::ParticleReal ix = 0.0_prt;
+                    amrex::ParticleReal iy = 0.0_prt;
+                    amrex::ParticleReal iz = 0.0_prt;
+                    for (int k = 0; k < nint; ++k) {
+                        amrex::ParticleReal const u = (k + 0.5_prt) * du;
+                        amrex::ParticleReal const q = 2.0_prt * s2 * (1.0_prt / (u * u) - 1.0_prt);
+                        amrex::ParticleReal const dq_du = 4.0_prt * s2 / (u * u * u);
+                        amrex::ParticleReal const ax = 2.0_prt * sx2 + q;
+                        amrex::ParticleReal const ay = 2.0_prt * sy2 + q;
+                        amrex::ParticleReal const az = 2.0_prt * sz2 + q;
+
+                        amrex::ParticleReal const f = gauss_3d
+                            ? std::exp(-dx * dx / ax - dy * dy / ay - dz * dz / az) / std::sqrt(ax * ay * az) * dq_du
+                            : std::exp(-dx * dx / ax - dy * dy / ay) / std::sqrt(ax * ay) * dq_du;
+                        ix += f / ax;
+                        iy += f / ay;
+                        iz += f / az;
+                    }
+
+                    amrex::ParticleReal ex, ey, ez;
+                    if (gauss_3d) {
+                        // E_z is gamma times the beam frame field in the stretched z
+                        ex = coeff_3d * dx * ix;
+                        ey = coeff_3d * dy * iy;
+                        ez = coeff_3d * gamma * dz * iz;
+                    } else {
+                        amrex::ParticleReal const zc = z - z_mean;
+                        amrex::ParticleReal const lambda = lambda_0 * std::exp(-zc * zc / (2.0_prt * sz2));
+                        ex = coeff_2d * lambda * dx * ix;
+                        ey = coeff_2d * lambda * dy * iy;
+                        ez = 0.0_prt;
+                    }
+
+                    // push momentum
+                    px += ex * push_consts;
+                    py += ey * push_consts;
+                    pz += ez * push_consts;
+
+                    // push position is done in the lattice elements
+
+                    // transform from x,y,z to x',y',t
+                    if (to_fixed_s) {
+                        to_s(x, y, z, px, py, pz);
+                    }
+                });
+            } // end loop over all particle boxes
+        } // env mesh-refinement level loop
+
+        // update coordinate system meta data
+        if (to_fixed_s) {
+            pc.SetCoordSystem(CoordSystem::s);
+        }
+    }
+} // namespace impactx::spacecharge
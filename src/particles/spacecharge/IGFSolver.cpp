@@ -0,0 +1,352 @@
+/* Copyright 2022-2023 The Regents of the University of California, through Lawrence
+ *           Berkeley National Laboratory (subject to receipt of any required
+ *           approvals from the U.S. Dept. of Energy). All rights reserved.
+ *
+ * This file is part of ImpactX.
+ *
+ * Authors: Axel Huebl, Ji Qiang, Remi Lehe
+ * License: BSD-3-Clause-LBNL
+ */
+#include "IGFSolver.H"
+
+#ifdef ImpactX_USE_FFT
+#   include <ablastr/constant.H>
+#   include <ablastr/fields/IntegratedGreenFunctionSolver.H>
+#   include <ablastr/math/fft/AnyFFT.H>
+
+#   include <AMReX_BLProfiler.H>
+#   include <AMReX_GpuComplex.H>
+#   include <AMReX_GpuContainers.H>
+#   include <AMReX_ParallelDescriptor.H>
+#   include <AMReX_ParmParse.H>
+
+#   include <array>
+#   include <cmath>
+#   include <list>
+#   include <optional>
+#   include <vector>
+#endif
+
+
+namespace impactx::spacecharge
+{
+#ifdef ImpactX_USE_FFT
+namespace
+{
+    using SpectralField = amrex::FabArray<amrex::BaseFab<amrex::GpuComplex<amrex::Real>>>;
+
+    /** FFT plans and arrays of the IGF solver for one shape of the domain */
+    struct IGFPlan
+    {
+        /** Allocate the arrays and create the FFT plans
+         *
+         * @param realspace_box the doubled, nodal domain
+         */
+        explicit IGFPlan (amrex::Box const & realspace_box)
+            : m_realspace_box(realspace_box)
+        {
+            BL_PROFILE("impactx::spacecharge::IGFPlan");
+
+            // all FFTs on one MPI rank
+            amrex::BoxArray const realspace_ba(realspace_box);
+            amrex::DistributionMapping const dm(realspace_ba);
+
+            // real-to-complex FFTs keep half of the first dimension
+            amrex::IntVect const len = realspace_box.length();
+            amrex::Box const spectralspace_box(
+                amrex::IntVect(0),
+                amrex::IntVect(len[0] / 2, len[1] - 1, len[2] - 1),
+                amrex::IndexType::TheNodeType());
+            amrex::BoxArray const spectralspace_ba(spectralspace_box);
+
+            m_real = amrex::MultiFab(realspace_ba, dm, 1, 0);
+            m_spectral = SpectralField(spectralspace_ba, dm, 1, 0);
+            m_G_fft = SpectralField(spectralspace_ba, dm, 1, 0);
+
+            m_forward = ablastr::math::anyfft::FFTplans(spectralspace_ba, dm);
+            m_backward = ablastr::math::anyfft::FFTplans(spectralspace_ba, dm);
+            for (amrex::MFIter mfi(realspace_ba, dm); mfi.isValid(); ++mfi) {
+                auto * const complex_ptr = reinterpret_cast<ablastr::math::anyfft::Complex*>(m_spectral[mfi].dataPtr());
+                m_forward[mfi] = ablastr::math::anyfft::CreatePlan(
+                    len, m_real[mfi].dataPtr(), complex_ptr,
+                    ablastr::math::anyfft::direction::R2C, AMREX_SPACEDIM);
+                m_backward[mfi] = ablastr::math::anyfft::CreatePlan(
+                    len, m_real[mfi].dataPtr(), complex_ptr,
+                    ablastr::math::anyfft::direction::C2R, AMREX_SPACEDIM);
+            }
+        }
+
+        IGFPlan (IGFPlan const &) = delete;
+        IGFPlan& operator= (IGFPlan const &) = delete;
+
+        ~IGFPlan ()
+        {
+            for (amrex::MFIter mfi(m_real); mfi.isValid(); ++mfi) {
+                ablastr::math::anyfft::DestroyPlan(m_forward[mfi]);
+                ablastr::math::anyfft::DestroyPlan(m_backward[mfi]);
+            }
+        }
+
+        /** Forward FFT of the real work array into the spectral work array */
+        void forward ()
+        {
+            for (amrex::MFIter mfi(m_real); mfi.isValid(); ++mfi) {
+                ablastr::math::anyfft::Execute(m_forward[mfi]);
+            }
+        }
+
+        /** Backward FFT of the spectral work array into the real work array */
+        void backward ()
+        {
+            for (amrex::MFIter mfi(m_real); mfi.isValid(); ++mfi) {
+                ablastr::math::anyfft::Execute(m_backward[mfi]);
+            }
+        }
+
+        amrex::Box m_realspace_box;  ///< doubled, nodal domain of the convolution
+        amrex::MultiFab m_real;  ///< real-space work array
+        SpectralField m_spectral;  ///< spectral-space work array
+        SpectralField m_G_fft;  ///< Fourier transform of the integrated Green's function
+        SpectralField m_G2_fft;  ///< Fourier transform of a second Green's function, only for TransverseFieldFFT
+        SpectralField m_rho_fft;  ///< Fourier transform of the charge, only for TransverseFieldFFT
+        std::optional<std::array<amrex::Real, 3>> m_G_cell_size;  ///< cell size of m_G_fft, z stretched by gamma
+        ablastr::math::anyfft::FFTplans m_forward;  ///< m_real to m_spectral
+        ablastr::math::anyfft::FFTplans m_backward;  ///< m_spectral to m_real
+    };
+
+    //! cached plans, most recently used first
+    std::list<IGFPlan> igf_cache;
+
+    //! number of Green's functions computed by IGFSolve since the cache was cleared
+    int igf_green_functions = 0;
+
+    /** Get the cached plan for a domain, or create it
+     *
+     * @param realspace_box the doubled, nodal domain
+     * @return the plan, moved to the front of the cache
+     */
+    IGFPlan &
+    get_plan (amrex::Box const & realspace_box)
+    {
+        int igf_cache_size = 2;
+        amrex::ParmParse("algo").queryAdd("igf_cache_size", igf_cache_size);
+
+        for (auto it = igf_cache.begin(); it != igf_cache.end(); ++it) {
+            if (it->m_realspace_box == realspace_box) {
+                igf_cache.splice(igf_cache.begin(), igf_cache, it);
+                return igf_cache.front();
+            }
+        }
+
+        // evict the least recently used plans
+        while (!igf_cache.empty() && static_cast<int>(igf_cache.size()) >= igf_cache_size) {
+            igf_cache.pop_back();
+        }
+        igf_cache.emplace_front(realspace_box);
+        return igf_cache.front();
+    }
+} // namespace
+
+    void IGFSolve (
+        amrex::MultiFab const & rho,
+        amrex::MultiFab & phi,
+        amrex::Geometry const & geom,
+        amrex::Real beta_s
+    )
+    {
+        BL_PROFILE("impactx::spacecharge::IGFSolve");
+
+        using namespace amrex::literals;
+
+        // nodal domain, including guard cells
+        amrex::Box domain = rho.boxArray().minimalBox();
+        domain.grow(phi.nGrowVect());
+
+        // the convolution is done on a domain of twice the size
+        amrex::IntVect const n = domain.length();
+        amrex::Box const realspace_box(
+            domain.smallEnd(),
+            domain.smallEnd() + 2 * n - 1,
+            amrex::IndexType::TheNodeType());
+
+        IGFPlan & plan = get_plan(realspace_box);
+
+        // Green's function in the rest frame of the beam: z is stretched by gamma
+        auto const dr = geom.CellSizeArray();
+        std::array<amrex::Real, 3> const cell_size{
+            dr[0], dr[1], dr[2] / std::sqrt(1.0_rt - beta_s * beta_s)};
+
+        if (!plan.m_G_cell_size.has_value() || *plan.m_G_cell_size != cell_size) {
+            BL_PROFILE("impactx::spacecharge::IGFSolve::GreenFunction");
+
+            amrex::IntVect const lo = realspace_box.smallEnd();
+            amrex::IntVect const hi = realspace_box.bigEnd();
+            amrex::Real const dx = cell_size[0];
+            amrex::Real const dy = cell_size[1];
+            amrex::Real const dz = cell_size[2];
+            amrex::Real const coeff = 1.0_rt / (4.0_rt * ablastr::constant::math::pi * ablastr::constant::SI::ep0);
+
+            plan.m_real.setVal(0.);
+            for (amrex::MFIter mfi(plan.m_real); mfi.isValid(); ++mfi) {
+                auto const G = plan.m_real.array(mfi);
+                amrex::ParallelFor(domain, [=] AMREX_GPU_DEVICE (int i0, int j0, int k0) noexcept {
+                    int const i = i0 - lo[0];
+                    int const j = j0 - lo[1];
+                    int const k = k0 - lo[2];
+                    amrex::Real const G_value = coeff * ablastr::fields::SumOfIntegratedPotential(
+                        i * dx, j * dy, k * dz, dx, dy, dz);
+
+                    // negative distances are stored periodically in the upper half
+                    int const im = (i > 0) ? hi[0] - i + 1 : i0;
+                    int const jm = (j > 0) ? hi[1] - j + 1 : j0;
+                    int const km = (k > 0) ? hi[2] - k + 1 : k0;
+                    G(i0, j0, k0) = G_value;
+                    G(im, j0, k0) = G_value;
+                    G(i0, jm, k0) = G_value;
+                    G(i0, j0, km) = G_value;
+                    G(im, jm, k0) = G_value;
+                    G(im, j0, km) = G_value;
+                    G(i0, jm, km) = G_value;
+                    G(im, jm, km) = G_value;
+                });
+            }
+            plan.forward();
+            amrex::Copy(plan.m_G_fft, plan.m_spectral, 0, 0, 1, 0);
+            plan.m_G_cell_size = cell_size;
+            ++igf_green_functions;
+        }
+
+        // convolution of rho with the Green's function
+        plan.m_real.setVal(0.);
+        plan.m_real.ParallelCopy(rho, 0, 0, 1, amrex::IntVect(0), amrex::IntVect(0));
+        plan.forward();
+        amrex::Multiply(plan.m_spectral, plan.m_G_fft, 0, 0, 1, 0);
+        plan.backward();
+
+        // normalize, since a forward and backward FFT result in a factor N
+        plan.m_real.mult(1.0_rt / realspace_box.numPts());
+
+        phi.ParallelCopy(plan.m_real, 0, 0, 1, amrex::IntVect(0), phi.nGrowVect());
+    }
+
+    void TransverseFieldFFT (
+        std::vector<amrex::Real> const & sigma,
+        int nx,
+        int ny,
+        amrex::Real dx,
+        amrex::Real dy,
+        std::vector<amrex::Real> & ex,
+        std::vector<amrex::Real> & ey
+    )
+    {
+        BL_PROFILE("impactx::spacecharge::TransverseFieldFFT");
+
+        using namespace amrex::literals;
+
+        // the convolution is done on a plane of twice the size
+        amrex::Box const realspace_box(
+            amrex::IntVect(0),
+            amrex::IntVect(2 * nx - 1, 2 * ny - 1, 0),
+            amrex::IndexType::TheNodeType());
+
+        // nodes of the transverse mesh
+        amrex::Box const plane(
+            amrex::IntVect(0),
+            amrex::IntVect(nx - 1, ny - 1, 0),
+            amrex::IndexType::TheNodeType());
+
+        IGFPlan & plan = get_plan(realspace_box);
+        if (plan.m_G2_fft.empty()) {
+            plan.m_G2_fft.define(plan.m_G_fft.boxArray(), plan.m_G_fft.DistributionMap(), 1, 0);
+            plan.m_rho_fft.define(plan.m_G_fft.boxArray(), plan.m_G_fft.DistributionMap(), 1, 0);
+        }
+
+        // Green's functions of the x and y components: (r_x, r_y) / |r|^2
+        std::array<amrex::Real, 3> const cell_size{dx, dy, 0.0_rt};
+        if (!plan.m_G_cell_size.has_value() || *plan.m_G_cell_size != cell_size) {
+            BL_PROFILE("impactx::spacecharge::TransverseFieldFFT::GreenFunction");
+
+            for (int comp = 0; comp < 2; ++comp) {
+                plan.m_real.setVal(0.);
+                for (amrex::MFIter mfi(plan.m_real); mfi.isValid(); ++mfi) {
+                    auto const G = plan.m_real.array(mfi);
+                    amrex::ParallelFor(plane, [=] AMREX_GPU_DEVICE (int i, int j, int) noexcept {
+                        if (i == 0 && j == 0) { return; }
+                        amrex::Real const rx = i * dx;
+                        amrex::Real const ry = j * dy;
+                        amrex::Real const G_value = (comp == 0 ? rx : ry) / (rx * rx + ry * ry);
+
+                        // negative distances are stored periodically in the upper half,
+                        // the x component is odd in x and the y component is odd in y
+                        int const im = 2 * nx - i;
+                        int const jm = 2 * ny - j;
+                        amrex::Real const sign_x = (comp == 0) ? -1.0_rt : 1.0_rt;
+                        amrex::Real const sign_y = (comp == 0) ? 1.0_rt : -1.0_rt;
+                        G(i, j, 0) = G_value;
+                        if (i > 0) { G(im, j, 0) = sign_x * G_value; }
+                        if (j > 0) { G(i, jm, 0) = sign_y * G_value; }
+                        if (i > 0 && j > 0) { G(im, jm, 0) = -G_value; }
+                    });
+                }
+                plan.forward();
+                amrex::Copy(comp == 0 ? plan.m_G_fft : plan.m_G2_fft, plan.m_spectral, 0, 0, 1, 0);
+            }
+            plan.m_G_cell_size = cell_size;
+        }
+
+        // Fourier transform of the charge
+        amrex::Gpu::DeviceVector<amrex::Real> values(nx * ny);
+        amrex::Real * const AMREX_RESTRICT values_ptr = values.dataPtr();
+        amrex::Gpu::copy(amrex::Gpu::hostToDevice, sigma.begin(), sigma.end(), values.begin());
+
+        plan.m_real.setVal(0.);
+        for (amrex::MFIter mfi(plan.m_real); mfi.isValid(); ++mfi) {
+            auto const rho_arr = plan.m_real.array(mfi);
+            amrex::ParallelFor(plane, [=] AMREX_GPU_DEVICE (int i, int j, int) noexcept {
+                rho_arr(i, j, 0) = values_ptr[i + j * nx];
+            });
+        }
+        plan.forward();
+        amrex::Copy(plan.m_rho_fft, plan.m_spectral, 0, 0, 1, 0);
+
+        // convolutions with the Green's functions, on the MPI rank of the FFTs,
+        // normalized since a forward and backward FFT result in a factor N
+        int const fft_rank = plan.m_real.DistributionMap()[0];
+        amrex::Real const norm = 1.0_rt / realspace_box.numPts();
+        for (int comp = 0; comp < 2; ++comp) {
+            amrex::Copy(plan.m_spectral, plan.m_rho_fft, 0, 0, 1, 0);
+            amrex::Multiply(plan.m_spectral, comp == 0 ? plan.m_G_fft : plan.m_G2_fft, 0, 0, 1, 0);
+            plan.backward();
+
+            std::vector<amrex::Real> & field = (comp == 0) ? ex : ey;
+            field.resize(nx * ny);
+            for (amrex::MFIter mfi(plan.m_real); mfi.isValid(); ++mfi) {
+                auto const field_arr = plan.m_real.const_array(mfi);
+                amrex::ParallelFor(plane, [=] AMREX_GPU_DEVICE (int i, int j, int) noexcept {
+                    values_ptr[i + j * nx] = field_arr(i, j, 0) * norm;
+                });
+                amrex::Gpu::copy(amrex::Gpu::deviceToHost, values.begin(), values.end(), field.begin());
+            }
+            amrex::ParallelDescriptor::Bcast(field.data(), field.size(), fft_rank);
+        }
+    }
+#endif
+
+    void clear_igf_cache ()
+    {
+#ifdef ImpactX_USE_FFT
+        igf_cache.clear();
+        igf_green_functions = 0;
+#endif
+    }
+
+    int num_igf_green_functions ()
+    {
+#ifdef ImpactX_USE_FFT
+        return igf_green_functions;
+#else
+        return 0;
+#endif
+    }
+
+} // namespace impactx::spacecharge
@@ -8,6 +8,7 @@
  * License: BSD-3-Clause-LBNL
  */
 #include "PoissonSolve.H"
+#include "IGFSolver.H"
 
 #include <ablastr/constant.H>
 #include <ablastr/fields/PoissonSolver.H>
@@ -19,27 +20,130 @@
 #include <AMReX_REAL.H>       // for ParticleReal
 
 #include <cmath>
+#include <optional>
+#include <stdexcept>
+#include <string>
 
 
 namespace impactx::spacecharge
 {
+namespace
+{
+    /** Interpolate the potential of the last solve to the current geometry
+     *
+     * The potential is used as initial guess of the multigrid solver. Nodes
+     * on the boundary of the domain are set to zero, the Dirichlet value of
+     * the solver. Nodes that lie outside of the last domain, or too far
+     * outside of the local box and its guard cells, are set to zero.
+     *
+     * @param[inout] phi scalar potential on the coarsest level
+     * @param[in] old_geom geometry of the last solve
+     * @param[in] new_geom current geometry
+     */
+    void
+    remap_initial_guess (
+        amrex::MultiFab & phi,
+        amrex::Geometry const & old_geom,
+        amrex::Geometry const & new_geom
+    )
+    {
+        BL_PROFILE("impactx::spacecharge::PoissonSolve::remap_initial_guess");
+
+        using namespace amrex::literals;
+
+        // copy of the last potential, including the values of neighboring boxes
+        amrex::MultiFab phi_old(phi.boxArray(), phi.DistributionMap(), 1, phi.nGrowVect());
+        amrex::MultiFab::Copy(phi_old, phi, 0, 0, 1, 0);
+        phi_old.FillBoundary(old_geom.periodicity());
+
+        phi.setVal(0.);
+
+        amrex::Box const domain = amrex::surroundingNodes(new_geom.Domain());
+        auto const dlo = amrex::lbound(domain);
+        auto const dhi = amrex::ubound(domain);
+        auto const old_lo = old_geom.ProbLoArray();
+        auto const new_lo = new_geom.ProbLoArray();
+        auto const old_dr = old_geom.CellSizeArray();
+        auto const new_dr = new_geom.CellSizeArray();
+
+#ifdef AMREX_USE_OMP
+#pragma omp parallel if (amrex::Gpu::notInLaunchRegion())
+#endif
+        for (amrex::MFIter mfi(phi); mfi.isValid(); ++mfi) {
+            amrex::Box const bx = mfi.validbox();
+            amrex::Box const src_box = phi_old[mfi].box();
+            auto const src = phi_old.const_array(mfi);
+            auto const dst = phi.array(mfi);
+
+            amrex::ParallelFor(bx, [=] AMREX_GPU_DEVICE (int i, int j, int k) noexcept {
+                // Dirichlet boundary value
+                if (i == dlo.x || i == dhi.x || j == dlo.y || j == dhi.y || k == dlo.z || k == dhi.z) {
+                    return;
+                }
+
+                // index coordinates of this node in the last geometry
+                amrex::Real const u = (new_lo[0] + (i - dlo.x) * new_dr[0] - old_lo[0]) / old_dr[0];
+                amrex::Real const v = (new_lo[1] + (j - dlo.y) * new_dr[1] - old_lo[1]) / old_dr[1];
+                amrex::Real const w = (new_lo[2] + (k - dlo.z) * new_dr[2] - old_lo[2]) / old_dr[2];
+                int const i0 = static_cast<int>(std::floor(u)) + dlo.x;
+                int const j0 = static_cast<int>(std::floor(v)) + dlo.y;
+                int const k0 = static_cast<int>(std::floor(w)) + dlo.z;
+                if (!src_box.contains(i0, j0, k0) || !src_box.contains(i0 + 1, j0 + 1, k0 + 1)) {
+                    return;
+                }
+                amrex::Real const fx = u - std::floor(u);
+                amrex::Real const fy = v - std::floor(v);
+                amrex::Real const fz = w - std::floor(w);
+
+                // trilinear interpolation
+                dst(i, j, k) =
+                    (1.0_rt - fz) * ((1.0_rt - fy) * ((1.0_rt - fx) * src(i0, j0,     k0) + fx * src(i0 + 1, j0,     k0))
+                                   +           fy  * ((1.0_rt - fx) * src(i0, j0 + 1, k0) + fx * src(i0 + 1, j0 + 1, k0)))
+                  +           fz  * ((1.0_rt - fy) * ((1.0_rt - fx) * src(i0, j0,     k0 + 1) + fx * src(i0 + 1, j0,     k0 + 1))
+                                   +           fy  * ((1.0_rt - fx) * src(i0, j0 + 1, k0 + 1) + fx * src(i0 + 1, j0 + 1, k0 + 1)));
+            });
+        }
+    }
+} // namespace
+
     void PoissonSolve (
         ImpactXParticleContainer const & pc,
         std::unordered_map<int, amrex::MultiFab> & rho,
         std::unordered_map<int, amrex::MultiFab> & phi,
+        std::optional<amrex::Geometry> & phi_geom,
         amrex::Vector<amrex::IntVect> rel_ref_ratio
     )
     {
+        BL_PROFILE("impactx::spacecharge::PoissonSolve");
+
         using namespace amrex::literals;
 
-        // set space charge field to zero
+        amrex::ParmParse pp_algo("algo");
+        std::string poisson_solver = "multigrid";
+        pp_algo.queryAdd("poisson_solver", poisson_solver);
+        const bool is_solver_igf_on_lev0 = poisson_solver == "fft";
+        if (poisson_solver != "multigrid" && poisson_solver != "fft") {
+            throw std::runtime_error("algo.poisson_solver must be multigrid or fft but is: " + poisson_solver);
+        }
+
+        // start the multigrid solver on the coarsest level from the last potential
+        bool mlmg_warm_start = true;
+        pp_algo.queryAdd("mlmg_warm_start", mlmg_warm_start);
+
+        // set space charge field to zero or to the initial guess
         //   loop over refinement levels
         int const finest_level = phi.size() - 1u;
+        amrex::Geometry const & geom_lev0 = pc.GetParGDB()->Geom(0);
         for (int lev = 0; lev <= finest_level; ++lev) {
             amrex::MultiFab &phi_at_level = phi.at(lev);
-            // reset the values in phi to zero
-            phi_at_level.setVal(0.);
+            if (lev == 0 && mlmg_warm_start && !is_solver_igf_on_lev0 && phi_geom.has_value()) {
+                remap_initial_guess(phi_at_level, *phi_geom, geom_lev0);
+            } else {
+                // reset the values in phi to zero
+                phi_at_level.setVal(0.);
+            }
         }
+        phi_geom = geom_lev0;
 
         // prepare parameters of the MLMG Poisson Solver
         //   relativistic beta=v/c of the reference particle
@@ -52,13 +156,16 @@ namespace impactx::spacecharge
         // particle.
         std::array<amrex::Real, 3> const beta_xyz = {0.0, 0.0, beta_s};
 
-        amrex::ParmParse pp_algo("algo");
-        std::string poisson_solver = "multigrid";
-        pp_algo.queryAdd("poisson_solver", poisson_solver);
-        const bool is_solver_igf_on_lev0 = poisson_solver == "fft";
-        if (poisson_solver != "multigrid" && poisson_solver != "fft") {
-            throw std::runtime_error("algo.poisson_solver must be multigrid or fft but is: " + poisson_solver);
+#ifdef ImpactX_USE_FFT
+        // open-boundary FFT solve, with cached FFT plans and Green's function
+        int igf_cache_size = 2;
+        pp_algo.queryAdd("igf_cache_size", igf_cache_size);
+        if (is_solver_igf_on_lev0 && finest_level == 0 && igf_cache_size > 0) {
+            IGFSolve(rho.at(0), phi.at(0), geom_lev0, beta_s);
+            phi.at(0).FillBoundary(geom_lev0.periodicity());
+            return;
         }
+#endif
 
         // MLMG options
         amrex::Real mlmg_relative_tolerance = 1.e-7; // relative TODO: make smaller for SP
@@ -0,0 +1,187 @@
+/* Copyright 2022-2023 The Regents of the University of California, through Lawrence
+ *           Berkeley National Laboratory (subject to receipt of any required
+ *           approvals from the U.S. Dept. of Energy). All rights reserved.
+ *
+ * This file is part of ImpactX.
+ *
+ * Authors: Axel Huebl, Chad Mitchell, Ji Qiang
+ * License: BSD-3-Clause-LBNL
+ */
+#include "TransverseSelfFields.H"
+#include "IGFSolver.H"
+
+#include <ablastr/constant.H>
+
+#include <AMReX_BLProfiler.H>
+#include <AMReX_GpuAtomic.H>
+#include <AMReX_GpuContainers.H>
+#include <AMReX_MultiFabUtil.H>      // for OwnerMask
+#include <AMReX_ParallelDescriptor.H>
+#include <AMReX_REAL.H>              // for Real
+
+#include <vector>
+
+
+namespace impactx::spacecharge
+{
+    void TransverseSelfFields (
+        std::unordered_map<int, std::unordered_map<std::string, amrex::MultiFab> > & space_charge_field,
+        std::unordered_map<int, amrex::MultiFab> const & rho,
+        amrex::Vector<amrex::Geometry> const & geom
+    )
+    {
+        BL_PROFILE("impactx::spacecharge::TransverseSelfFields");
+
+        using namespace amrex::literals;
+        using ablastr::constant::math::pi;
+        using ablastr::constant::SI::ep0;
+
+        AMREX_ALWAYS_ASSERT_WITH_MESSAGE(rho.size() == 1u,
+            "algo.space_charge = 2.5D does not support mesh refinement (amr.max_level > 0).");
+
+        int const lev = 0;
+        amrex::MultiFab const & rho_lev = rho.at(lev);
+        auto const & gm = geom[lev];
+        auto const dr = gm.CellSizeArray();
+
+        // nodal index space of the whole domain
+        amrex::Box const domain = amrex::surroundingNodes(gm.Domain());
+        auto const lo = amrex::lbound(domain);
+        int const nx = domain.length(0);
+        int const ny = domain.length(1);
+        int const nz = domain.length(2);
+
+        // project the charge density: line density lambda(z) in C/m and
+        // transverse charge per area sigma(x,y) in C/m^2
+        amrex::Gpu::DeviceVector<amrex::Real> lambda(nz, 0.0_rt);
+        amrex::Gpu::DeviceVector<amrex::Real> sigma(nx * ny, 0.0_rt);
+        amrex::Real * const AMREX_RESTRICT lambda_ptr = lambda.dataPtr();
+        amrex::Real * const AMREX_RESTRICT sigma_ptr = sigma.dataPtr();
+
+        amrex::Real const dxdy = dr[0] * dr[1];
+        amrex::Real const dz = dr[2];
+
+        // nodes on the faces of boxes are shared: count each node once
+        auto const owner_mask = amrex::OwnerMask(rho_lev, gm.periodicity());
+        for (amrex::MFIter mfi(rho_lev); mfi.isValid(); ++mfi) {
+            amrex::Box const bx = mfi.validbox();
+            auto const rho_arr = rho_lev.const_array(mfi);
+            auto const mask_arr = owner_mask->const_array(mfi);
+
+            amrex::ParallelFor(bx, [=] AMREX_GPU_DEVICE (int i, int j, int k) noexcept {
+                if (!mask_arr(i, j, k)) { return; }
+                amrex::Real const r = rho_arr(i, j, k);
+                amrex::Gpu::Atomic::AddNoRet(&lambda_ptr[k - lo.z], r * dxdy);
+                amrex::Gpu::Atomic::AddNoRet(&sigma_ptr[(i - lo.x) + (j - lo.y) * nx], r * dz);
+            });
+        }
+
+        // sum the projections over all MPI ranks
+        std::vector<amrex::Real> h_lambda(nz);
+        std::vector<amrex::Real> h_sigma(nx * ny);
+        amrex::Gpu::copy(amrex::Gpu::deviceToHost, lambda.begin(), lambda.end(), h_lambda.begin());
+        amrex::Gpu::copy(amrex::Gpu::deviceToHost, sigma.begin(), sigma.end(), h_sigma.begin());
+        amrex::ParallelAllReduce::Sum(h_lambda.data(), nz, amrex::ParallelDescriptor::Communicator());
+        amrex::ParallelAllReduce::Sum(h_sigma.data(), nx * ny, amrex::ParallelDescriptor::Communicator());
+
+        // reset the values in space_charge_field to zero
+        space_charge_field.at(lev).at("x").setVal(0.);
+        space_charge_field.at(lev).at("y").setVal(0.);
+        space_charge_field.at(lev).at("z").setVal(0.);
+
+        // total charge of the beam
+        amrex::Real total_charge = 0.0_rt;
+        for (amrex::Real const l : h_lambda) { total_charge += l * dz; }
+        if (total_charge == 0.0_rt) { return; }
+
+        // normalize the transverse distribution to unit charge
+        for (amrex::Real & s : h_sigma) { s /= total_charge; }
+        amrex::Gpu::copy(amrex::Gpu::hostToDevice, h_lambda.begin(), h_lambda.end(), lambda.begin());
+
+        // 2D field per unit line density with open boundaries:
+        //   E_2D(r) = 1 / (2 pi ep0) sum_r' sigma(r') dx dy (r - r') / |r - r'|^2
+        amrex::Real const coeff = dxdy / (2.0_rt * pi * ep0);
+        amrex::Real const dx = dr[0];
+        amrex::Real const dy = dr[1];
+        std::vector<amrex::Real> h_ex(nx * ny, 0.0_rt);
+        std::vector<amrex::Real> h_ey(nx * ny, 0.0_rt);
+#ifdef ImpactX_USE_FFT
+        // as a convolution with FFTs
+        TransverseFieldFFT(h_sigma, nx, ny, dx, dy, h_ex, h_ey);
+#else
+        // by direct summation, with the nodes of the plane split over the MPI ranks
+        {
+            amrex::Gpu::copy(amrex::Gpu::hostToDevice, h_sigma.begin(), h_sigma.end(), sigma.begin());
+            amrex::Real const * const AMREX_RESTRICT sigma_cptr = sigma.dataPtr();
+
+            int const nprocs = amrex::ParallelDescriptor::NProcs();
+            int const rank = amrex::ParallelDescriptor::MyProc();
+            int const n_begin = static_cast<int>(static_cast<long>(nx * ny) * rank / nprocs);
+            int const n_end = static_cast<int>(static_cast<long>(nx * ny) * (rank + 1) / nprocs);
+
+            amrex::Gpu::DeviceVector<amrex::Real> ex_part(nx * ny, 0.0_rt);
+            amrex::Gpu::DeviceVector<amrex::Real> ey_part(nx * ny, 0.0_rt);
+            amrex::Real * const AMREX_RESTRICT ex_part_ptr = ex_part.dataPtr();
+            amrex::Real * const AMREX_RESTRICT ey_part_ptr = ey_part.dataPtr();
+
+            amrex::ParallelFor(n_end - n_begin, [=] AMREX_GPU_DEVICE (int m) noexcept {
+                int const n = n_begin + m;
+                int const i = n % nx;
+                int const j = n / nx;
+
+                amrex::Real ex = 0.0_rt;
+                amrex::Real ey = 0.0_rt;
+                for (int jp = 0; jp < ny; ++jp) {
+                    amrex::Real const ry = (j - jp) * dy;
+                    for (int ip = 0; ip < nx; ++ip) {
+                        amrex::Real const s = sigma_cptr[ip + jp * nx];
+                        if (s == 0.0_rt || (ip == i && jp == j)) { continue; }
+                        amrex::Real const rx = (i - ip) * dx;
+                        amrex::Real const inv_r2 = 1.0_rt / (rx * rx + ry * ry);
+                        ex += s * rx * inv_r2;
+                        ey += s * ry * inv_r2;
+                    }
+                }
+                ex_part_ptr[n] = ex;
+                ey_part_ptr[n] = ey;
+            });
+
+            amrex::Gpu::copy(amrex::Gpu::deviceToHost, ex_part.begin(), ex_part.end(), h_ex.begin());
+            amrex::Gpu::copy(amrex::Gpu::deviceToHost, ey_part.begin(), ey_part.end(), h_ey.begin());
+            amrex::ParallelAllReduce::Sum(h_ex.data(), nx * ny, amrex::ParallelDescriptor::Communicator());
+            amrex::ParallelAllReduce::Sum(h_ey.data(), nx * ny, amrex::ParallelDescriptor::Communicator());
+        }
+#endif
+        for (amrex::Real & e : h_ex) { e *= coeff; }
+        for (amrex::Real & e : h_ey) { e *= coeff; }
+
+        amrex::Gpu::DeviceVector<amrex::Real> ex_2d(nx * ny);
+        amrex::Gpu::DeviceVector<amrex::Real> ey_2d(nx * ny);
+        amrex::Gpu::copy(amrex::Gpu::hostToDevice, h_ex.begin(), h_ex.end(), ex_2d.begin());
+        amrex::Gpu::copy(amrex::Gpu::hostToDevice, h_ey.begin(), h_ey.end(), ey_2d.begin());
+        amrex::Real const * const AMREX_RESTRICT ex_ptr = ex_2d.dataPtr();
+        amrex::Real const * const AMREX_RESTRICT ey_ptr = ey_2d.dataPtr();
+
+        // scale the 2D field with the line density
+        amrex::Real const * const AMREX_RESTRICT lambda_cptr = lambda.dataPtr();
+#ifdef AMREX_USE_OMP
+#pragma omp parallel if (amrex::Gpu::notInLaunchRegion())
+#endif
+        for (amrex::MFIter mfi(space_charge_field.at(lev).at("x")); mfi.isValid(); ++mfi) {
+            amrex::Box const bx = mfi.validbox();
+
+            auto scf_arr_x = space_charge_field[lev]["x"][mfi].array();
+            auto scf_arr_y = space_charge_field[lev]["y"][mfi].array();
+
+            amrex::ParallelFor(bx, [=] AMREX_GPU_DEVICE (int i, int j, int k) noexcept {
+                int const n = (i - lo.x) + (j - lo.y) * nx;
+                amrex::Real const l = lambda_cptr[k - lo.z];
+                scf_arr_x(i, j, k) = ex_ptr[n] * l;
+                scf_arr_y(i, j, k) = ey_ptr[n] * l;
+            });
+        }
+
+        // the temporary device vectors are freed at the end of this scope
+        amrex::Gpu::streamSynchronize();
+    }
+} // namespace impactx::spacecharge
@@ -6,6 +6,10 @@
 #include "pyImpactX.H"
 
 #include <ImpactX.H>
+#include <initialization/Algorithms.H>
+#include <particles/ReferenceParticleCache.H>
+#include <particles/diagnostics/BeamHalo.H>
+#include <particles/spacecharge/IGFSolver.H>
 #include <particles/transformation/CoordinateTransformation.H>
 
 #include <AMReX.H>
@@ -16,6 +20,8 @@
 #   include <cstdio>
 #endif
 #include <string>
+#include <variant>
+#include <vector>
 
 
 namespace py = pybind11;
@@ -192,6 +198,51 @@ void init_ImpactX (py::module& m)
               },
               "Use dynamic (``true``) resizing of the field mesh or static sizing (``false``)."
         )
+        .def_property("resize_hysteresis",
+              [](ImpactX & /* ix */) {
+                  return detail::get_or_throw<bool>("geometry", "resize_hysteresis");
+              },
+              [](ImpactX & /* ix */, bool resize_hysteresis) {
+                  amrex::ParmParse pp_geometry("geometry");
+                  pp_geometry.add("resize_hysteresis", resize_hysteresis);
+              },
+              "Keep a dynamically sized field mesh while the beam stays well inside of it and fills most of it."
+        )
+        .def_property("resize_margin",
+              [](ImpactX & /* ix */) {
+                  return detail::get_or_throw<amrex::Real>("geometry", "resize_margin");
+              },
+              [](ImpactX & /* ix */, amrex::Real resize_margin) {
+                  amrex::ParmParse pp_geometry("geometry");
+                  pp_geometry.add("resize_margin", resize_margin);
+              },
+              "With resize_hysteresis, the fraction of the mesh padding around the beam that must stay free of particles to keep the mesh."
+        )
+        .def_property("resize_fill_fraction",
+              [](ImpactX & /* ix */) {
+                  return detail::get_or_throw<amrex::Real>("geometry", "resize_fill_fraction");
+              },
+              [](ImpactX & /* ix */, amrex::Real resize_fill_fraction) {
+                  amrex::ParmParse pp_geometry("geometry");
+                  pp_geometry.add("resize_fill_fraction", resize_fill_fraction);
+              },
+              "With resize_hysteresis, the minimum fraction of the mesh extent the padded beam must fill per direction to keep the mesh."
+        )
+        .def_property_readonly("mesh_resizes",
+              [](ImpactX & ix) { return ix.m_mesh_resizes; },
+              "Number of space charge solves that resized the mesh to the beam in the last call to evolve()."
+        )
+        .def_property("tiles_per_rank",
+              [](ImpactX & /* ix */) {
+                  return detail::get_or_throw<int>("impactx", "tiles_per_rank");
+              },
+              [](ImpactX & /* ix */, int const tiles_per_rank) {
+                  amrex::ParmParse pp_impactx("impactx");
+                  pp_impactx.add("tiles_per_rank", tiles_per_rank);
+              },
+              "Number of particle tiles per MPI rank that new beam particles are split over (default: OpenMP threads on CPU, 1 on GPU).\n\n"
+              "OpenMP threads share the particle push over tiles. Must be set before init_grids()."
+        )
 
         .def_property("particle_shape",
             [](ImpactX & /* ix */) {
@@ -203,15 +254,63 @@ void init_ImpactX (py::module& m)
             },
             "Whether to calculate space charge effects."
         )
+        .def_property("track",
+            [](ImpactX & /* ix */) {
+                return detail::get_or_throw<std::string>("algo", "track");
+            },
+            [](ImpactX & /* ix */, std::string const track) {
+                if (track != "particles" && track != "envelope") {
+                    throw std::runtime_error("Tracking model must be particles or envelope but is: " + track);
+                }
+
+                amrex::ParmParse pp_algo("algo");
+                pp_algo.add("track", track);
+            },
+            "The model of the beam that is tracked through the lattice. Either particles (default) or envelope."
+        )
+        .def_property("beam_current",
+            [](ImpactX & /* ix */) {
+                return detail::get_or_throw<amrex::ParticleReal>("beam", "current");
+            },
+            [](ImpactX & /* ix */, amrex::ParticleReal const current) {
+                amrex::ParmParse pp_beam("beam");
+                pp_beam.add("current", current);
+            },
+            "The beam current in A, for space charge in envelope tracking."
+        )
         .def_property("space_charge",
+             [](ImpactX & /* ix */) -> std::variant<bool, std::string> {
+                 std::string const space_charge = detail::get_or_throw<std::string>("algo", "space_charge");
+                 SpaceChargeAlgo const algo = initialization::parse_space_charge_algo(space_charge);
+                 // the original models keep their boolean values
+                 if (algo == SpaceChargeAlgo::False) { return false; }
+                 if (algo == SpaceChargeAlgo::True_3D) { return true; }
+                 return initialization::to_string(algo);
+             },
+             [](ImpactX & /* ix */, std::variant<bool, std::string> const & space_charge) {
+                 std::string value;
+                 if (std::holds_alternative<bool>(space_charge)) {
+                     value = std::get<bool>(space_charge) ? "3D" : "false";
+                 } else {
+                     value = std::get<std::string>(space_charge);
+                 }
+                 // throws for unknown models
+                 initialization::parse_space_charge_algo(value);
+
+                 amrex::ParmParse pp_algo("algo");
+                 pp_algo.add("space_charge", value);
+             },
+             "The space charge model: False (default), True or \"3D\", \"2.5D\", \"Gauss3D\" or \"Gauss2.5D\"."
+        )
+        .def_property("space_charge_gauss_nint",
              [](ImpactX & /* ix */) {
-                 return detail::get_or_throw<bool>("algo", "space_charge");
+                 return detail::get_or_throw<int>("algo", "space_charge_gauss_nint");
              },
-             [](ImpactX & /* ix */, bool const enable) {
+             [](ImpactX & /* ix */, int const nint) {
                  amrex::ParmParse pp_algo("algo");
-                 pp_algo.add("space_charge", enable);
+                 pp_algo.add("space_charge_gauss_nint", nint);
              },
-             "Enable or disable space charge calculations (default: enabled)."
+             "Number of quadrature points for the field integral of the Gaussian space charge models (default: 128)."
         )
         .def_property("poisson_solver",
             [](ImpactX & /* ix */) {
@@ -278,6 +377,190 @@ void init_ImpactX (py::module& m)
               "Currently MLMG solver looks for verbosity levels from 0-5. "
               "A higher number results in more verbose output."
         )
+        .def_property("igf_cache_size",
+             [](ImpactX & /* ix */) {
+                 return detail::get_or_throw<int>("algo", "igf_cache_size");
+             },
+             [](ImpactX & /* ix */, int const size) {
+                 amrex::ParmParse pp_algo("algo");
+                 pp_algo.add("igf_cache_size", size);
+             },
+             "Number of mesh shapes for which the FFT plans and Green's function of the FFT Poisson solver are cached (default: 2)."
+        )
+        .def_property_readonly("igf_green_functions",
+             [](ImpactX & /* ix */) { return spacecharge::num_igf_green_functions(); },
+             "Number of Green's functions computed by the cached FFT Poisson solver since the start of the simulation."
+        )
+        .def_property("mlmg_warm_start",
+             [](ImpactX & /* ix */) {
+                 return detail::get_or_throw<bool>("algo", "mlmg_warm_start");
+             },
+             [](ImpactX & /* ix */, bool const enable) {
+                 amrex::ParmParse pp_algo("algo");
+                 pp_algo.add("mlmg_warm_start", enable);
+             },
+             "Start the MLMG solver from the potential of the last solve (default: True)."
+        )
+        .def_property("space_charge_reuse_interval",
+             [](ImpactX & /* ix */) {
+                 return detail::get_or_throw<int>("algo", "space_charge_reuse_interval");
+             },
+             [](ImpactX & /* ix */, int const interval) {
+                 amrex::ParmParse pp_algo("algo");
+                 pp_algo.add("space_charge_reuse_interval", interval);
+             },
+             "Maximum number of slices that use the same space charge field (default: 1, a new solve in every slice)."
+        )
+        .def_property("space_charge_reuse_tolerance",
+             [](ImpactX & /* ix */) {
+                 return detail::get_or_throw<amrex::Real>("algo", "space_charge_reuse_tolerance");
+             },
+             [](ImpactX & /* ix */, amrex::Real const tolerance) {
+                 amrex::ParmParse pp_algo("algo");
+                 pp_algo.add("space_charge_reuse_tolerance", tolerance);
+             },
+             "Relative change of the rms beam sizes or the reference momentum that requires a new space charge solve (default: 0.01)."
+        )
+        .def_property("space_charge_reuse_rescale",
+             [](ImpactX & /* ix */) {
+                 return detail::get_or_throw<bool>("algo", "space_charge_reuse_rescale");
+             },
+             [](ImpactX & /* ix */, bool const enable) {
+                 amrex::ParmParse pp_algo("algo");
+                 pp_algo.add("space_charge_reuse_rescale", enable);
+             },
+             "Scale a reused space charge field with the inverse rms volume of the beam (default: False)."
+        )
+        .def_property_readonly("space_charge_solves",
+             [](ImpactX & ix) { return ix.m_space_charge_solves; },
+             "Number of space charge field solves on the mesh in the last call to evolve()."
+        )
+        .def_property_readonly("space_charge_reuses",
+             [](ImpactX & ix) { return ix.m_space_charge_reuses; },
+             "Number of slices that reused the space charge field of an earlier solve in the last call to evolve()."
+        )
+        .def_property("load_balance_interval",
+             [](ImpactX & /* ix */) {
+                 return detail::get_or_throw<int>("algo", "load_balance_interval");
+             },
+             [](ImpactX & /* ix */, int const interval) {
+                 amrex::ParmParse pp_algo("algo");
+                 pp_algo.add("load_balance_interval", interval);
+             },
+             "Distribute the boxes anew over the MPI ranks every this many space charge steps, by the number of particles per box (default: 0, disabled)."
+        )
+        .def_property("load_balance_threshold",
+             [](ImpactX & /* ix */) {
+                 return detail::get_or_throw<amrex::Real>("algo", "load_balance_threshold");
+             },
+             [](ImpactX & /* ix */, amrex::Real const threshold) {
+                 amrex::ParmParse pp_algo("algo");
+                 pp_algo.add("load_balance_threshold", threshold);
+             },
+             "Minimum factor by which a new distribution of the boxes must improve the load balance efficiency (default: 1.1)."
+        )
+        .def_property("load_balance_strategy",
+             [](ImpactX & /* ix */) {
+                 return detail::get_or_throw<std::string>("algo", "load_balance_strategy");
+             },
+             [](ImpactX & /* ix */, std::string const strategy) {
+                 if (strategy != "knapsack" && strategy != "sfc") {
+                     throw std::runtime_error("load_balance_strategy must be either 'knapsack' or 'sfc'");
+                 }
+                 amrex::ParmParse pp_algo("algo");
+                 pp_algo.add("load_balance_strategy", strategy);
+             },
+             "The distribution strategy of the load balancing: knapsack (default) or sfc (space-filling curve)."
+        )
+        .def_property_readonly("load_balance_remaps",
+             [](ImpactX & ix) { return ix.m_load_balance_remaps; },
+             "Number of mesh-refinement levels whose boxes were distributed anew over the MPI ranks in the last call to evolve()."
+        )
+        .def_property("fuse_linear_maps",
+             [](ImpactX & /* ix */) {
+                 return detail::get_or_throw<bool>("algo", "fuse_linear_maps");
+             },
+             [](ImpactX & /* ix */, bool const enable) {
+                 amrex::ParmParse pp_algo("algo");
+                 pp_algo.add("fuse_linear_maps", enable);
+             },
+             "Fuse consecutive linear lattice elements into a single transfer map (default: disabled).\n\n"
+             "The fused map is applied to the beam particles in a single pass.\n"
+             "Only used in simulations without space charge and without slice step diagnostics."
+        )
+        .def_property("fuse_segments",
+             [](ImpactX & /* ix */) {
+                 return detail::get_or_throw<bool>("algo", "fuse_segments");
+             },
+             [](ImpactX & /* ix */, bool const enable) {
+                 amrex::ParmParse pp_algo("algo");
+                 pp_algo.add("fuse_segments", enable);
+             },
+             "Push the beam particles through consecutive lattice elements in a single pass (default: disabled).\n\n"
+             "On CPU, particles are pushed in cache-sized chunks through a whole lattice segment.\n"
+             "Only used in simulations without space charge and without slice step diagnostics."
+        )
+        .def_property("one_turn_map",
+             [](ImpactX & /* ix */) {
+                 return detail::get_or_throw<bool>("algo", "one_turn_map");
+             },
+             [](ImpactX & /* ix */, bool const enable) {
+                 amrex::ParmParse pp_algo("algo");
+                 pp_algo.add("one_turn_map", enable);
+             },
+             "Track all lattice periods of a linear lattice with the one-turn map (default: disabled).\n\n"
+             "The beam particles are pushed once with the one-turn map to the power of the number of periods.\n"
+             "Only used in simulations without space charge and without slice step diagnostics."
+        )
+        .def_property_readonly("one_turn_map_matrix",
+             [](ImpactX & ix) {
+                 std::vector<std::vector<amrex::Real>> R(6, std::vector<amrex::Real>(6));
+                 for (int i = 1; i <= 6; ++i) {
+                     for (int j = 1; j <= 6; ++j) {
+                         R[i-1][j-1] = ix.m_one_turn_map.R(i, j);
+                     }
+                 }
+                 return R;
+             },
+             "Transfer matrix of the one-turn map in (x, px, y, py, t, pt), built in the last call to evolve() with one_turn_map."
+        )
+        .def_property("refpart_cache",
+             [](ImpactX & /* ix */) {
+                 return detail::get_or_throw<bool>("algo", "refpart_cache");
+             },
+             [](ImpactX & /* ix */, bool const enable) {
+                 amrex::ParmParse pp_algo("algo");
+                 pp_algo.add("refpart_cache", enable);
+             },
+             "Reuse the reference particle push through RF cavities and soft-edge elements (default: enabled).\n\n"
+             "The reference orbit and linear map of each slice are cached by element parameters and\n"
+             "incoming reference particle, for further lattice periods and repeated calls to evolve()."
+        )
+        .def_property_readonly("refpart_cache_hits",
+             [](ImpactX & /* ix */) { return RefPartCache::hits; },
+             "Number of slices that reused a cached reference particle push since the last finalize()."
+        )
+        .def_property("lost_compaction_interval",
+             [](ImpactX & /* ix */) {
+                 return detail::get_or_throw<int>("algo", "lost_compaction_interval");
+             },
+             [](ImpactX & /* ix */, int const interval) {
+                 amrex::ParmParse pp_algo("algo");
+                 pp_algo.add("lost_compaction_interval", interval);
+             },
+             "Remove lost particles from the beam after this many slices of elements that can lose particles (default: 10).\n\n"
+             "Lost particles are collected after each such slice, but stay masked in the beam until they are removed."
+        )
+        .def_property("lost_compaction_fraction",
+             [](ImpactX & /* ix */) {
+                 return detail::get_or_throw<amrex::Real>("algo", "lost_compaction_fraction");
+             },
+             [](ImpactX & /* ix */, amrex::Real const fraction) {
+                 amrex::ParmParse pp_algo("algo");
+                 pp_algo.add("lost_compaction_fraction", fraction);
+             },
+             "Remove lost particles from the beam as soon as they exceed this fraction of the particles on an MPI rank (default: 0.05)."
+        )
         .def_property("diagnostics",
              [](ImpactX & /* ix */) {
                  return detail::get_or_throw<bool>("diag", "enable");
@@ -312,6 +595,64 @@ void init_ImpactX (py::module& m)
              "The minimum number of digits (default: 6) used for the step\n"
              "number appended to the diagnostic file names."
         )
+        .def_property("diag_format",
+             [](ImpactX & /* ix */) {
+                 return detail::get_or_throw<std::string>("diag", "format");
+             },
+             [](ImpactX & /* ix */, std::string const format) {
+                 amrex::ParmParse pp_diag("diag");
+                 pp_diag.add("format", format);
+             },
+             "File format of the reference particle and reduced beam characteristics\n"
+             "diagnostics: text (default) or binary."
+        )
+        .def_property("diag_flush_rows",
+             [](ImpactX & /* ix */) {
+                 return detail::get_or_throw<int>("diag", "flush_rows");
+             },
+             [](ImpactX & /* ix */, int const flush_rows) {
+                 amrex::ParmParse pp_diag("diag");
+                 pp_diag.add("flush_rows", flush_rows);
+             },
+             "Write the buffered rows of the reference particle and reduced beam\n"
+             "characteristics diagnostics every this many rows (default: 1000)."
+        )
+        .def_property("diag_monitor_staging_mb",
+             [](ImpactX & /* ix */) {
+                 return detail::get_or_throw<amrex::Real>("diag", "monitor_staging_mb");
+             },
+             [](ImpactX & /* ix */, amrex::Real const staging_mb) {
+                 amrex::ParmParse pp_diag("diag");
+                 pp_diag.add("monitor_staging_mb", staging_mb);
+             },
+             "Beam monitors of GPU runs copy the particle data of each tile to host memory.\n"
+             "If this copy grows beyond this size per MPI rank (in MB, default: 64),\n"
+             "the output is flushed early."
+        )
+        .def_property("diag_halo",
+             [](ImpactX & /* ix */) {
+                 return detail::get_or_throw<bool>("diag", "halo");
+             },
+             [](ImpactX & /* ix */, bool const enable) {
+                 amrex::ParmParse pp_diag("diag");
+                 pp_diag.add("halo", enable);
+                 diagnostics::clear_halo_options();
+             },
+             "Add the 90%, 99% and 99.9% emittances and the halo parameters\n"
+             "to the reduced beam characteristics (default: disabled)."
+        )
+        .def_property("diag_halo_bins",
+             [](ImpactX & /* ix */) {
+                 return detail::get_or_throw<int>("diag", "halo_bins");
+             },
+             [](ImpactX & /* ix */, int const nbins) {
+                 amrex::ParmParse pp_diag("diag");
+                 pp_diag.add("halo_bins", nbins);
+                 diagnostics::clear_halo_options();
+             },
+             "The number of logarithmic bins of the histograms of the\n"
+             "single-particle actions for diag_halo (default: 1000)."
+        )
         .def_property("particle_lost_diagnostics_backend",
                       [](ImpactX & /* ix */) {
                           return detail::get_or_throw<std::string>("diag", "backend");
@@ -323,6 +664,49 @@ void init_ImpactX (py::module& m)
                       "Diagnostics for particles lost in apertures.\n\n"
                       "See the ``BeamMonitor`` element for backend values."
         )
+        .def_property("particle_lost_diagnostics_mode",
+                      [](ImpactX & /* ix */) {
+                          return detail::get_or_throw<std::string>("diag", "lost_mode");
+                      },
+                      [](ImpactX & /* ix */, std::string const mode) {
+                          amrex::ParmParse pp_diag("diag");
+                          pp_diag.add("lost_mode", mode);
+                      },
+                      "Output of the particles lost in the beamline (default: particles).\n\n"
+                      "``particles`` writes all lost particles in chunks to openPMD,\n"
+                      "``histogram`` only keeps the number and charge of lost particles in bins of s."
+        )
+        .def_property("particle_lost_flush_periods",
+                      [](ImpactX & /* ix */) {
+                          return detail::get_or_throw<int>("diag", "lost_flush_periods");
+                      },
+                      [](ImpactX & /* ix */, int const periods) {
+                          amrex::ParmParse pp_diag("diag");
+                          pp_diag.add("lost_flush_periods", periods);
+                      },
+                      "Write the lost particles after this many periods through the lattice (default: 1).\n"
+                      "With 0, they are only written at the end of the simulation."
+        )
+        .def_property("particle_lost_flush_size",
+                      [](ImpactX & /* ix */) {
+                          return detail::get_or_throw<long>("diag", "lost_flush_size");
+                      },
+                      [](ImpactX & /* ix */, long const size) {
+                          amrex::ParmParse pp_diag("diag");
+                          pp_diag.add("lost_flush_size", size);
+                      },
+                      "Write the lost particles as soon as there are more than this many, over all MPI ranks (default: 0, unlimited)."
+        )
+        .def_property("particle_lost_histogram_ds",
+                      [](ImpactX & /* ix */) {
+                          return detail::get_or_throw<amrex::Real>("diag", "lost_histogram_ds");
+                      },
+                      [](ImpactX & /* ix */, amrex::Real const ds) {
+                          amrex::ParmParse pp_diag("diag");
+                          pp_diag.add("lost_histogram_ds", ds);
+                      },
+                      "The bin width in s, in meters, of the histogram of lost particles (default: 0.01)."
+        )
         .def_property("abort_on_warning_threshold",
              [](ImpactX & /* ix */){
                  return detail::get_or_throw<std::string>("impactx", "abort_on_warning_threshold");
@@ -423,7 +807,8 @@ void init_ImpactX (py::module& m)
              "Run the main simulation loop for a number of steps."
         )
         // TODO: step
-        .def("resize_mesh", &ImpactX::ResizeMesh,
+        .def("resize_mesh",
+             [](ImpactX & ix) { ix.ResizeMesh(); },
              "Resize the mesh :py:attr:`~domain` based on the :py:attr:`~dynamic_size` and related parameters."
         )
 
@@ -521,6 +906,15 @@ void init_ImpactX (py::module& m)
                 return true;
 #else
                 return false;
+#endif
+            })
+        .def_property_readonly_static(
+            "have_fft",
+            [](py::object const &){
+#ifdef ImpactX_USE_FFT
+                return true;
+#else
+                return false;
 #endif
             })
         .def_property_readonly_static(
@@ -534,6 +928,24 @@ void init_ImpactX (py::module& m)
                 return "SYCL";
 #else
                 return py::none();
+#endif
+            })
+        .def_property_readonly_static(
+            "precision",
+            [](py::object const &){
+#ifdef AMREX_USE_FLOAT
+                return "SINGLE";
+#else
+                return "DOUBLE";
+#endif
+            })
+        .def_property_readonly_static(
+            "particles_precision",
+            [](py::object const &){
+#ifdef AMREX_SINGLE_PRECISION_PARTICLES
+                return "SINGLE";
+#else
+                return "DOUBLE";
 #endif
             })
         ;
@@ -126,7 +126,7 @@ void init_elements(py::module& m)
             [](elements::Alignment & a) { return a.rotation(); },
             [](elements::Alignment & a, amrex::ParticleReal rotation_degree)
             {
-                a.m_rotation = rotation_degree * elements::Alignment::degree2rad;
+                a.set_rotation(rotation_degree);
             },
             "rotation error in the transverse plane in degree"
         )
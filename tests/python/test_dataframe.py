@@ -12,7 +12,7 @@ import importlib
 import matplotlib.pyplot as plt
 import pytest
 
-from impactx import ImpactX, amr, distribution, elements
+from impactx import Config, ImpactX, amr, distribution, elements
 
 
 @pytest.mark.skipif(
@@ -107,6 +107,367 @@ def test_df_pandas(save_png=True):
     sim.finalize()
 
 
+@pytest.mark.skipif(
+    importlib.util.find_spec("pandas") is None, reason="pandas is not available"
+)
+def test_reduced_beam_characteristics_offset():
+    """
+    Moments of a beam with a large offset of its centroid,
+    compared to the moments of the particle data
+    """
+    import numpy as np
+
+    sim = ImpactX()
+
+    sim.particle_shape = 2
+    sim.space_charge = False
+    sim.slice_step_diagnostics = False
+    sim.diagnostics = False
+    sim.init_grids()
+
+    kin_energy_MeV = 2.0e3
+    bunch_charge_C = 1.0e-9
+    npart = 10000
+
+    #   reference particle
+    pc = sim.particle_container()
+    ref = pc.ref_particle()
+    ref.set_charge_qe(-1.0).set_mass_MeV(0.510998950).set_kin_energy_MeV(kin_energy_MeV)
+
+    #   particle bunch
+    distr = distribution.Waterbag(
+        lambdaX=3.9984884770e-5,
+        lambdaY=3.9984884770e-5,
+        lambdaT=1.0e-3,
+        lambdaPx=2.6623538760e-5,
+        lambdaPy=2.6623538760e-5,
+        lambdaPt=2.0e-3,
+        muxpx=-0.846574929020762,
+        muypy=0.846574929020762,
+        mutpt=0.0,
+    )
+    sim.add_particles(bunch_charge_C, distr, npart)
+
+    # the centroid moves far off the axis, compared to the beam size
+    sim.lattice.extend(
+        [elements.Kicker(xkick=1.0e-2, ykick=-1.0e-2), elements.Drift(1.0)]
+    )
+    sim.evolve()
+
+    rbc = pc.reduced_beam_characteristics()
+    df = pc.to_df(local=True).astype(np.float64)
+    w = df["weighting"]
+
+    # the moments are summed in amrex::Real, from particle data in ParticleReal
+    if Config.particles_precision == "SINGLE":
+        rtol_mean, rtol_sig, rtol_emittance = 1.0e-5, 1.0e-4, 1.0e-3
+    else:
+        rtol_mean, rtol_sig, rtol_emittance = 1.0e-10, 1.0e-8, 1.0e-6
+
+    def mean(col):
+        return np.average(df[col], weights=w)
+
+    def cov(col1, col2):
+        d1 = df[col1] - mean(col1)
+        d2 = df[col2] - mean(col2)
+        return np.average(d1 * d2, weights=w)
+
+    assert np.isclose(rbc["x_mean"], mean("position_x"), rtol=rtol_mean)
+    assert np.isclose(rbc["y_mean"], mean("position_y"), rtol=rtol_mean)
+    for a, p in [("x", "momentum_x"), ("y", "momentum_y"), ("t", "momentum_t")]:
+        q = "position_" + a
+        emittance = np.sqrt(cov(q, q) * cov(p, p) - cov(q, p) ** 2)
+        assert np.isclose(rbc["sig_" + a], np.sqrt(cov(q, q)), rtol=rtol_sig)
+        assert np.isclose(rbc["sig_p" + a], np.sqrt(cov(p, p)), rtol=rtol_sig)
+        assert np.isclose(rbc["emittance_" + a], emittance, rtol=rtol_emittance)
+    assert np.isclose(rbc["x_min"], df["position_x"].min())
+    assert np.isclose(rbc["x_max"], df["position_x"].max())
+    assert np.isclose(rbc["charge_C"], -bunch_charge_C, rtol=rtol_mean)
+
+    # finalize simulation
+    sim.finalize()
+
+
+@pytest.mark.skipif(
+    importlib.util.find_spec("pandas") is None, reason="pandas is not available"
+)
+def test_reduced_beam_characteristics_coupled():
+    """
+    Eigen-emittances of a beam that is coupled in a solenoid,
+    compared to the covariance matrix of the particle data
+    """
+    import numpy as np
+
+    sim = ImpactX()
+
+    sim.particle_shape = 2
+    sim.space_charge = False
+    sim.slice_step_diagnostics = False
+    sim.diagnostics = False
+    sim.init_grids()
+
+    kin_energy_MeV = 250.0
+    bunch_charge_C = 1.0e-9
+    npart = 10000
+
+    #   reference particle
+    pc = sim.particle_container()
+    ref = pc.ref_particle()
+    ref.set_charge_qe(1.0).set_mass_MeV(938.27208816).set_kin_energy_MeV(kin_energy_MeV)
+
+    #   particle bunch
+    distr = distribution.Waterbag(
+        lambdaX=1.0e-3,
+        lambdaY=2.0e-3,
+        lambdaT=1.0e-3,
+        lambdaPx=1.0e-4,
+        lambdaPy=2.0e-4,
+        lambdaPt=1.0e-4,
+        muxpx=0.5,
+        muypy=-0.3,
+        mutpt=0.0,
+    )
+    sim.add_particles(bunch_charge_C, distr, npart)
+
+    sim.lattice.extend([elements.Sol(ds=0.5, ks=2.0), elements.Drift(1.0)])
+    sim.evolve()
+
+    rbc = pc.reduced_beam_characteristics()
+    df = pc.to_df(local=True)
+
+    columns = [
+        "position_x",
+        "momentum_x",
+        "position_y",
+        "momentum_y",
+        "position_t",
+        "momentum_t",
+    ]
+    sigma = np.cov(
+        df[columns].to_numpy(), rowvar=False, aweights=df["weighting"], bias=True
+    )
+    J = np.kron(np.eye(3), np.array([[0.0, 1.0], [-1.0, 0.0]]))
+    eigen = np.sort(np.abs(np.linalg.eigvals(J @ sigma).imag))[::2]
+
+    emittances = [rbc["emittance_1"], rbc["emittance_2"], rbc["emittance_3"]]
+    assert np.allclose(np.sort(emittances), eigen, rtol=1.0e-6, atol=0.0)
+    emittance_4d = np.sqrt(np.linalg.det(sigma[:4, :4]))
+    emittance_6d = np.sqrt(np.linalg.det(sigma))
+    assert np.isclose(rbc["emittance_4d"], emittance_4d, rtol=1.0e-6)
+    assert np.isclose(rbc["emittance_6d"], emittance_6d, rtol=1.0e-6)
+
+    # the solenoid couples x and y, so that the projected emittances grow
+    assert rbc["emittance_x"] * rbc["emittance_y"] > 1.01 * rbc["emittance_4d"]
+
+    # finalize simulation
+    sim.finalize()
+
+
+@pytest.mark.skipif(
+    importlib.util.find_spec("pandas") is None, reason="pandas is not available"
+)
+def test_particles_precision_fodo():
+    """
+    Beam particles tracked over many FODO periods,
+    compared to a double-precision reference of the linear transfer map
+
+    With mixed precision (ImpactX_PARTICLES_PRECISION=SINGLE), the particles
+    are stored and pushed in single precision, while the reference is computed
+    here in double precision from the same initial particle data.
+    """
+    import numpy as np
+
+    sim = ImpactX()
+
+    sim.particle_shape = 2
+    sim.space_charge = False
+    sim.slice_step_diagnostics = False
+    sim.diagnostics = False
+    sim.init_grids()
+
+    kin_energy_MeV = 2.0e3
+    bunch_charge_C = 1.0e-9
+    npart = 10000
+    periods = 10
+    nslice = 25
+
+    #   reference particle
+    pc = sim.particle_container()
+    ref = pc.ref_particle()
+    ref.set_charge_qe(-1.0).set_mass_MeV(0.510998950).set_kin_energy_MeV(kin_energy_MeV)
+
+    #   particle bunch
+    distr = distribution.Waterbag(
+        lambdaX=3.9984884770e-5,
+        lambdaY=3.9984884770e-5,
+        lambdaT=1.0e-3,
+        lambdaPx=2.6623538760e-5,
+        lambdaPy=2.6623538760e-5,
+        lambdaPt=2.0e-3,
+        muxpx=-0.846574929020762,
+        muypy=0.846574929020762,
+        mutpt=0.0,
+    )
+    sim.add_particles(bunch_charge_C, distr, npart)
+
+    fodo = [(0.25, 0.0), (1.0, 1.0), (0.5, 0.0), (1.0, -1.0), (0.25, 0.0)]
+    sim.lattice.extend(
+        [
+            elements.Quad(ds, k, nslice=nslice)
+            if k != 0.0
+            else elements.Drift(ds, nslice=nslice)
+            for ds, k in fodo
+        ]
+    )
+    sim.periods = periods
+
+    columns = [
+        "position_x",
+        "momentum_x",
+        "position_y",
+        "momentum_y",
+        "position_t",
+        "momentum_t",
+    ]
+    initial = pc.to_df(local=True).set_index("idcpu")[columns].astype(np.float64)
+    initial_rbc = pc.reduced_beam_characteristics()
+
+    # linear transfer map of the lattice, in double precision
+    betgam2 = ref.pt**2 - 1.0
+    period_map = np.eye(6)
+    for ds, k in fodo:
+        h = ds / nslice
+        omega = np.sqrt(abs(k))
+        slice_map = np.eye(6)
+        slice_map[0, 1] = slice_map[2, 3] = h
+        if k != 0.0:
+            focusing = [
+                [np.cos(omega * h), np.sin(omega * h) / omega],
+                [-omega * np.sin(omega * h), np.cos(omega * h)],
+            ]
+            defocusing = [
+                [np.cosh(omega * h), np.sinh(omega * h) / omega],
+                [omega * np.sinh(omega * h), np.cosh(omega * h)],
+            ]
+            slice_map[0:2, 0:2] = focusing if k > 0.0 else defocusing
+            slice_map[2:4, 2:4] = defocusing if k > 0.0 else focusing
+        slice_map[4, 5] = h / betgam2
+        period_map = np.linalg.matrix_power(slice_map, nslice) @ period_map
+    lattice_map = np.linalg.matrix_power(period_map, periods)
+    expected = initial.to_numpy() @ lattice_map.T
+
+    sim.evolve()
+
+    final = pc.to_df(local=True).set_index("idcpu")[columns].astype(np.float64)
+    final = final.loc[initial.index].to_numpy()
+    final_rbc = pc.reduced_beam_characteristics()
+
+    # the deviation from the reference, relative to the beam size
+    if Config.particles_precision == "SINGLE":
+        rtol = 1.0e-4
+    else:
+        rtol = 1.0e-10
+    deviation = np.max(np.abs(final - expected), axis=0) / np.std(expected, axis=0)
+    assert np.all(deviation < rtol)
+
+    # the emittances of the linear lattice are conserved
+    keys = ["emittance_x", "emittance_y", "emittance_t"]
+    assert np.allclose(
+        [final_rbc[key] for key in keys],
+        [initial_rbc[key] for key in keys],
+        rtol=rtol,
+        atol=0.0,
+    )
+
+    # finalize simulation
+    sim.finalize()
+
+
+@pytest.mark.skipif(
+    importlib.util.find_spec("pandas") is None
+    or importlib.util.find_spec("openpmd_api") is None,
+    reason="pandas or openpmd_api is not available",
+)
+def test_monitor_staging():
+    """
+    Beam monitor output that is flushed after every particle tile
+    is the same as the particles in the simulation
+    """
+    import numpy as np
+    import openpmd_api as io
+    import pandas as pd
+
+    sim = ImpactX()
+
+    sim.particle_shape = 2
+    sim.space_charge = False
+    sim.slice_step_diagnostics = False
+    # flush the staging buffers of GPU runs after every tile
+    sim.diag_monitor_staging_mb = 0.0
+    sim.tiles_per_rank = 4
+    sim.init_grids()
+
+    kin_energy_MeV = 2.0e3
+    bunch_charge_C = 1.0e-9
+    npart = 10000
+
+    #   reference particle
+    pc = sim.particle_container()
+    ref = pc.ref_particle()
+    ref.set_charge_qe(-1.0).set_mass_MeV(0.510998950).set_kin_energy_MeV(kin_energy_MeV)
+
+    #   particle bunch
+    distr = distribution.Waterbag(
+        lambdaX=3.9984884770e-5,
+        lambdaY=3.9984884770e-5,
+        lambdaT=1.0e-3,
+        lambdaPx=2.6623538760e-5,
+        lambdaPy=2.6623538760e-5,
+        lambdaPt=2.0e-3,
+    )
+    sim.add_particles(bunch_charge_C, distr, npart)
+
+    monitor = elements.BeamMonitor("monitor", backend="h5")
+    sim.lattice.extend([elements.Drift(ds=0.25), elements.Quad(ds=1.0, k=1.0), monitor])
+    sim.evolve()
+
+    columns = [
+        "position_x",
+        "momentum_x",
+        "position_y",
+        "momentum_y",
+        "position_t",
+        "momentum_t",
+        "weighting",
+    ]
+    df = pc.to_df(local=True).set_index("idcpu")[columns]
+
+    # the series is closed at the end of evolve
+    series = io.Series("diags/openPMD/monitor.h5", io.Access.read_only)
+    last_step = list(series.iterations)[-1]
+    beam = series.iterations[last_step].particles["beam"]
+    scalar = io.Record_Component.SCALAR
+    chunks = {"idcpu": beam["id"][scalar].load_chunk()}
+    for column in columns:
+        if column == "weighting":
+            chunks[column] = beam["weighting"][scalar].load_chunk()
+        else:
+            record, component = column.split("_")
+            chunks[column] = beam[record][component].load_chunk()
+    series.flush()
+    written = pd.DataFrame(chunks).set_index("idcpu")
+
+    assert len(written) == pc.total_number_of_particles()
+    written = written.loc[df.index]
+    for column in columns:
+        assert np.array_equal(written[column].to_numpy(), df[column].to_numpy())
+
+    del series
+
+    # finalize simulation
+    sim.finalize()
+
+
 if __name__ == "__main__":
     test_df_pandas(save_png=False)
 
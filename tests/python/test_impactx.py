@@ -7,11 +7,14 @@
 #
 # -*- coding: utf-8 -*-
 
+import os
+import re
+
 import numpy as np
 import pytest
 from conftest import basepath
 
-from impactx import ImpactX, distribution, elements
+from impactx import Config, ImpactX, ImpactXParIter, amr, distribution, elements
 
 # FIXME in AMReX via https://github.com/AMReX-Codes/amrex/pull/3727
 # def test_impactx_module():
@@ -75,6 +78,924 @@ def test_impactx_fodo_file():
     sim.finalize()
 
 
+def run_fodo(lattice=None, **properties):
+    """
+    Track the beam of the FODO example, with simulation properties set
+
+    Returns the reduced beam characteristics, the position s of the reference
+    particle and the number of particle tiles on this rank that hold particles.
+    """
+    sim = ImpactX()
+
+    sim.load_inputs_file(basepath + "/examples/fodo/input_fodo.in")
+    sim.slice_step_diagnostics = False
+    for name, value in properties.items():
+        setattr(sim, name, value)
+
+    sim.init_grids()
+    sim.init_beam_distribution_from_inputs()
+    if lattice is None:
+        sim.init_lattice_elements_from_inputs()
+    else:
+        sim.lattice.extend(lattice)
+
+    sim.evolve()
+
+    beam = sim.particle_container()
+    assert beam.total_number_of_particles() == 10000
+    rbc = beam.reduced_beam_characteristics()
+    s = beam.ref_particle().s
+    num_tiles = sum(
+        1
+        for lvl in range(beam.finest_level + 1)
+        for pti in ImpactXParIter(beam, level=lvl)
+        if pti.num_particles > 0
+    )
+
+    sim.finalize()
+    return rbc, s, num_tiles
+
+
+def assert_same_beam(rbc, reference, rtol):
+    """
+    The second moments of two beams agree
+    """
+    keys = [
+        "sig_x",
+        "sig_y",
+        "sig_t",
+        "sig_px",
+        "sig_py",
+        "sig_pt",
+        "emittance_x",
+        "emittance_y",
+        "emittance_t",
+        "beta_x",
+        "beta_y",
+        "charge_C",
+    ]
+    assert np.allclose(
+        [rbc[key] for key in keys],
+        [reference[key] for key in keys],
+        rtol=rtol,
+        atol=0.0,
+    )
+
+
+@pytest.mark.parametrize(
+    "fuse_linear_maps, fuse_segments", [(True, False), (False, True), (True, True)]
+)
+def test_impactx_fodo_fused(fuse_linear_maps, fuse_segments):
+    """
+    The FODO example, with consecutive elements fused into a single map
+    or into a single pass over the particles
+    """
+    reference, reference_s, _ = run_fodo()
+    fused, fused_s, _ = run_fodo(
+        fuse_linear_maps=fuse_linear_maps, fuse_segments=fuse_segments
+    )
+
+    # the reference particle is still pushed through every slice
+    assert np.isclose(fused_s, reference_s, rtol=1.0e-14, atol=0.0)
+    assert np.isclose(fused_s, 3.0)
+
+    # fused pushes only round differently
+    rtol = 1.0e-5 if Config.particles_precision == "SINGLE" else 1.0e-12
+    assert_same_beam(fused, reference, rtol)
+
+
+def test_impactx_segments_lossy():
+    """
+    Elements that can lose particles, fused into lattice segments
+    """
+    lattice = [
+        elements.ExactDrift(ds=0.25, nslice=4),
+        elements.Quad(ds=1.0, k=1.0, nslice=4),
+        elements.ExactSbend(ds=0.5, phi=1.0, nslice=4),
+        elements.Quad(ds=1.0, k=-1.0, nslice=4),
+        elements.ExactDrift(ds=0.25, nslice=4),
+    ]
+    reference, reference_s, _ = run_fodo(lattice)
+    fused, fused_s, _ = run_fodo(lattice, fuse_segments=True)
+
+    # lost particles are collected after the segment, none is lost here
+    assert np.isclose(fused_s, reference_s, rtol=1.0e-14, atol=0.0)
+    rtol = 1.0e-5 if Config.particles_precision == "SINGLE" else 1.0e-12
+    assert_same_beam(fused, reference, rtol)
+
+
+def test_impactx_fodo_tiles():
+    """
+    The FODO example, with the beam particles split over several tiles per rank
+    """
+    reference, _, reference_tiles = run_fodo(tiles_per_rank=1)
+    tiled, _, tiles = run_fodo(tiles_per_rank=4)
+
+    # the particles are spread over all tiles, but pushed the same
+    assert reference_tiles == 1
+    assert tiles == 4
+    rtol = 1.0e-5 if Config.particles_precision == "SINGLE" else 1.0e-12
+    assert_same_beam(tiled, reference, rtol)
+
+
+def test_impactx_fodo_one_turn_map():
+    """
+    Many periods of the FODO cell, tracked with the one-turn map
+    """
+    periods = 100
+
+    # the FODO cell without monitors is a purely linear lattice
+    ns = 25  # number of slices per ds in the element
+    fodo = [
+        elements.Drift(ds=0.25, nslice=ns),
+        elements.Quad(ds=1.0, k=1.0, nslice=ns),
+        elements.Drift(ds=0.5, nslice=ns),
+        elements.Quad(ds=1.0, k=-1.0, nslice=ns),
+        elements.Drift(ds=0.25, nslice=ns),
+    ]
+
+    tracked, tracked_s, _ = run_fodo(lattice=fodo, periods=periods)
+    mapped, mapped_s, _ = run_fodo(lattice=fodo, periods=periods, one_turn_map=True)
+
+    # the reference particle is still pushed through every period
+    assert np.isclose(mapped_s, tracked_s, rtol=1.0e-12, atol=0.0)
+    assert np.isclose(mapped_s, 3.0 * periods)
+
+    # the power of the one-turn map only rounds differently than
+    # pushing the particles through every slice of every period
+    rtol = 1.0e-3 if Config.particles_precision == "SINGLE" else 1.0e-9
+    assert_same_beam(mapped, tracked, rtol)
+
+
+def test_impactx_one_turn_map_precision():
+    """
+    The one-turn map of the FODO cell is built in double precision,
+    also if the beam particles are stored in single precision
+    """
+    if Config.precision == "SINGLE":
+        pytest.skip("maps are built in amrex::Real, which is single precision")
+
+    sim = ImpactX()
+
+    sim.load_inputs_file(basepath + "/examples/fodo/input_fodo.in")
+    sim.slice_step_diagnostics = False
+    sim.one_turn_map = True
+
+    sim.init_grids()
+    sim.init_beam_distribution_from_inputs()
+
+    ns = 25  # number of slices per ds in the element
+    sim.lattice.extend(
+        [
+            elements.Drift(ds=0.25, nslice=ns),
+            elements.Quad(ds=1.0, k=1.0, nslice=ns),
+            elements.Drift(ds=0.5, nslice=ns),
+            elements.Quad(ds=1.0, k=-1.0, nslice=ns),
+            elements.Drift(ds=0.25, nslice=ns),
+        ]
+    )
+
+    sim.evolve()
+
+    # the maps of the elements, in double precision
+    betgam2 = sim.particle_container().ref_particle().pt ** 2 - 1.0
+
+    def drift(ds):
+        R = np.identity(6)
+        R[0, 1] = R[2, 3] = ds
+        R[4, 5] = ds / betgam2
+        return R
+
+    def quad(ds, k):
+        omega = np.sqrt(abs(k))
+        focus = [
+            [np.cos(omega * ds), np.sin(omega * ds) / omega],
+            [-omega * np.sin(omega * ds), np.cos(omega * ds)],
+        ]
+        defocus = [
+            [np.cosh(omega * ds), np.sinh(omega * ds) / omega],
+            [omega * np.sinh(omega * ds), np.cosh(omega * ds)],
+        ]
+        R = np.identity(6)
+        R[0:2, 0:2] = focus if k > 0 else defocus
+        R[2:4, 2:4] = defocus if k > 0 else focus
+        R[4, 5] = ds / betgam2
+        return R
+
+    reference = np.identity(6)
+    for R in [drift(0.25), quad(1.0, 1.0), drift(0.5), quad(1.0, -1.0), drift(0.25)]:
+        reference = R @ reference
+
+    one_turn = np.array(sim.one_turn_map_matrix)
+    assert np.allclose(one_turn, reference, rtol=1.0e-12, atol=1.0e-12)
+
+    # finalize simulation
+    sim.finalize()
+
+
+def test_impactx_fodo_envelope():
+    """
+    The FODO cell, tracked with the envelope model of the beam
+    """
+    sim = ImpactX()
+
+    sim.load_inputs_file(basepath + "/examples/fodo/input_fodo.in")
+    sim.track = "envelope"
+
+    sim.init_grids()
+    sim.init_beam_distribution_from_inputs()
+    sim.init_lattice_elements_from_inputs()
+
+    sim.evolve()
+
+    # validate the results
+    beam = sim.particle_container()
+    num_particles = beam.total_number_of_particles()
+    assert num_particles == 10000
+    atol = 0.0  # ignored
+    rtol = 2.2 * num_particles**-0.5  # from random sampling of a smooth distribution
+
+    ref = beam.ref_particle()
+    assert np.isclose(ref.s, 3.0)
+
+    # the beam particles are pushed with the total transfer map at the end
+    rbc = beam.reduced_beam_characteristics()
+    assert np.allclose(
+        [
+            rbc["sig_x"],
+            rbc["sig_y"],
+            rbc["sig_t"],
+            rbc["emittance_x"],
+            rbc["emittance_y"],
+            rbc["emittance_t"],
+            rbc["charge_C"],
+        ],
+        [
+            7.5451170454175073e-005,
+            7.5441588239210947e-005,
+            9.9775878164077539e-004,
+            1.9959540393751392e-009,
+            2.0175015289132990e-009,
+            2.0013820193294972e-006,
+            -1.0e-9,
+        ],
+        rtol=rtol,
+        atol=atol,
+    )
+
+    # finalize simulation
+    sim.finalize()
+
+
+@pytest.mark.parametrize("nslice", [1, 4])
+def test_impactx_refpart_cache(nslice):
+    """
+    Reuse the reference particle push through a soft-edge solenoid
+    """
+
+    def run(refpart_cache):
+        sim = ImpactX()
+
+        sim.load_inputs_file(
+            basepath + "/examples/solenoid_softedge/input_solenoid_softedge.in"
+        )
+        amr.ParmParse("lattice").add("nslice", nslice)
+        sim.refpart_cache = refpart_cache
+        sim.periods = 3
+
+        sim.init_grids()
+        sim.init_beam_distribution_from_inputs()
+        sim.init_lattice_elements_from_inputs()
+
+        # the second call to evolve reuses the cached pushes of the first call
+        sim.evolve()
+        sim.evolve()
+
+        beam = sim.particle_container()
+        ref = beam.ref_particle()
+        result = [ref.s, ref.t, ref.pt, ref.x, ref.px, ref.y, ref.py, ref.z, ref.pz]
+        rbc = beam.reduced_beam_characteristics()
+        result += [rbc["sig_x"], rbc["sig_y"], rbc["sig_t"]]
+        hits = sim.refpart_cache_hits
+
+        sim.finalize()
+        return result, hits
+
+    uncached, uncached_hits = run(refpart_cache=False)
+    cached, cached_hits = run(refpart_cache=True)
+
+    # only the slices of the first of the 3 * 2 periods miss the cache
+    total_slices = nslice * 3 * 2
+    assert uncached_hits == 0
+    assert cached_hits == total_slices - nslice
+
+    num_particles = 10000
+    rtol = 2.2 * num_particles**-0.5  # from random sampling of a smooth distribution
+    assert np.isclose(cached[0], 6.0 * 3 * 2)
+    assert np.allclose(cached[:9], uncached[:9], rtol=1.0e-12, atol=1.0e-12)
+    assert np.allclose(cached[9:], uncached[9:], rtol=rtol, atol=0.0)
+
+
+def test_impactx_diag_binary():
+    """
+    Reduced diagnostics in the buffered binary format
+    """
+
+    def read_table(file_name):
+        with open(file_name, "rb") as f:
+            magic, version, num_columns = f.readline().split()
+            columns = f.readline().decode().split()
+            rows = np.fromfile(f, dtype=np.float64)
+        assert magic == b"impactx-table"
+        assert int(num_columns) == len(columns)
+        return columns, rows.reshape(-1, len(columns))
+
+    sim = ImpactX()
+
+    sim.load_inputs_file(basepath + "/examples/fodo/input_fodo.in")
+    sim.slice_step_diagnostics = True
+    sim.diag_format = "binary"
+    sim.diag_flush_rows = 7
+
+    sim.init_grids()
+    sim.init_beam_distribution_from_inputs()
+    sim.init_lattice_elements_from_inputs()
+
+    sim.evolve()
+
+    beam = sim.particle_container()
+    ref = beam.ref_particle()
+    rbc = beam.reduced_beam_characteristics()
+
+    # one row per slice step, including the partly filled last block of rows
+    columns, rows = read_table("diags/ref_particle.0.bin")
+    assert columns[:2] == ["step", "s"]
+    assert np.all(np.diff(rows[:, 0]) > 0)
+    assert np.isclose(rows[-1, 1], ref.s)
+
+    columns, rows = read_table("diags/reduced_beam_characteristics_final.0.bin")
+    assert columns[-1] == "emittance_6d"
+    assert rows.shape[0] == 1
+    for i, name in enumerate(columns[2:], start=2):
+        assert np.isclose(rows[0, i], rbc[name], rtol=1.0e-12, atol=0.0)
+
+    # finalize simulation
+    sim.finalize()
+
+
+def test_impactx_halo_diagnostics():
+    """
+    Percentile emittances and halo parameters of a Gaussian beam
+    """
+    sim = ImpactX()
+
+    sim.particle_shape = 2
+    sim.space_charge = False
+    sim.slice_step_diagnostics = False
+    sim.diagnostics = False
+    sim.diag_halo = True
+    sim.init_grids()
+
+    kin_energy_MeV = 2.0e3
+    bunch_charge_C = 1.0e-9
+    npart = 100000
+
+    #   reference particle
+    pc = sim.particle_container()
+    ref = pc.ref_particle()
+    ref.set_charge_qe(-1.0).set_mass_MeV(0.510998950).set_kin_energy_MeV(kin_energy_MeV)
+
+    #   particle bunch
+    distr = distribution.Gaussian(
+        lambdaX=3.9984884770e-5,
+        lambdaY=3.9984884770e-5,
+        lambdaT=1.0e-3,
+        lambdaPx=2.6623538760e-5,
+        lambdaPy=2.6623538760e-5,
+        lambdaPt=2.0e-3,
+        muxpx=-0.846574929020762,
+        muypy=0.846574929020762,
+        mutpt=0.0,
+    )
+    sim.add_particles(bunch_charge_C, distr, npart)
+
+    sim.lattice.append(elements.Drift(1.0))
+    sim.evolve()
+
+    # a 2D Gaussian contains the fraction f within -2 ln(1 - f) rms emittances
+    rbc = pc.reduced_beam_characteristics()
+    for q in ["x", "y", "t"]:
+        emittance = rbc["emittance_" + q]
+        assert np.isclose(
+            rbc["emittance_" + q + "_90"], -2.0 * np.log(0.1) * emittance, rtol=0.05
+        )
+        assert np.isclose(
+            rbc["emittance_" + q + "_99"], -2.0 * np.log(0.01) * emittance, rtol=0.1
+        )
+        assert rbc["emittance_" + q + "_999"] > rbc["emittance_" + q + "_99"]
+        assert np.isclose(rbc["halo_" + q], 1.0, atol=0.2)
+
+    # finalize simulation
+    sim.finalize()
+
+
+@pytest.mark.parametrize("lost_compaction_interval", [1, 10])
+def test_impactx_lost_compaction(lost_compaction_interval):
+    """
+    Particles lost in a series of apertures, removed from the beam
+    after every aperture or in batches
+    """
+    sim = ImpactX()
+
+    sim.load_inputs_file(basepath + "/examples/aperture/input_aperture.in")
+    sim.slice_step_diagnostics = False
+    sim.lost_compaction_interval = lost_compaction_interval
+    sim.lost_compaction_fraction = 1.0
+
+    sim.init_grids()
+    sim.init_beam_distribution_from_inputs()
+
+    # collimators that get narrower, without monitors in between
+    for scale in [1.5, 1.25, 1.0]:
+        sim.lattice.append(elements.Drift(0.123))
+        sim.lattice.append(elements.Aperture(xmax=scale * 1.0e-3, ymax=scale * 1.5e-3))
+
+    sim.evolve()
+
+    # validate the results
+    beam = sim.particle_container()
+    num_particles = 10000
+    num_remaining = beam.total_number_of_particles()
+
+    # we lost particles in apertures, all of them are removed from the beam
+    assert num_remaining < num_particles
+    assert beam.total_number_of_particles(False) == num_remaining
+
+    # the lost particles do not contribute to the beam charge
+    rbc = beam.reduced_beam_characteristics()
+    assert np.isclose(rbc["charge_C"], 1.0e-9 * num_remaining / num_particles)
+
+    # finalize simulation
+    sim.finalize()
+
+
+def test_impactx_lost_masked():
+    """
+    Particles that are marked as lost, but not yet removed from the beam,
+    do not contribute to the reduced beam characteristics
+    """
+    sim = ImpactX()
+
+    sim.load_inputs_file(basepath + "/examples/aperture/input_aperture.in")
+    sim.slice_step_diagnostics = False
+    sim.diagnostics = False
+
+    sim.init_grids()
+    sim.init_beam_distribution_from_inputs()
+
+    # mark the particles outside of the aperture as lost, without removing them
+    beam = sim.particle_container()
+    num_particles = 10000
+    elements.Aperture(xmax=1.0e-3, ymax=1.5e-3).push(beam)
+
+    num_remaining = beam.total_number_of_particles()
+    assert 0 < num_remaining < num_particles
+    assert beam.total_number_of_particles(False) == num_particles
+
+    rbc = beam.reduced_beam_characteristics()
+    assert -1.0e-3 <= rbc["x_min"] and rbc["x_max"] <= 1.0e-3
+    assert -1.5e-3 <= rbc["y_min"] and rbc["y_max"] <= 1.5e-3
+    assert rbc["sig_x"] < 1.0e-3
+    assert np.isclose(rbc["charge_C"], 1.0e-9 * num_remaining / num_particles)
+
+    # finalize simulation
+    sim.finalize()
+
+
+def test_impactx_lost_histogram():
+    """
+    Particles lost in a series of apertures, only kept as a histogram over s
+    """
+    sim = ImpactX()
+
+    sim.load_inputs_file(basepath + "/examples/aperture/input_aperture.in")
+    sim.slice_step_diagnostics = False
+    sim.particle_lost_diagnostics_mode = "histogram"
+    sim.particle_lost_histogram_ds = 0.1
+
+    sim.init_grids()
+    sim.init_beam_distribution_from_inputs()
+
+    # collimators that get narrower, without monitors in between
+    for scale in [1.5, 1.25, 1.0]:
+        sim.lattice.append(elements.Drift(0.123))
+        sim.lattice.append(elements.Aperture(xmax=scale * 1.0e-3, ymax=scale * 1.5e-3))
+
+    histogram_file = "diags/particles_lost_histogram"
+    if os.path.exists(histogram_file):
+        os.remove(histogram_file)
+
+    sim.evolve()
+
+    num_particles = 10000
+    num_remaining = sim.particle_container().total_number_of_particles()
+
+    # all lost particles are in the histogram, none before the first aperture
+    s_min, s_max, num_lost, charge_lost = np.loadtxt(
+        histogram_file, skiprows=1, unpack=True
+    )
+    assert np.sum(num_lost) == num_particles - num_remaining
+    assert np.isclose(
+        np.sum(charge_lost), 1.0e-9 * (1.0 - num_remaining / num_particles)
+    )
+    assert np.all(num_lost[s_max < 0.123] == 0)
+
+    # the bins cover one period of the lattice
+    period_length = sum(element.ds for element in sim.lattice)
+    assert np.isclose(s_max[-1], period_length)
+
+    # finalize simulation
+    sim.finalize()
+
+
+def test_impactx_space_charge_2p5d():
+    """
+    Transverse expansion of a long, cold proton bunch with 2.5D space charge
+    """
+    sim = ImpactX()
+
+    sim.n_cell = [16, 16, 32]
+    sim.particle_shape = 2
+    sim.space_charge = "2.5D"
+    sim.dynamic_size = True
+    sim.prob_relative = [1.1]
+    sim.slice_step_diagnostics = False
+    sim.diagnostics = False
+    sim.init_grids()
+
+    assert sim.space_charge == "2.5D"
+
+    kin_energy_MeV = 10.0
+    bunch_charge_C = 1.0e-9
+    npart = 10000
+
+    #   reference particle
+    pc = sim.particle_container()
+    ref = pc.ref_particle()
+    ref.set_charge_qe(1.0).set_mass_MeV(938.27208816).set_kin_energy_MeV(kin_energy_MeV)
+
+    #   particle bunch, ten times longer than wide
+    distr = distribution.Waterbag(
+        lambdaX=1.0e-3,
+        lambdaY=1.0e-3,
+        lambdaT=1.0e-2,
+        lambdaPx=1.0e-6,
+        lambdaPy=1.0e-6,
+        lambdaPt=1.0e-6,
+    )
+    sim.add_particles(bunch_charge_C, distr, npart)
+
+    initial = pc.reduced_beam_characteristics()
+
+    sim.lattice.append(elements.Drift(ds=0.1, nslice=10))
+    sim.evolve()
+
+    final = pc.reduced_beam_characteristics()
+
+    # the beam expands transversely
+    assert final["sig_x"] > 1.02 * initial["sig_x"]
+    assert final["sig_y"] > 1.02 * initial["sig_y"]
+    assert np.isclose(final["sig_x"], final["sig_y"], rtol=0.05)
+
+    # longitudinal space charge is neglected
+    assert np.isclose(final["sig_pt"], initial["sig_pt"], rtol=1.0e-3)
+
+    # finalize simulation
+    sim.finalize()
+
+
+@pytest.mark.parametrize(
+    "gauss_model, mesh_model", [("Gauss3D", "3D"), ("Gauss2.5D", "2.5D")]
+)
+def test_impactx_space_charge_gauss(gauss_model, mesh_model):
+    """
+    Transverse expansion of a Gaussian proton bunch with grid-free space charge,
+    compared to space charge on the mesh
+    """
+
+    def run(space_charge):
+        sim = ImpactX()
+
+        sim.n_cell = [32, 32, 32]
+        sim.particle_shape = 2
+        sim.space_charge = space_charge
+        sim.dynamic_size = True
+        sim.prob_relative = [3.0 if space_charge == "3D" else 1.1]
+        sim.slice_step_diagnostics = False
+        sim.diagnostics = False
+        sim.init_grids()
+
+        assert sim.space_charge == (True if space_charge == "3D" else space_charge)
+
+        kin_energy_MeV = 10.0
+        bunch_charge_C = 1.0e-9
+        npart = 10000
+
+        #   reference particle
+        pc = sim.particle_container()
+        ref = pc.ref_particle()
+        ref.set_charge_qe(1.0).set_mass_MeV(938.27208816).set_kin_energy_MeV(
+            kin_energy_MeV
+        )
+
+        #   particle bunch, ten times longer than wide
+        distr = distribution.Gaussian(
+            lambdaX=1.0e-3,
+            lambdaY=1.0e-3,
+            lambdaT=1.0e-2,
+            lambdaPx=1.0e-6,
+            lambdaPy=1.0e-6,
+            lambdaPt=1.0e-6,
+        )
+        sim.add_particles(bunch_charge_C, distr, npart)
+
+        initial = pc.reduced_beam_characteristics()
+
+        sim.lattice.append(elements.Drift(ds=0.1, nslice=10))
+        sim.evolve()
+
+        final = pc.reduced_beam_characteristics()
+        sim.finalize()
+        return initial, final
+
+    initial, gauss = run(gauss_model)
+    _, mesh = run(mesh_model)
+
+    # the beam expands transversely, as with space charge on the mesh
+    assert gauss["sig_x"] > 1.02 * initial["sig_x"]
+    assert gauss["sig_y"] > 1.02 * initial["sig_y"]
+    assert np.isclose(gauss["sig_x"], mesh["sig_x"], rtol=0.02)
+    assert np.isclose(gauss["sig_y"], mesh["sig_y"], rtol=0.02)
+
+
+@pytest.mark.skipif(not Config.have_fft, reason="needs ImpactX_FFT=ON")
+def test_impactx_igf_cache():
+    """
+    Reuse the FFT plans and Green's function of the FFT Poisson solver
+    """
+
+    def run(igf_cache_size):
+        sim = ImpactX()
+
+        sim.load_inputs_file(
+            basepath + "/examples/cfchannel/input_cfchannel_10nC_fft.in"
+        )
+        sim.igf_cache_size = igf_cache_size
+        sim.diagnostics = False
+
+        sim.init_grids()
+        # the Green's function is reused on a fixed mesh only
+        sim.domain = amr.RealBox([-6.0e-3, -6.0e-3, -3.0e-3], [6.0e-3, 6.0e-3, 3.0e-3])
+        sim.init_beam_distribution_from_inputs()
+        sim.init_lattice_elements_from_inputs()
+
+        sim.evolve()
+
+        rbc = sim.particle_container().reduced_beam_characteristics()
+        result = [rbc["sig_x"], rbc["sig_y"], rbc["sig_t"]]
+        green_functions = sim.igf_green_functions
+
+        sim.finalize()
+        return result, green_functions
+
+    uncached, uncached_green_functions = run(igf_cache_size=0)
+    cached, cached_green_functions = run(igf_cache_size=2)
+
+    # without the cache, ABLASTR solves; with it, one Green's function for all 50 slices
+    assert uncached_green_functions == 0
+    assert cached_green_functions == 1
+    assert np.allclose(cached, uncached, rtol=1.0e-4, atol=0.0)
+
+
+def test_impactx_mlmg_warm_start(capfd):
+    """
+    Start the multigrid solver from the potential of the last solve
+    """
+
+    def run(mlmg_warm_start):
+        sim = ImpactX()
+
+        sim.load_inputs_file(
+            basepath + "/examples/expanding_beam/input_expanding_mlmg.in"
+        )
+        sim.mlmg_warm_start = mlmg_warm_start
+        # report the number of iterations of each MLMG solve
+        sim.mlmg_verbosity = 1
+        sim.diagnostics = False
+
+        sim.init_grids()
+        sim.init_beam_distribution_from_inputs()
+        sim.init_lattice_elements_from_inputs()
+
+        capfd.readouterr()
+        sim.evolve()
+        out = capfd.readouterr().out
+
+        rbc = sim.particle_container().reduced_beam_characteristics()
+        result = [rbc["sig_x"], rbc["sig_y"], rbc["sig_t"]]
+
+        sim.finalize()
+
+        # solves that converge on the initial guess report no iterations
+        iterations = [int(n) for n in re.findall(r"MLMG: Final Iter\. (\d+)", out)]
+        solves = len(iterations) + out.count("MLMG: No iterations needed")
+        return result, solves, sum(iterations)
+
+    cold, cold_solves, cold_iterations = run(mlmg_warm_start=False)
+    warm, warm_solves, warm_iterations = run(mlmg_warm_start=True)
+
+    # the same solves, but the warm start needs fewer iterations
+    assert cold_solves > 0
+    assert warm_solves == cold_solves
+    assert warm_iterations < cold_iterations
+
+    # both solves converge to algo.mlmg_relative_tolerance
+    assert np.allclose(warm, cold, rtol=1.0e-4, atol=0.0)
+
+
+@pytest.mark.parametrize("rescale", [False, True])
+def test_impactx_space_charge_reuse(rescale):
+    """
+    Reuse the space charge field over several slices of an expanding beam
+    """
+
+    def run(reuse_interval):
+        sim = ImpactX()
+
+        sim.load_inputs_file(
+            basepath + "/examples/expanding_beam/input_expanding_mlmg.in"
+        )
+        sim.space_charge_reuse_interval = reuse_interval
+        # the beam grows by less than this between two solves, so only the
+        # interval decides when the field is solved again
+        sim.space_charge_reuse_tolerance = 1.0
+        sim.space_charge_reuse_rescale = rescale
+        sim.diagnostics = False
+
+        sim.init_grids()
+        sim.init_beam_distribution_from_inputs()
+        sim.init_lattice_elements_from_inputs()
+
+        sim.evolve()
+
+        rbc = sim.particle_container().reduced_beam_characteristics()
+        result = [rbc["sig_x"], rbc["sig_y"], rbc["sig_t"]]
+        counts = (sim.space_charge_solves, sim.space_charge_reuses)
+
+        sim.finalize()
+        return result, counts
+
+    every_slice, every_slice_counts = run(reuse_interval=1)
+    reused, reused_counts = run(reuse_interval=4)
+
+    # 40 slices: a solve in every slice, or a solve every 4th slice
+    assert every_slice_counts == (40, 0)
+    assert reused_counts == (10, 30)
+    assert np.allclose(reused, every_slice, rtol=0.02, atol=0.0)
+
+
+@pytest.mark.parametrize("strategy", ["knapsack", "sfc"])
+def test_impactx_load_balance(strategy):
+    """
+    Balance the boxes of an expanding beam over the MPI ranks in every space charge step
+    """
+
+    def run(load_balance_interval):
+        sim = ImpactX()
+
+        sim.load_inputs_file(
+            basepath + "/examples/expanding_beam/input_expanding_mlmg.in"
+        )
+        sim.load_balance_interval = load_balance_interval
+        sim.load_balance_threshold = 1.0
+        sim.load_balance_strategy = strategy
+        sim.diagnostics = False
+
+        sim.init_grids()
+        sim.init_beam_distribution_from_inputs()
+        sim.init_lattice_elements_from_inputs()
+
+        pc = sim.particle_container()
+        num_particles = pc.total_number_of_particles()
+
+        sim.evolve()
+
+        # boxes may move between ranks, but no particle got lost
+        assert pc.total_number_of_particles() == num_particles
+
+        rbc = pc.reduced_beam_characteristics()
+        result = [rbc["sig_x"], rbc["sig_y"], rbc["sig_t"]]
+        remaps = sim.load_balance_remaps
+
+        sim.finalize()
+        return result, remaps
+
+    unbalanced, unbalanced_remaps = run(load_balance_interval=0)
+    balanced, balanced_remaps = run(load_balance_interval=1)
+
+    assert unbalanced_remaps == 0
+    # a single rank is always balanced
+    if amr.ParallelDescriptor.NProcs() == 1:
+        assert balanced_remaps == 0
+
+    # the distribution of the boxes does not change the beam
+    assert np.allclose(balanced, unbalanced, rtol=1.0e-5, atol=0.0)
+
+
+def test_impactx_resize_hysteresis():
+    """
+    Keep the field mesh of an expanding beam while it stays inside of it
+    """
+
+    def run(resize_hysteresis):
+        sim = ImpactX()
+
+        sim.load_inputs_file(
+            basepath + "/examples/expanding_beam/input_expanding_mlmg.in"
+        )
+        sim.resize_hysteresis = resize_hysteresis
+        sim.diagnostics = False
+
+        sim.init_grids()
+        sim.init_beam_distribution_from_inputs()
+        sim.init_lattice_elements_from_inputs()
+
+        sim.evolve()
+
+        rbc = sim.particle_container().reduced_beam_characteristics()
+        result = [rbc["sig_x"], rbc["sig_y"], rbc["sig_t"]]
+        resizes = sim.mesh_resizes
+
+        sim.finalize()
+        return result, resizes
+
+    refitted, refitted_resizes = run(resize_hysteresis=False)
+    kept, kept_resizes = run(resize_hysteresis=True)
+
+    # 40 space charge solves: the mesh is refitted in every one of them, or
+    # kept in some, but resized at least once while the beam expands
+    assert refitted_resizes == 40
+    assert 0 < kept_resizes < refitted_resizes
+    assert np.allclose(kept, refitted, rtol=0.02, atol=0.0)
+
+
+@pytest.mark.skipif(
+    "IMPACTX_TEST_LARGE_MEMORY" not in os.environ,
+    reason="needs several 100 GB of memory, set IMPACTX_TEST_LARGE_MEMORY to run",
+)
+def test_impactx_add_particles_64bit():
+    """
+    Inject more than 2^31 particles in aggregate over all MPI ranks,
+    without overflow of particle counts, ids and weights
+    """
+    sim = ImpactX()
+
+    sim.particle_shape = 2
+    sim.space_charge = False
+    sim.slice_step_diagnostics = False
+    sim.diagnostics = False
+    sim.init_grids()
+
+    kin_energy_MeV = 2.0e3
+    bunch_charge_C = 1.0e-9
+    npart = 2**31 + 2**20
+
+    #   reference particle
+    pc = sim.particle_container()
+    ref = pc.ref_particle()
+    ref.set_charge_qe(-1.0).set_mass_MeV(0.510998950).set_kin_energy_MeV(kin_energy_MeV)
+
+    #   particle bunch
+    distr = distribution.Waterbag(
+        lambdaX=3.9984884770e-5,
+        lambdaY=3.9984884770e-5,
+        lambdaT=1.0e-3,
+        lambdaPx=2.6623538760e-5,
+        lambdaPy=2.6623538760e-5,
+        lambdaPt=2.0e-3,
+    )
+    sim.add_particles(bunch_charge_C, distr, npart)
+
+    assert pc.total_number_of_particles() == npart
+
+    # the weights of all particles add up to the bunch charge
+    rbc = pc.reduced_beam_characteristics()
+    assert np.isclose(rbc["charge_C"], -bunch_charge_C, rtol=1.0e-5)
+
+    # finalize simulation
+    sim.finalize()
+
+
 def test_impactx_nofile():
     """
     This tests using ImpactX without an inputs file